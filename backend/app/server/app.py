@@ -15,6 +15,26 @@ from server.routes.stock import router as StockRouter
 
 
 from server.config import database
+from server.config.tareas import iniciar_tarea_periodica, detener_tareas
+from server.config.indices import sincronizar_indices_al_inicio, estadisticas_indices
+from server.config.cache import estadisticas_caches
+from server.config.security import estadisticas_bcrypt, cerrar_pool_bcrypt
+from server.functions.stock import sincronizar_vista_stock
+from server.functions.busqueda import sincronizar_tokens_busqueda
+from server.functions.autocomplete import iniciar_indice_autocomplete, indice_autocomplete
+from server.functions.resumen_inventario import (
+    RESUMEN_RECONCILIACION_MINUTOS,
+    reconciliar_resumen_inventario
+)
+from server.functions.importacion import (
+    IMPORT_INTERRUMPIDA_MINUTOS,
+    marcar_importaciones_interrumpidas
+)
+from server.functions.kardex import (
+    KARDEX_SNAPSHOT_INTERVALO_HORAS,
+    inicializar_snapshots_kardex,
+    actualizar_snapshots_kardex
+)
 #from server.config.database import startup_db_client, shutdown_db_client ,connect_to_mongo
 # Configurar logging
 logging.basicConfig(
@@ -45,6 +65,34 @@ app = FastAPI(
 @app.on_event("startup")
 async def startup():
     await database.startup_db_client()
+    await sincronizar_indices_al_inicio()
+    await sincronizar_vista_stock()
+    await sincronizar_tokens_busqueda()
+    await iniciar_indice_autocomplete()
+    await inicializar_snapshots_kardex()
+    iniciar_tarea_periodica(
+        "reconciliacion_resumen_inventario",
+        RESUMEN_RECONCILIACION_MINUTOS * 60,
+        reconciliar_resumen_inventario,
+        ejecutar_al_inicio=True
+    )
+    iniciar_tarea_periodica(
+        "snapshots_kardex",
+        KARDEX_SNAPSHOT_INTERVALO_HORAS * 3600,
+        actualizar_snapshots_kardex
+    )
+    iniciar_tarea_periodica(
+        "importaciones_interrumpidas",
+        IMPORT_INTERRUMPIDA_MINUTOS * 60,
+        marcar_importaciones_interrumpidas,
+        ejecutar_al_inicio=True
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    await detener_tareas()
+    await database.shutdown_db_client()
+    cerrar_pool_bcrypt()
 
 # Configurar CORS
 app.add_middleware(
@@ -126,6 +174,20 @@ async def health_check():
         "version": "1.0.0"
     }
 
+# Endpoint de métricas internas
+@app.get("/metrics", tags=["Sistema"])
+async def metrics():
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "cache": estadisticas_caches(),
+        "bcrypt": estadisticas_bcrypt(),
+        "logs": database.escritor_logs.stats(),
+        "ids": database.asignador_ids.stats(),
+        "mongo": database.estadisticas_mongo(),
+        "indices": estadisticas_indices(),
+        "autocomplete": indice_autocomplete.stats()
+    }
+
 # Endpoint raíz
 @app.get("/", tags=["Sistema"])
 async def read_root():
@@ -0,0 +1,152 @@
+# backend/app/server/config/cache.py
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuración del cache de usuarios autenticados
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", 10000))
+# TTL de resultados de consultas agregadas (resumen de stock, etc.)
+CONSULTAS_CACHE_TTL = float(os.getenv("CONSULTAS_CACHE_TTL", 5))
+
+class CacheTTL:
+    """
+    Cache en memoria LRU con expiración por TTL
+
+    Pensado para el event loop de la aplicación (sin awaits internos, por lo
+    que no requiere locks). Cada proceso/worker mantiene su propia copia.
+    """
+
+    def __init__(self, nombre: str, max_items: int, ttl_segundos: float):
+        self.nombre = nombre
+        self.max_items = max_items
+        self.ttl_segundos = ttl_segundos
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expirados = 0
+        self.desalojados = 0
+        self.invalidaciones = 0
+
+    def get(self, clave: Hashable) -> Optional[Any]:
+        """Obtener valor vigente o None (cuenta hit/miss)"""
+        entrada = self._datos.get(clave)
+
+        if entrada is None:
+            self.misses += 1
+            return None
+
+        valor, expira = entrada
+        if expira <= time.monotonic():
+            del self._datos[clave]
+            self.expirados += 1
+            self.misses += 1
+            return None
+
+        self._datos.move_to_end(clave)
+        self.hits += 1
+        return valor
+
+    def set(self, clave: Hashable, valor: Any):
+        """Guardar valor; desaloja el menos usado si se supera el máximo"""
+        self._datos[clave] = (valor, time.monotonic() + self.ttl_segundos)
+        self._datos.move_to_end(clave)
+
+        while len(self._datos) > self.max_items:
+            self._datos.popitem(last=False)
+            self.desalojados += 1
+
+    def invalidate(self, clave: Hashable):
+        """Eliminar una entrada (tras modificar el dato en BD)"""
+        if self._datos.pop(clave, None) is not None:
+            self.invalidaciones += 1
+
+    def clear(self):
+        """Vaciar el cache"""
+        self._datos.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del cache"""
+        consultas = self.hits + self.misses
+        return {
+            "items": len(self._datos),
+            "max_items": self.max_items,
+            "ttl_segundos": self.ttl_segundos,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / consultas, 4) if consultas else 0.0,
+            "expirados": self.expirados,
+            "desalojados": self.desalojados,
+            "invalidaciones": self.invalidaciones
+        }
+
+class EjecucionUnica:
+    """
+    Single-flight con cache TTL de resultados
+
+    Las llamadas concurrentes con la misma clave comparten una única
+    ejecución en curso; el resultado se reutiliza durante el TTL del cache.
+    Si la ejecución falla, todas las llamadas que esperaban reciben el error
+    y no se guarda nada en cache.
+    """
+
+    def __init__(self, cache: CacheTTL):
+        self.cache = cache
+        self._en_curso: Dict[Hashable, asyncio.Future] = {}
+        self.ejecuciones = 0
+        self.coalescidas = 0
+
+    async def ejecutar(self, clave: Hashable, funcion: Callable[[], Awaitable[Any]]) -> Any:
+        """Obtener resultado de cache, de la ejecución en curso o ejecutando la función"""
+        resultado = self.cache.get(clave)
+        if resultado is not None:
+            return resultado
+
+        en_curso = self._en_curso.get(clave)
+        if en_curso is not None:
+            self.coalescidas += 1
+            # shield: cancelar a un solicitante no cancela la ejecución compartida
+            return await asyncio.shield(en_curso)
+
+        tarea = asyncio.ensure_future(funcion())
+        self._en_curso[clave] = tarea
+        self.ejecuciones += 1
+
+        try:
+            resultado = await asyncio.shield(tarea)
+            self.cache.set(clave, resultado)
+            return resultado
+        finally:
+            if tarea.done():
+                self._en_curso.pop(clave, None)
+            else:
+                tarea.add_done_callback(lambda _: self._en_curso.pop(clave, None))
+
+    def invalidate(self, clave: Hashable):
+        self.cache.invalidate(clave)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "ejecuciones": self.ejecuciones,
+            "coalescidas": self.coalescidas,
+            "en_curso": len(self._en_curso)
+        }
+
+# Usuarios activos por id_usuario (usado en la verificación de tokens)
+cache_usuarios = CacheTTL("usuarios", AUTH_CACHE_MAX, AUTH_CACHE_TTL)
+
+# Consultas agregadas costosas (dashboard)
+consultas_compartidas = EjecucionUnica(CacheTTL("consultas", 100, CONSULTAS_CACHE_TTL))
+
+def estadisticas_caches() -> Dict[str, Any]:
+    """Estadísticas de todos los caches en memoria"""
+    return {
+        cache_usuarios.nombre: cache_usuarios.stats(),
+        consultas_compartidas.cache.nombre: consultas_compartidas.stats()
+    }
@@ -1,9 +1,17 @@
 # backend/app/server/config/database.py
 import os
 import asyncio
+import importlib.util
+from contextlib import asynccontextmanager
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import WriteConcern
+from pymongo.read_preferences import SecondaryPreferred
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional
+from server.config.log_writer import EscritorLogs
+from server.config.ids import AsignadorIds
+from server.config.monitor_pool import monitor_pool
+from server.config.settings import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,10 +23,86 @@ database = None
 # Configuración de la base de datos
 MONGO_URL = os.getenv("MONGO_URL")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "almacen_control")
+# Usar transacciones multi-documento si el despliegue las soporta (replica set / sharded)
+MONGO_TRANSACCIONES = os.getenv("MONGO_TRANSACCIONES", "true").lower() == "true"
+
+# Pool de conexiones desde settings.db_*: mínimo = pool_size, máximo =
+# pool_size + max_overflow, espera máxima por conexión = pool_timeout
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", 300000))
+MONGO_SERVER_SELECTION_MS = int(os.getenv("MONGO_SERVER_SELECTION_MS", 10000))
+# Compresión del protocolo (en orden de preferencia; se omiten las no instaladas)
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+
+# Write concern por tipo de operación: inventario/usuarios confirmados por la
+# mayoría con journal; logs e históricos (reconstruibles) con w=1
+MONGO_WRITE_CONCERN_CRITICO = os.getenv("MONGO_WRITE_CONCERN_CRITICO", "majority")
+MONGO_WRITE_CONCERN_LOGS = os.getenv("MONGO_WRITE_CONCERN_LOGS", "1")
+MONGO_WTIMEOUT_MS = int(os.getenv("MONGO_WTIMEOUT_MS", 5000))
+
+COLECCIONES_LOGS = {"log_general", "h_usuarios", "h_productos"}
+
+# Ruteo de lecturas: "primario" (escrituras y lecturas que deben ver lo recién
+# escrito) o "reportes" (listados, búsquedas, alertas, valorización, exportación)
+LECTURA_PRIMARIA = "primario"
+LECTURA_REPORTES = "reportes"
+# "secondaryPreferred" envía los reportes a secundarios; "primary" los desactiva
+MONGO_LECTURA_REPORTES = os.getenv("MONGO_LECTURA_REPORTES", "secondaryPreferred")
+# Desfase máximo aceptado de un secundario (MongoDB exige al menos 90 s)
+MONGO_MAX_STALENESS_S = max(90, int(os.getenv("MONGO_MAX_STALENESS_S", 90)))
+
+# Módulo Python de cada compresor opcional (zlib viene con Python)
+_MODULOS_COMPRESORES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
 
 if not MONGO_URL:
     raise ValueError("MONGO_URL no está configurada en las variables de entorno")
 print("jajaja")
+def _valor_w(valor: str):
+    return int(valor) if valor.isdigit() else valor
+
+def compresores_disponibles() -> list:
+    """Compresores configurados cuyo módulo está instalado"""
+    compresores = []
+    for nombre in (c.strip() for c in MONGO_COMPRESSORS.split(",")):
+        modulo = _MODULOS_COMPRESORES.get(nombre)
+        if modulo and importlib.util.find_spec(modulo):
+            compresores.append(nombre)
+        elif nombre:
+            logger.warning(f"Compresor de MongoDB no disponible: {nombre}")
+    return compresores
+
+def opciones_cliente() -> Dict[str, Any]:
+    """Opciones del cliente Motor (pool, timeouts, compresión, lecturas)"""
+    opciones = {
+        "minPoolSize": settings.db_connection_pool_size,
+        "maxPoolSize": settings.db_connection_pool_size + settings.db_max_overflow,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_MS,
+        "waitQueueTimeoutMS": settings.db_pool_timeout * 1000,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "event_listeners": [monitor_pool]
+    }
+    
+    compresores = compresores_disponibles()
+    if compresores:
+        opciones["compressors"] = ",".join(compresores)
+    
+    return opciones
+
+def preferencias_lectura() -> Dict[str, Any]:
+    """Read preference de cada tipo de lectura (None = la del cliente)"""
+    reportes = None
+    if MONGO_LECTURA_REPORTES == "secondaryPreferred":
+        reportes = SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS_S)
+    return {LECTURA_PRIMARIA: None, LECTURA_REPORTES: reportes}
+
+PREFERENCIAS_LECTURA = preferencias_lectura()
+
+WRITE_CONCERNS = {
+    "critico": WriteConcern(w=_valor_w(MONGO_WRITE_CONCERN_CRITICO), j=True, wtimeout=MONGO_WTIMEOUT_MS),
+    "logs": WriteConcern(w=_valor_w(MONGO_WRITE_CONCERN_LOGS))
+}
+
 async def connect_to_mongo():
     """Conectar a MongoDB"""
     print("jaja dentro de connect_to_mongo")
@@ -26,8 +110,9 @@ async def connect_to_mongo():
     
     try:
         logger.info("🔗 Conectando a MongoDB...")
-        client = AsyncIOMotorClient(MONGO_URL)
+        client = AsyncIOMotorClient(MONGO_URL, **opciones_cliente())
         database = client[MONGO_DB_NAME]
+        _colecciones.clear()
         
         # Verificar conexión
         await client.admin.command('ping')
@@ -45,45 +130,121 @@ async def close_mongo_connection():
         client.close()
         logger.info("🔐 Conexión a MongoDB cerrada")
 
-def get_collection(collection_name: str):
-    """Obtener una colección de MongoDB"""
+# Colecciones con su write concern y read preference, creadas una vez por conexión
+_colecciones: Dict[tuple, Any] = {}
+
+def get_collection(collection_name: str, lectura: str = LECTURA_PRIMARIA):
+    """
+    Obtener una colección de MongoDB
+    
+    El write concern depende del tipo de colección y la read preference del
+    tipo de lectura: con LECTURA_REPORTES las consultas van a un secundario
+    con desfase acotado (o al primario si no hay secundarios disponibles).
+    """
     if database is None:
         raise RuntimeError("Base de datos no inicializada")
     
-    return database[collection_name]
+    coleccion = _colecciones.get((collection_name, lectura))
+    if coleccion is None:
+        tipo = "logs" if collection_name in COLECCIONES_LOGS else "critico"
+        # Dentro de una transacción el driver usa el write concern de la transacción
+        coleccion = database.get_collection(
+            collection_name,
+            write_concern=WRITE_CONCERNS[tipo],
+            read_preference=PREFERENCIAS_LECTURA[lectura]
+        )
+        _colecciones[(collection_name, lectura)] = coleccion
+    
+    return coleccion
+
+def estadisticas_mongo() -> Dict[str, Any]:
+    """Configuración efectiva del cliente y métricas del pool"""
+    return {
+        "pool": {
+            "min": settings.db_connection_pool_size,
+            "max": settings.db_connection_pool_size + settings.db_max_overflow,
+            "wait_timeout_ms": settings.db_pool_timeout * 1000,
+            "servidores": monitor_pool.stats()
+        },
+        "compresores": compresores_disponibles(),
+        "read_preference": MONGO_READ_PREFERENCE,
+        "lectura_reportes": {
+            "modo": MONGO_LECTURA_REPORTES,
+            "max_staleness_s": MONGO_MAX_STALENESS_S
+        },
+        "write_concern": {tipo: wc.document for tipo, wc in WRITE_CONCERNS.items()}
+    }
 
 # Colecciones principales
-usuarios_collection = lambda: get_collection("usuarios")
-productos_collection = lambda: get_collection("productos")
-stock_collection = lambda: get_collection("stock")
-h_usuarios_collection = lambda: get_collection("h_usuarios")
-h_productos_collection = lambda: get_collection("h_productos")
-contador_collection = lambda: get_collection("contador_general")
-log_collection = lambda: get_collection("log_general")
+usuarios_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("usuarios", lectura)
+productos_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("productos", lectura)
+stock_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("stock", lectura)
+h_usuarios_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("h_usuarios", lectura)
+h_productos_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("h_productos", lectura)
+contador_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("contador_general", lectura)
+log_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("log_general", lectura)
+kardex_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("kardex", lectura)
+kardex_snapshots_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("kardex_snapshots", lectura)
+resumen_inventario_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("resumen_inventario", lectura)
+importaciones_collection = lambda lectura=LECTURA_PRIMARIA: get_collection("importaciones", lectura)
+
+# Escritura en lote (segundo plano) de logs e históricos
+escritor_logs = EscritorLogs(get_collection)
+
+# IDs autoincrementales asignados por bloques (un $inc por bloque)
+asignador_ids = AsignadorIds(get_collection)
+
+def soporta_transacciones() -> bool:
+    """Verificar si la topología actual admite transacciones multi-documento"""
+    if not MONGO_TRANSACCIONES or client is None:
+        return False
+    
+    topologia = client.delegate.topology_description.topology_type_name
+    return topologia in ("ReplicaSetWithPrimary", "Sharded", "LoadBalanced")
+
+@asynccontextmanager
+async def transaccion():
+    """
+    Sesión de MongoDB para agrupar escrituras relacionadas
+    
+    En replica set/sharded abre una transacción (commit al salir, abort ante
+    excepción). En un servidor standalone la sesión se usa sin transacción.
+    """
+    async with await client.start_session() as session:
+        if soporta_transacciones():
+            async with session.start_transaction():
+                yield session
+        else:
+            yield session
+
+def filtro_con_cambios(filtro: dict, cambios: dict) -> dict:
+    """
+    Filtro que solo coincide si algún campo de `cambios` difiere del valor actual
+    
+    Usado con find_one_and_update para detectar "sin cambios" sin una lectura
+    previa: si no hay coincidencia, el documento no existe o ya tenía esos valores.
+    """
+    return {**filtro, "$or": [{campo: {"$ne": valor}} for campo, valor in cambios.items()]}
 
 # Función para generar ID autoincremental
 async def get_next_id(modulo: str) -> int:
-    """Generar próximo ID autoincremental para un módulo"""
+    """Generar próximo ID autoincremental para un módulo (desde el bloque local)"""
     try:
-        contador_col = contador_collection()
-        
-        # Buscar o crear contador para el módulo
-        resultado = await contador_col.find_one_and_update(
-            {"modulo": modulo},
-            {
-                "$inc": {f"id_{modulo}": 1},
-                "$set": {"updated_at": datetime.now()}
-            },
-            upsert=True,
-            return_document=True
-        )
-        
-        return resultado[f"id_{modulo}"]
+        return await asignador_ids.siguiente(modulo)
         
     except Exception as e:
         logger.error(f"Error generando ID para {modulo}: {e}")
         raise
 
+async def reservar_ids(modulo: str, cantidad: int) -> int:
+    """Reservar un rango contiguo de IDs; retorna el primero"""
+    try:
+        return await asignador_ids.reservar(modulo, cantidad)
+        
+    except Exception as e:
+        logger.error(f"Error reservando {cantidad} IDs para {modulo}: {e}")
+        raise
+
 # Función para registrar en histórico
 async def save_to_history(
     collection_name: str,
@@ -102,15 +263,65 @@ async def save_to_history(
             "action_by_name": user_name
         }
         
-        history_col = get_collection(f"h_{collection_name}")
-        await history_col.insert_one(history_data)
+        history_name = f"h_{collection_name}"
+        if escritor_logs.es_durable(action) or not escritor_logs.encolar(history_name, history_data):
+            await get_collection(history_name).insert_one(history_data)
         
         logger.debug(f"Registro guardado en histórico h_{collection_name}")
         
     except Exception as e:
         logger.error(f"Error guardando en histórico: {e}")
 
+async def save_many_to_history(
+    collection_name: str,
+    documentos: list,
+    action: str,
+    user_id: int = 0,
+    user_name: str = "Sistema"
+):
+    """Guardar varios registros en la tabla histórica con un solo insert_many"""
+    try:
+        if not documentos:
+            return
+        
+        ahora = datetime.now()
+        history_data = [
+            {
+                **data,
+                "action": action,
+                "action_timestamp": ahora,
+                "action_by": user_id,
+                "action_by_name": user_name
+            }
+            for data in documentos
+        ]
+        
+        # Ya es un lote: se escribe directo, sin pasar por la cola de logs
+        await get_collection(f"h_{collection_name}").insert_many(history_data, ordered=False)
+        
+    except Exception as e:
+        logger.error(f"Error guardando lote en histórico: {e}")
+
 # Función para logging general
+def _documento_log(
+    action: str,
+    module: str,
+    user_id: int = 0,
+    user_name: str = "Sistema",
+    details: dict = None
+) -> dict:
+    """Construir documento de log general"""
+    return {
+        "action": action,
+        "module": module,
+        "user_id": user_id,
+        "user_name": user_name,
+        "details": details or {},
+        "timestamp": datetime.now(),
+        "ip_address": None,  # Se puede agregar después
+        "user_agent": None   # Se puede agregar después
+    }
+
 async def log_activity(
     action: str,
     module: str,
@@ -120,31 +331,44 @@ async def log_activity(
 ):
     """Registrar actividad en log general"""
     try:
-        log_data = {
-            "action": action,
-            "module": module,
-            "user_id": user_id,
-            "user_name": user_name,
-            "details": details or {},
-            "timestamp": datetime.now(),
-            "ip_address": None,  # Se puede agregar después
-            "user_agent": None   # Se puede agregar después
-        }
+        log_data = _documento_log(action, module, user_id, user_name, details)
         
-        log_col = log_collection()
-        await log_col.insert_one(log_data)
+        if escritor_logs.es_durable(action) or not escritor_logs.encolar("log_general", log_data):
+            await log_collection().insert_one(log_data)
         
     except Exception as e:
         logger.error(f"Error registrando actividad: {e}")
 
+async def log_activities(actividades: list):
+    """Registrar varias actividades en log general con un solo insert_many"""
+    try:
+        if not actividades:
+            return
+        
+        log_data = [_documento_log(**actividad) for actividad in actividades]
+        
+        durables = [log for log in log_data if escritor_logs.es_durable(log["action"])]
+        en_linea = durables + [
+            log for log in log_data
+            if not escritor_logs.es_durable(log["action"]) and not escritor_logs.encolar("log_general", log)
+        ]
+        
+        if en_linea:
+            await log_collection().insert_many(en_linea, ordered=False)
+        
+    except Exception as e:
+        logger.error(f"Error registrando actividades: {e}")
+
 # Eventos de startup y shutdown
 async def startup_db_client():
     """Inicializar conexión DB al startup"""
     print("Starting up DB client... luis ")
     await connect_to_mongo()
+    escritor_logs.iniciar()
 
 async def shutdown_db_client():
     """Cerrar conexión DB al shutdown"""
+    await escritor_logs.detener()
     await close_mongo_connection()
 
 logger.info("✅ Configuración de base de datos cargada")
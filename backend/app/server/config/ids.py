@@ -0,0 +1,99 @@
+# backend/app/server/config/ids.py
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# IDs reservados por incremento del contador (1 = un incremento por ID)
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", 100))
+
+class AsignadorIds:
+    """
+    Asignación de IDs autoincrementales por bloques
+
+    Cada proceso reserva un bloque de IDs con un solo $inc sobre
+    contador_general y los entrega localmente, evitando que cada alta
+    compita por el mismo documento. Los IDs no usados de un bloque (reinicio
+    del worker) quedan como huecos, y entre workers los IDs no siguen el
+    orden de creación. El tamaño se configura con ID_BLOCK_SIZE o por módulo
+    con ID_BLOCK_SIZE_<MODULO> (ej. ID_BLOCK_SIZE_KARDEX).
+    """
+
+    def __init__(self, obtener_coleccion: Callable[[str], Any]):
+        self.obtener_coleccion = obtener_coleccion
+        # modulo -> [siguiente, ultimo] del bloque local
+        self._bloques: Dict[str, List[int]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.incrementos = 0
+        self.asignados = 0
+
+    def tamano_bloque(self, modulo: str) -> int:
+        return max(1, int(os.getenv(f"ID_BLOCK_SIZE_{modulo.upper()}", ID_BLOCK_SIZE)))
+
+    def _disponibles(self, modulo: str) -> int:
+        bloque = self._bloques.get(modulo)
+        return bloque[1] - bloque[0] + 1 if bloque else 0
+
+    def _tomar(self, modulo: str, cantidad: int) -> int:
+        """Tomar IDs del bloque local (sin awaits: atómico en el event loop)"""
+        bloque = self._bloques[modulo]
+        primero = bloque[0]
+        bloque[0] += cantidad
+        self.asignados += cantidad
+        return primero
+
+    async def _incrementar(self, modulo: str, cantidad: int) -> int:
+        """Incrementar el contador del módulo; retorna el último ID reservado"""
+        resultado = await self.obtener_coleccion("contador_general").find_one_and_update(
+            {"modulo": modulo},
+            {
+                "$inc": {f"id_{modulo}": cantidad},
+                "$set": {"updated_at": datetime.now()}
+            },
+            upsert=True,
+            return_document=True
+        )
+        self.incrementos += 1
+        return resultado[f"id_{modulo}"]
+
+    async def siguiente(self, modulo: str) -> int:
+        """Próximo ID del módulo (reserva un bloque nuevo al agotarse el local)"""
+        if self._disponibles(modulo):
+            return self._tomar(modulo, 1)
+
+        lock = self._locks.setdefault(modulo, asyncio.Lock())
+        async with lock:
+            # Otra corrutina pudo reservar el bloque mientras se esperaba el lock
+            if not self._disponibles(modulo):
+                tamano = self.tamano_bloque(modulo)
+                ultimo = await self._incrementar(modulo, tamano)
+                self._bloques[modulo] = [ultimo - tamano + 1, ultimo]
+
+            return self._tomar(modulo, 1)
+
+    async def reservar(self, modulo: str, cantidad: int) -> int:
+        """
+        Reservar un rango contiguo de `cantidad` IDs; retorna el primero
+
+        Si el bloque local alcanza se usa sin ir a la base; si no, se
+        reserva el rango completo con un solo incremento (el bloque local se
+        conserva para las altas individuales).
+        """
+        if cantidad <= self._disponibles(modulo):
+            return self._tomar(modulo, cantidad)
+
+        ultimo = await self._incrementar(modulo, cantidad)
+        self.asignados += cantidad
+        return ultimo - cantidad + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del asignador (incrementos evitados y bloques locales)"""
+        return {
+            "block_size": ID_BLOCK_SIZE,
+            "incrementos": self.incrementos,
+            "asignados": self.asignados,
+            "disponibles": {modulo: self._disponibles(modulo) for modulo in self._bloques}
+        }
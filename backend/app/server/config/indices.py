@@ -0,0 +1,375 @@
+# backend/app/server/config/indices.py
+"""
+Registro de índices de MongoDB
+
+Fuente única de los índices de cada colección. Se verifica al inicio de
+la aplicación o desde la línea de comandos:
+
+    cd backend/app
+    python -m server.config.indices                      # verificar y crear faltantes
+    python -m server.config.indices --eliminar-sobrantes # además borrar los no registrados
+    python -m server.config.indices --reporte            # cobertura de consultas frecuentes
+
+Los faltantes se crean siempre; los no registrados solo se borran al
+migrar a una INDICES_VERSION nueva (o con --eliminar-sobrantes). Al
+modificar INDICES se debe incrementar INDICES_VERSION.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from server.config import database
+
+logger = logging.getLogger(__name__)
+
+INDICES_VERSION = 1
+# Verificar al inicio de la aplicación (crear índices faltantes)
+INDICES_SINCRONIZAR_AL_INICIO = os.getenv("INDICES_SINCRONIZAR_AL_INICIO", "true").lower() == "true"
+# IndexNotFound
+CODIGO_INDICE_INEXISTENTE = 27
+
+# Los nombres se generan a partir de las claves (igual que createIndex en
+# 02_create_indexes.js), salvo los índices de texto que tienen nombre propio
+INDICES: Dict[str, List[IndexModel]] = {
+    "usuarios": [
+        IndexModel([("codigo_usuario", ASCENDING)], unique=True),
+        IndexModel([("email_usuario", ASCENDING)], unique=True),
+        IndexModel([("tipo_usuario", ASCENDING)]),
+        IndexModel(
+            [("nombre_usuario", TEXT), ("area_usuario", TEXT)],
+            name="usuarios_texto",
+            default_language="spanish"
+        ),
+        IndexModel([("created_at", DESCENDING), ("id_usuario", DESCENDING)]),
+        IndexModel([("estado_usuario", ASCENDING), ("created_at", DESCENDING), ("id_usuario", DESCENDING)])
+    ],
+    "productos": [
+        IndexModel([("codigo_producto", ASCENDING)], unique=True),
+        IndexModel(
+            [("nombre_producto", TEXT), ("categoria_producto", TEXT), ("descripcion_producto", TEXT)],
+            name="productos_texto",
+            default_language="spanish",
+            weights={"nombre_producto": 10, "categoria_producto": 3, "descripcion_producto": 1}
+        ),
+        IndexModel([("tipo_producto", ASCENDING)]),
+        IndexModel([("estado_producto", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("id_producto", DESCENDING)]),
+        IndexModel([("estado_producto", ASCENDING), ("created_at", DESCENDING), ("id_producto", DESCENDING)]),
+        IndexModel([("tipo_producto", ASCENDING), ("created_at", DESCENDING), ("id_producto", DESCENDING)]),
+        # Búsquedas y autocomplete filtrados por estado y ordenados por nombre
+        IndexModel([("estado_producto", ASCENDING), ("nombre_producto", ASCENDING)]),
+        IndexModel([("estado_producto", ASCENDING), ("busqueda_tokens", ASCENDING), ("nombre_producto", ASCENDING)]),
+        IndexModel([("busqueda_tokens", ASCENDING), ("nombre_producto", ASCENDING)]),
+        IndexModel([("updated_at", ASCENDING)])
+    ],
+    "stock": [
+        IndexModel([("producto_id", ASCENDING)], unique=True),
+        IndexModel([("cantidad_disponible", ASCENDING)]),
+        IndexModel([("estado_stock", ASCENDING), ("producto_nombre", ASCENDING), ("id_stock", ASCENDING)]),
+        IndexModel([
+            ("estado_stock", ASCENDING),
+            ("nivel_stock", ASCENDING),
+            ("producto_nombre", ASCENDING),
+            ("id_stock", ASCENDING)
+        ]),
+        IndexModel([("estado_stock", ASCENDING), ("alerta_generada", ASCENDING)]),
+        IndexModel([("estado_stock", ASCENDING), ("fecha_vencimiento", ASCENDING)])
+    ],
+    "kardex": [
+        IndexModel([("id_kardex", ASCENDING)], unique=True),
+        IndexModel([("producto_id", ASCENDING), ("fecha_movimiento", DESCENDING), ("id_kardex", DESCENDING)]),
+        IndexModel([("fecha_movimiento", DESCENDING), ("id_kardex", DESCENDING)])
+    ],
+    "kardex_snapshots": [
+        IndexModel([("producto_id", ASCENDING), ("id_kardex", ASCENDING)], unique=True),
+        IndexModel([("producto_id", ASCENDING), ("fecha_corte", DESCENDING), ("id_kardex", DESCENDING)]),
+        IndexModel([("fecha_corte", DESCENDING)])
+    ],
+    "importaciones": [
+        IndexModel([("id_importacion", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING)])
+    ],
+    # Históricos: por entidad y fecha de la acción
+    "h_productos": [
+        IndexModel([("id_producto", ASCENDING), ("action_timestamp", DESCENDING)]),
+        IndexModel([("action_timestamp", DESCENDING)])
+    ],
+    "h_usuarios": [
+        IndexModel([("id_usuario", ASCENDING), ("action_timestamp", DESCENDING)]),
+        IndexModel([("action_timestamp", DESCENDING)])
+    ],
+    # Logs: el documento se escribe con "timestamp" (no created_at)
+    "log_general": [
+        IndexModel([("timestamp", DESCENDING)]),
+        IndexModel([("module", ASCENDING), ("timestamp", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)])
+    ],
+    "contador_general": [
+        IndexModel([("modulo", ASCENDING)])
+    ]
+}
+
+# Resultado de la última sincronización (para /metrics)
+ultimo_resultado: Dict[str, Any] = {}
+
+def nombres_registrados(coleccion: str) -> List[str]:
+    return [modelo.document["name"] for modelo in INDICES.get(coleccion, [])]
+
+async def version_aplicada() -> int:
+    documento = await database.get_collection("esquema_versiones").find_one({"_id": "indices"})
+    return documento["version"] if documento else 0
+
+async def sincronizar_indices(eliminar_sobrantes: bool = False) -> Dict[str, Any]:
+    """
+    Verificar los índices registrados: crear los faltantes y reportar los sobrantes
+
+    Se listan los índices de cada colección en cada ejecución (un comando por
+    colección), por lo que un índice borrado o que falló se detecta y se
+    recrea. La versión aplicada solo decide el borrado de los no
+    registrados: se borran al migrar a una versión nueva o con
+    eliminar_sobrantes, antes de crear los faltantes. Los índices se crean
+    de a uno; un conflicto (mismas claves con otras opciones, otro índice
+    de texto) se reporta sin detener el resto.
+    """
+    global ultimo_resultado
+
+    aplicada = await version_aplicada()
+    migrar = aplicada < INDICES_VERSION
+    eliminar = eliminar_sobrantes or migrar
+
+    resultado = {
+        "version": INDICES_VERSION,
+        "version_anterior": aplicada,
+        "creados": {},
+        "sobrantes": {},
+        "eliminados": {},
+        "errores": {}
+    }
+
+    for nombre_coleccion, modelos in INDICES.items():
+        coleccion = database.get_collection(nombre_coleccion)
+
+        errores = []
+
+        try:
+            existentes = {indice["name"] async for indice in coleccion.list_indexes()}
+        except Exception as e:
+            errores.append(f"list_indexes: {e}")
+            existentes = None
+
+        if existentes is not None:
+            registrados = set(nombres_registrados(nombre_coleccion))
+
+            # Primero borrar los no registrados: un índice de texto anterior
+            # (solo se admite uno por colección) o uno con las mismas claves y
+            # otro nombre impedirían crear su reemplazo
+            sobrantes = sorted(existentes - registrados - {"_id_"})
+            if sobrantes:
+                resultado["sobrantes"][nombre_coleccion] = sobrantes
+
+                if eliminar:
+                    eliminados = []
+                    for indice in sobrantes:
+                        try:
+                            await coleccion.drop_index(indice)
+                            eliminados.append(indice)
+                        except OperationFailure as e:
+                            # Otro worker ya lo borró en la misma migración
+                            if e.code == CODIGO_INDICE_INEXISTENTE:
+                                eliminados.append(indice)
+                            else:
+                                errores.append(f"{indice}: {e}")
+                        except Exception as e:
+                            errores.append(f"{indice}: {e}")
+                    existentes -= set(eliminados)
+                    resultado["eliminados"][nombre_coleccion] = eliminados
+
+            # Uno por uno: un conflicto no impide crear el resto
+            creados = []
+            for modelo in modelos:
+                nombre = modelo.document["name"]
+                if nombre in existentes:
+                    continue
+                try:
+                    creados.extend(await coleccion.create_indexes([modelo]))
+                except Exception as e:
+                    errores.append(f"{nombre}: {e}")
+            if creados:
+                resultado["creados"][nombre_coleccion] = creados
+
+        if errores:
+            resultado["errores"][nombre_coleccion] = errores
+            logger.error(f"Error sincronizando índices de {nombre_coleccion}: {errores}")
+
+    if migrar and not resultado["errores"]:
+        await database.get_collection("esquema_versiones").update_one(
+            {"_id": "indices"},
+            {"$set": {"version": INDICES_VERSION, "aplicado_at": datetime.now()}},
+            upsert=True
+        )
+
+    if resultado["creados"]:
+        if migrar:
+            logger.info(f"Índices creados: {resultado['creados']}")
+        else:
+            # Con la versión ya aplicada, un faltante es un índice borrado o fallido
+            logger.warning(f"Índices faltantes recreados: {resultado['creados']}")
+    if resultado["sobrantes"] and not eliminar:
+        logger.warning(f"Índices no registrados: {resultado['sobrantes']}")
+
+    if resultado["errores"]:
+        resultado["estado"] = "con_errores"
+    elif resultado["creados"] or resultado["eliminados"]:
+        resultado["estado"] = "sincronizado"
+    else:
+        resultado["estado"] = "al_dia"
+
+    resultado["verificado_at"] = datetime.now().isoformat()
+    ultimo_resultado = resultado
+    return resultado
+
+async def sincronizar_indices_al_inicio():
+    """Verificación en el startup (borra no registrados solo al migrar de versión)"""
+    if not INDICES_SINCRONIZAR_AL_INICIO:
+        return
+
+    try:
+        await sincronizar_indices()
+    except Exception as e:
+        logger.error(f"Error sincronizando índices al inicio: {e}")
+
+# ===== COBERTURA DE CONSULTAS =====
+
+def consultas_frecuentes() -> List[Dict[str, Any]]:
+    """Consultas representativas de los caminos calientes (filtro y orden)"""
+    ahora = datetime.now()
+
+    return [
+        {"nombre": "login por email", "coleccion": "usuarios", "filtro": {"email_usuario": "x@x.com"}},
+        {"nombre": "listado de usuarios activos", "coleccion": "usuarios",
+         "filtro": {"estado_usuario": 1}, "orden": [("created_at", -1), ("id_usuario", -1)]},
+        {"nombre": "listado de productos", "coleccion": "productos",
+         "filtro": {}, "orden": [("created_at", -1), ("id_producto", -1)]},
+        {"nombre": "listado de productos por tipo", "coleccion": "productos",
+         "filtro": {"tipo_producto": "insumo"}, "orden": [("created_at", -1), ("id_producto", -1)]},
+        {"nombre": "productos activos por nombre", "coleccion": "productos",
+         "filtro": {"estado_producto": 1}, "orden": [("nombre_producto", 1)]},
+        {"nombre": "búsqueda por tokens", "coleccion": "productos",
+         "filtro": {"estado_producto": 1, "busqueda_tokens": "to"}, "orden": [("nombre_producto", 1)]},
+        {"nombre": "prefijo de código", "coleccion": "productos",
+         "filtro": {"codigo_producto": {"$gte": "PR", "$lt": "PS"}}, "orden": [("codigo_producto", 1)]},
+        {"nombre": "listado de stock", "coleccion": "stock",
+         "filtro": {"estado_stock": 1}, "orden": [("producto_nombre", 1), ("id_stock", 1)]},
+        {"nombre": "stock crítico", "coleccion": "stock",
+         "filtro": {"estado_stock": 1, "nivel_stock": "critico"}, "orden": [("producto_nombre", 1), ("id_stock", 1)]},
+        {"nombre": "alertas de stock", "coleccion": "stock",
+         "filtro": {"estado_stock": 1, "$or": [
+             {"alerta_generada": True},
+             {"fecha_vencimiento": {"$ne": None, "$lte": ahora + timedelta(days=30)}}
+         ]}},
+        {"nombre": "stock por producto", "coleccion": "stock", "filtro": {"producto_id": 1}},
+        {"nombre": "kardex por producto", "coleccion": "kardex",
+         "filtro": {"producto_id": 1, "fecha_movimiento": {"$lte": ahora}},
+         "orden": [("fecha_movimiento", -1), ("id_kardex", -1)]},
+        {"nombre": "kardex por rango de fechas", "coleccion": "kardex",
+         "filtro": {"fecha_movimiento": {"$gte": ahora - timedelta(days=30)}},
+         "orden": [("fecha_movimiento", -1), ("id_kardex", -1)]},
+        {"nombre": "snapshot de kardex", "coleccion": "kardex_snapshots",
+         "filtro": {"producto_id": 1, "fecha_corte": {"$lte": ahora}},
+         "orden": [("fecha_corte", -1), ("id_kardex", -1)]},
+        {"nombre": "histórico de producto", "coleccion": "h_productos",
+         "filtro": {"id_producto": 1}, "orden": [("action_timestamp", -1)]},
+        {"nombre": "logs recientes", "coleccion": "log_general",
+         "filtro": {}, "orden": [("timestamp", -1)]},
+        {"nombre": "logs por módulo", "coleccion": "log_general",
+         "filtro": {"module": "productos"}, "orden": [("timestamp", -1)]},
+        {"nombre": "progreso de importación", "coleccion": "importaciones", "filtro": {"id_importacion": 1}},
+        {"nombre": "contador de IDs", "coleccion": "contador_general", "filtro": {"modulo": "productos"}}
+    ]
+
+def etapas_plan(plan: Any) -> List[str]:
+    """Etapas de un plan de ejecución (recorre inputStage/inputStages/queryPlan)"""
+    etapas = []
+
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            etapas.append(plan["stage"])
+        for valor in plan.values():
+            etapas.extend(etapas_plan(valor))
+    elif isinstance(plan, list):
+        for valor in plan:
+            etapas.extend(etapas_plan(valor))
+
+    return etapas
+
+async def reporte_cobertura() -> List[Dict[str, Any]]:
+    """
+    Explicar las consultas frecuentes y señalar las no cubiertas
+
+    Una consulta no está cubierta si su plan ganador recorre la colección
+    completa (COLLSCAN) u ordena en memoria (SORT).
+    """
+    reporte = []
+
+    for consulta in consultas_frecuentes():
+        cursor = database.get_collection(consulta["coleccion"]).find(consulta["filtro"]).limit(20)
+        if consulta.get("orden"):
+            cursor = cursor.sort(consulta["orden"])
+
+        try:
+            explicacion = await cursor.explain()
+            etapas = etapas_plan(explicacion.get("queryPlanner", {}).get("winningPlan", {}))
+            problemas = [etapa for etapa in ("COLLSCAN", "SORT") if etapa in etapas]
+            reporte.append({
+                "nombre": consulta["nombre"],
+                "coleccion": consulta["coleccion"],
+                "cubierta": not problemas,
+                "problemas": problemas,
+                "etapas": etapas
+            })
+        except Exception as e:
+            reporte.append({
+                "nombre": consulta["nombre"],
+                "coleccion": consulta["coleccion"],
+                "cubierta": False,
+                "problemas": [f"error: {e}"],
+                "etapas": []
+            })
+
+    no_cubiertas = [r["nombre"] for r in reporte if not r["cubierta"]]
+    if no_cubiertas:
+        logger.warning(f"Consultas sin índice adecuado: {no_cubiertas}")
+
+    return reporte
+
+def estadisticas_indices() -> Dict[str, Any]:
+    """Versión del registro y resultado de la última sincronización"""
+    return {"version_registro": INDICES_VERSION, "ultima_sincronizacion": ultimo_resultado}
+
+async def _cli(eliminar_sobrantes: bool, reporte: bool):
+    await database.connect_to_mongo()
+    try:
+        resultado = await sincronizar_indices(eliminar_sobrantes=eliminar_sobrantes)
+        print(f"Sincronización: {resultado}")
+
+        if reporte:
+            for consulta in await reporte_cobertura():
+                marca = "OK " if consulta["cubierta"] else "NO "
+                detalle = f" ({', '.join(consulta['problemas'])})" if consulta["problemas"] else ""
+                print(f"{marca} {consulta['coleccion']}: {consulta['nombre']}{detalle}")
+    finally:
+        await database.close_mongo_connection()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sincronizar índices de MongoDB")
+    parser.add_argument("--eliminar-sobrantes", action="store_true", help="Borrar índices no registrados")
+    parser.add_argument("--reporte", action="store_true", help="Reportar cobertura de consultas frecuentes")
+    argumentos = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_cli(argumentos.eliminar_sobrantes, argumentos.reporte))
@@ -0,0 +1,161 @@
+# backend/app/server/config/log_writer.py
+import os
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuración del escritor de logs en segundo plano
+LOG_COLA_MAX = int(os.getenv("LOG_COLA_MAX", 10000))
+LOG_LOTE_MAX = int(os.getenv("LOG_LOTE_MAX", 500))
+LOG_LOTE_INTERVALO = float(os.getenv("LOG_LOTE_INTERVALO", 1.0))
+# Durabilidad: "criticas" (acciones críticas se escriben en línea), "todas" o "ninguna"
+LOG_MODO_DURABLE = os.getenv("LOG_MODO_DURABLE", "criticas").lower()
+LOG_ACCIONES_CRITICAS = {
+    accion.strip()
+    for accion in os.getenv(
+        "LOG_ACCIONES_CRITICAS",
+        "LOGIN_SUCCESS,PASSWORD_CHANGED,USER_CREATED,USER_DELETED,PRODUCT_DELETED,DELETED"
+    ).split(",")
+    if accion.strip()
+}
+
+class EscritorLogs:
+    """
+    Escritura en lote de logs de actividad e históricos
+
+    Los registros se encolan en una cola acotada y un worker del event loop
+    los inserta con insert_many por colección, cada LOG_LOTE_MAX registros o
+    cada LOG_LOTE_INTERVALO segundos. Si la cola está llena el registro se
+    descarta y se contabiliza. Al detenerse se vacía la cola.
+    """
+
+    def __init__(self, obtener_coleccion: Callable[[str], Any]):
+        self.obtener_coleccion = obtener_coleccion
+        self._cola: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.encolados = 0
+        self.escritos = 0
+        self.lotes = 0
+        self.errores = 0
+        self.descartados: Dict[str, int] = defaultdict(int)
+
+    @property
+    def activo(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def es_durable(self, accion: str) -> bool:
+        """Indicar si la acción debe escribirse en línea (no en segundo plano)"""
+        if LOG_MODO_DURABLE == "todas":
+            return True
+        if LOG_MODO_DURABLE == "ninguna":
+            return False
+        return accion in LOG_ACCIONES_CRITICAS
+
+    def iniciar(self):
+        """Crear la cola e iniciar el worker (startup de la aplicación)"""
+        if self.activo:
+            return
+
+        self._cola = asyncio.Queue(maxsize=LOG_COLA_MAX)
+        self._worker = asyncio.create_task(self._procesar())
+        logger.info("Escritor de logs en segundo plano iniciado")
+
+    async def detener(self):
+        """Vaciar la cola pendiente y detener el worker (shutdown)"""
+        if not self.activo:
+            return
+
+        await self._cola.put(None)
+        await self._worker
+        self._worker = None
+        logger.info(f"Escritor de logs detenido ({self.escritos} registros escritos)")
+
+    def encolar(self, coleccion: str, documento: dict) -> bool:
+        """
+        Encolar un documento para escritura en lote
+
+        Retorna False si el escritor no está activo (el llamador escribe en
+        línea). Con la cola llena el registro se descarta y se contabiliza.
+        """
+        if not self.activo:
+            return False
+
+        try:
+            self._cola.put_nowait((coleccion, documento))
+            self.encolados += 1
+        except asyncio.QueueFull:
+            self.descartados[coleccion] += 1
+            if self.descartados[coleccion] % 1000 == 1:
+                logger.warning(f"Cola de logs llena: registros descartados en {coleccion}")
+
+        return True
+
+    async def _procesar(self):
+        """Worker: juntar registros por tamaño o tiempo y escribirlos en lote"""
+        loop = asyncio.get_running_loop()
+        terminar = False
+
+        while not terminar:
+            item = await self._cola.get()
+            if item is None:
+                break
+
+            lote: List[Tuple[str, dict]] = [item]
+            limite = loop.time() + LOG_LOTE_INTERVALO
+
+            while len(lote) < LOG_LOTE_MAX:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._cola.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    terminar = True
+                    break
+                lote.append(item)
+
+            await self._escribir(lote)
+
+        # Vaciar lo que quede en la cola antes de terminar
+        pendientes = []
+        while not self._cola.empty():
+            item = self._cola.get_nowait()
+            if item is not None:
+                pendientes.append(item)
+
+        for inicio in range(0, len(pendientes), LOG_LOTE_MAX):
+            await self._escribir(pendientes[inicio:inicio + LOG_LOTE_MAX])
+
+    async def _escribir(self, lote: List[Tuple[str, dict]]):
+        """Insertar un lote agrupado por colección"""
+        por_coleccion: Dict[str, List[dict]] = defaultdict(list)
+        for coleccion, documento in lote:
+            por_coleccion[coleccion].append(documento)
+
+        for coleccion, documentos in por_coleccion.items():
+            try:
+                await self.obtener_coleccion(coleccion).insert_many(documentos, ordered=False)
+                self.escritos += len(documentos)
+                self.lotes += 1
+            except Exception as e:
+                self.errores += 1
+                logger.error(f"Error escribiendo lote de logs en {coleccion}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del escritor de logs"""
+        return {
+            "activo": self.activo,
+            "modo_durable": LOG_MODO_DURABLE,
+            "en_cola": self._cola.qsize() if self._cola else 0,
+            "max_cola": LOG_COLA_MAX,
+            "encolados": self.encolados,
+            "escritos": self.escritos,
+            "lotes": self.lotes,
+            "errores": self.errores,
+            "descartados": dict(self.descartados)
+        }
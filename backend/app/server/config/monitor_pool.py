@@ -0,0 +1,75 @@
+# backend/app/server/config/monitor_pool.py
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+class MonitorPool(monitoring.ConnectionPoolListener):
+    """
+    Métricas del pool de conexiones de MongoDB (eventos CMAP)
+
+    Los eventos llegan desde los hilos del driver, por lo que los contadores
+    se protegen con un lock. Se agregan por servidor (host:puerto).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servidores: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _sumar(self, address, campo: str, valor: int = 1):
+        servidor = f"{address[0]}:{address[1]}" if address else "desconocido"
+        with self._lock:
+            self._servidores[servidor][campo] += valor
+
+    # Pool
+    def pool_created(self, event):
+        self._sumar(event.address, "pools_creados")
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._sumar(event.address, "pools_limpiados")
+        logger.warning(f"Pool de MongoDB limpiado: {event.address}")
+
+    def pool_closed(self, event):
+        pass
+
+    # Conexiones
+    def connection_created(self, event):
+        self._sumar(event.address, "conexiones_abiertas")
+        self._sumar(event.address, "conexiones_creadas")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._sumar(event.address, "conexiones_abiertas", -1)
+        self._sumar(event.address, "conexiones_cerradas")
+
+    # Checkout (en_espera = solicitudes esperando una conexión libre)
+    def connection_check_out_started(self, event):
+        self._sumar(event.address, "en_espera")
+
+    def connection_check_out_failed(self, event):
+        self._sumar(event.address, "en_espera", -1)
+        self._sumar(event.address, f"checkout_fallidos_{event.reason}")
+        logger.warning(f"Checkout de conexión fallido ({event.reason}): {event.address}")
+
+    def connection_checked_out(self, event):
+        self._sumar(event.address, "en_espera", -1)
+        self._sumar(event.address, "en_uso")
+        self._sumar(event.address, "checkouts")
+
+    def connection_checked_in(self, event):
+        self._sumar(event.address, "en_uso", -1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Conexiones abiertas, en uso y cola de espera por servidor"""
+        with self._lock:
+            return {servidor: dict(contadores) for servidor, contadores in self._servidores.items()}
+
+monitor_pool = MonitorPool()
@@ -1,7 +1,10 @@
 # backend/app/server/config/security.py
 import os
 import jwt
+import time
 import bcrypt
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
@@ -17,6 +20,63 @@ JWT_EXPIRE_HOURS = int(os.getenv("JWT_EXPIRE_HOURS", 8))
 if not JWT_SECRET:
     raise ValueError("JWT_SECRET no está configurada")
 
+# Pool dedicado para bcrypt (libera el GIL, no bloquea el event loop)
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", min(4, os.cpu_count() or 1)))
+BCRYPT_MAX_PENDIENTES = int(os.getenv("BCRYPT_MAX_PENDIENTES", 64))
+
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_metricas = {
+    "pendientes": 0,
+    "max_pendientes_observado": 0,
+    "completadas": 0,
+    "rechazadas": 0,
+    "tiempo_total_segundos": 0.0
+}
+
+async def _ejecutar_bcrypt(funcion, *args):
+    """Ejecutar operación bcrypt en el pool, con límite de operaciones pendientes"""
+    if _bcrypt_metricas["pendientes"] >= BCRYPT_MAX_PENDIENTES:
+        _bcrypt_metricas["rechazadas"] += 1
+        logger.warning("Pool de bcrypt saturado, solicitud rechazada")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servicio ocupado, intente nuevamente en unos segundos"
+        )
+    
+    _bcrypt_metricas["pendientes"] += 1
+    _bcrypt_metricas["max_pendientes_observado"] = max(
+        _bcrypt_metricas["max_pendientes_observado"],
+        _bcrypt_metricas["pendientes"]
+    )
+    inicio = time.perf_counter()
+    
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_bcrypt_executor, funcion, *args)
+    finally:
+        _bcrypt_metricas["pendientes"] -= 1
+        _bcrypt_metricas["completadas"] += 1
+        _bcrypt_metricas["tiempo_total_segundos"] += time.perf_counter() - inicio
+
+def estadisticas_bcrypt() -> Dict[str, Any]:
+    """Métricas del pool de bcrypt"""
+    completadas = _bcrypt_metricas["completadas"]
+    return {
+        "workers": BCRYPT_WORKERS,
+        "max_pendientes": BCRYPT_MAX_PENDIENTES,
+        "pendientes": _bcrypt_metricas["pendientes"],
+        "max_pendientes_observado": _bcrypt_metricas["max_pendientes_observado"],
+        "completadas": completadas,
+        "rechazadas": _bcrypt_metricas["rechazadas"],
+        "tiempo_promedio_ms": round(
+            _bcrypt_metricas["tiempo_total_segundos"] / completadas * 1000, 2
+        ) if completadas else 0.0
+    }
+
+def cerrar_pool_bcrypt():
+    """Liberar los hilos del pool de bcrypt (shutdown)"""
+    _bcrypt_executor.shutdown(wait=False)
+
 class SecurityManager:
     """Gestor de seguridad para el sistema"""
     
@@ -47,6 +107,16 @@ class SecurityManager:
             logger.error(f"Error verificando contraseña: {e}")
             return False
     
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """Encriptar contraseña en el pool de bcrypt"""
+        return await _ejecutar_bcrypt(SecurityManager.hash_password, password)
+    
+    @staticmethod
+    async def verify_password_async(password: str, hashed_password: str) -> bool:
+        """Verificar contraseña en el pool de bcrypt"""
+        return await _ejecutar_bcrypt(SecurityManager.verify_password, password, hashed_password)
+    
     @staticmethod
     def create_access_token(data: Dict[str, Any]) -> str:
         """Crear JWT token"""
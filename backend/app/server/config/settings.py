@@ -1,7 +1,11 @@
 # backend/app/server/config/settings.py
 import os
 from typing import Optional, List
-from pydantic import BaseSettings, validator
+try:
+   from pydantic import BaseSettings, validator
+except ImportError:
+   # pydantic 2 (requirements) mueve BaseSettings; se usa la API v1 incluida
+   from pydantic.v1 import BaseSettings, validator
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
@@ -86,7 +90,7 @@ class Settings(BaseSettings):
    
    # ===== REDIS (CACHE) =====
    redis_url: str = os.getenv("REDIS_URL", "redis://redis:6379")
-   redis_enabled: bool = False  # Por ahora deshabilitado en Fase 1
+   redis_enabled: bool = os.getenv("REDIS_ENABLED", "false").lower() == "true"
    cache_expire_seconds: int = int(os.getenv("CACHE_EXPIRE_SECONDS", 3600))
    
    # ===== EMAIL/NOTIFICACIONES =====
@@ -124,10 +128,12 @@ class Settings(BaseSettings):
    session_timeout_hours: int = jwt_expire_hours
    
    # ===== CONFIGURACIONES DE PERFORMANCE =====
-   db_connection_pool_size: int = 10
-   db_max_overflow: int = 20
-   db_pool_timeout: int = 30
+   db_connection_pool_size: int = int(os.getenv("DB_POOL_SIZE", 10))
+   db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+   db_pool_timeout: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
    api_rate_limit_per_minute: int = 100
+   # Backend del rate limiter: "memoria" (por proceso) o "redis" (compartido entre workers)
+   rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "redis" if redis_enabled else "memoria")
    max_concurrent_requests: int = 50
    
    # Paginación
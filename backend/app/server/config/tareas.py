@@ -0,0 +1,55 @@
+# backend/app/server/config/tareas.py
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Tareas periódicas en segundo plano (dentro del event loop de la aplicación)
+_tareas: Dict[str, asyncio.Task] = {}
+
+async def _ejecutar_periodicamente(
+    nombre: str,
+    intervalo_segundos: float,
+    funcion: Callable[[], Awaitable],
+    ejecutar_al_inicio: bool
+):
+    """Bucle de ejecución de una tarea; los errores se registran y no detienen el bucle"""
+    if not ejecutar_al_inicio:
+        await asyncio.sleep(intervalo_segundos)
+
+    while True:
+        try:
+            await funcion()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en tarea periódica {nombre}: {e}")
+
+        await asyncio.sleep(intervalo_segundos)
+
+def iniciar_tarea_periodica(
+    nombre: str,
+    intervalo_segundos: float,
+    funcion: Callable[[], Awaitable],
+    ejecutar_al_inicio: bool = False
+):
+    """Programar una función async para ejecutarse cada intervalo_segundos"""
+    if nombre in _tareas and not _tareas[nombre].done():
+        logger.warning(f"Tarea periódica {nombre} ya estaba iniciada")
+        return
+
+    _tareas[nombre] = asyncio.create_task(
+        _ejecutar_periodicamente(nombre, intervalo_segundos, funcion, ejecutar_al_inicio)
+    )
+    logger.info(f"Tarea periódica {nombre} iniciada (cada {intervalo_segundos}s)")
+
+async def detener_tareas():
+    """Cancelar todas las tareas periódicas y esperar su finalización"""
+    for tarea in _tareas.values():
+        tarea.cancel()
+
+    await asyncio.gather(*_tareas.values(), return_exceptions=True)
+    _tareas.clear()
+
+    logger.info("Tareas periódicas detenidas")
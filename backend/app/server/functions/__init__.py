@@ -25,8 +25,10 @@ from .stock import (
     obtener_stock,
     obtener_stock_por_producto,
     ajustar_stock,
+    ajustar_stock_masivo,
     obtener_alertas_stock,
     calcular_valoracion_inventario,
+    obtener_resumen_stock,
     obtener_movimientos_stock
 )
 
@@ -57,7 +59,9 @@ __all__ = [
     "obtener_stock",
     "obtener_stock_por_producto",
     "ajustar_stock",
+    "ajustar_stock_masivo",
     "obtener_alertas_stock",
     "calcular_valoracion_inventario",
+    "obtener_resumen_stock",
     "obtener_movimientos_stock"
 ]
\ No newline at end of file
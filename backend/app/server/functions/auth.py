@@ -2,6 +2,7 @@
 from fastapi import HTTPException, status
 from server.config.database import usuarios_collection, log_activity
 from server.config.security import SecurityManager
+from server.config.cache import cache_usuarios
 from server.models.usuarios import UsuarioLogin, ChangePassword
 from datetime import datetime
 import logging
@@ -24,7 +25,7 @@ async def authenticate_user(login_data: UsuarioLogin):
             )
         
         # Verificar contraseña
-        if not SecurityManager.verify_password(login_data.password, usuario["password_hash"]):
+        if not await SecurityManager.verify_password_async(login_data.password, usuario["password_hash"]):
             logger.warning(f"Contraseña incorrecta para usuario: {login_data.email_usuario}")
             #aquiva la validacion 
             print("Contraseña incorrecta para usuario:", login_data.password)
@@ -63,6 +64,8 @@ async def authenticate_user(login_data: UsuarioLogin):
         access_token = SecurityManager.create_access_token(token_data)
         refresh_token = SecurityManager.create_refresh_token(token_data)
         
+        cache_usuarios.invalidate(usuario["id_usuario"])
+        
         # Log de actividad
         await log_activity(
             action="LOGIN_SUCCESS",
@@ -114,14 +117,14 @@ async def change_user_password(user_id: int, password_data: ChangePassword):
             )
         
         # Verificar contraseña actual
-        if not SecurityManager.verify_password(password_data.current_password, usuario["password_hash"]):
+        if not await SecurityManager.verify_password_async(password_data.current_password, usuario["password_hash"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Contraseña actual incorrecta"
             )
         
         # Hash de la nueva contraseña
-        new_password_hash = SecurityManager.hash_password(password_data.new_password)
+        new_password_hash = await SecurityManager.hash_password_async(password_data.new_password)
         
         # Actualizar en base de datos
         await usuarios_collection().update_one(
@@ -135,6 +138,8 @@ async def change_user_password(user_id: int, password_data: ChangePassword):
             }
         )
         
+        cache_usuarios.invalidate(user_id)
+        
         # Log de actividad
         await log_activity(
             action="PASSWORD_CHANGED",
@@ -162,20 +167,25 @@ async def verify_user_token(token: str):
         # Decodificar token
         payload = SecurityManager.verify_token(token)
         
-        # Buscar usuario en BD para verificar que sigue activo
-        usuario = await usuarios_collection().find_one(
-            {"id_usuario": payload["user_id"], "estado_usuario": 1},
-            {"password_hash": 0, "_id": 0}
-        )
+        # Verificar que el usuario sigue activo (cache en memoria, luego BD)
+        usuario = cache_usuarios.get(payload["user_id"])
         
-        if not usuario:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Usuario no válido"
+        if usuario is None:
+            usuario = await usuarios_collection().find_one(
+                {"id_usuario": payload["user_id"], "estado_usuario": 1},
+                {"password_hash": 0, "_id": 0}
             )
+            
+            if not usuario:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Usuario no válido"
+                )
+            
+            cache_usuarios.set(payload["user_id"], usuario)
         
         return {
-            "user": usuario,
+            "user": dict(usuario),
             "token_data": payload
         }
         
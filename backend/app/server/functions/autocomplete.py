@@ -0,0 +1,241 @@
+# backend/app/server/functions/autocomplete.py
+from bisect import bisect_left, insort
+from server.config.database import productos_collection, soporta_transacciones
+from server.config.tareas import iniciar_tarea_periodica
+from server.functions.busqueda import palabras, tokens_consulta, ordenar_por_relevancia
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Índice de autocomplete en memoria (opcional, por proceso)
+AUTOCOMPLETE_MEMORIA = os.getenv("AUTOCOMPLETE_MEMORIA", "false").lower() == "true"
+# Refresco entre workers: "auto" (change stream si hay replica set, si no polling), "stream" o "polling"
+AUTOCOMPLETE_REFRESCO = os.getenv("AUTOCOMPLETE_REFRESCO", "auto").lower()
+AUTOCOMPLETE_POLLING_SEGUNDOS = float(os.getenv("AUTOCOMPLETE_POLLING_SEGUNDOS", 5))
+# Máximo de candidatos examinados por consulta antes del ranking
+AUTOCOMPLETE_MAX_CANDIDATOS = int(os.getenv("AUTOCOMPLETE_MAX_CANDIDATOS", 2000))
+
+PROYECCION_AUTOCOMPLETE = {
+    "id_producto": 1,
+    "codigo_producto": 1,
+    "nombre_producto": 1,
+    "magnitud_producto": 1,
+    "estado_producto": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "_id": 0
+}
+
+def claves_producto(producto: dict) -> List[str]:
+    """Palabras normalizadas de código (incluido compacto) y nombre"""
+    palabras_codigo = palabras(producto.get("codigo_producto"))
+    claves = set(palabras_codigo + palabras(producto.get("nombre_producto")))
+
+    if len(palabras_codigo) > 1:
+        claves.add("".join(palabras_codigo))
+
+    return sorted(claves)
+
+class IndicePrefijos:
+    """
+    Índice de prefijos compacto de productos activos
+
+    Guarda un arreglo ordenado de (palabra, id_producto); un prefijo se
+    resuelve con búsqueda binaria y un recorrido del rango contiguo. Es más
+    compacto que un trie de nodos y admite altas/bajas con insort.
+    """
+
+    def __init__(self):
+        self._claves: List[Tuple[str, int]] = []
+        self._productos: Dict[int, dict] = {}
+        self._palabras: Dict[int, List[str]] = {}
+        self.listo = False
+        self.ultima_marca: Optional[datetime] = None
+        self.consultas = 0
+        self.actualizaciones = 0
+
+    def _quitar(self, id_producto: int):
+        for palabra in self._palabras.pop(id_producto, []):
+            indice = bisect_left(self._claves, (palabra, id_producto))
+            if indice < len(self._claves) and self._claves[indice] == (palabra, id_producto):
+                del self._claves[indice]
+        self._productos.pop(id_producto, None)
+
+    def _marcar(self, producto: dict):
+        marca = max(
+            (fecha for fecha in (producto.get("created_at"), producto.get("updated_at")) if fecha),
+            default=None
+        )
+        if marca and (self.ultima_marca is None or marca > self.ultima_marca):
+            self.ultima_marca = marca
+
+    def actualizar(self, producto: dict):
+        """Alta, modificación o baja (estado 0) de un producto"""
+        if not self.listo:
+            return
+
+        id_producto = producto["id_producto"]
+        self._quitar(id_producto)
+        self._marcar(producto)
+        self.actualizaciones += 1
+
+        if producto.get("estado_producto", 1) != 1:
+            return
+
+        self._productos[id_producto] = {
+            "id_producto": id_producto,
+            "codigo_producto": producto.get("codigo_producto"),
+            "nombre_producto": producto.get("nombre_producto"),
+            "magnitud_producto": producto.get("magnitud_producto")
+        }
+        self._palabras[id_producto] = claves_producto(producto)
+
+        for palabra in self._palabras[id_producto]:
+            insort(self._claves, (palabra, id_producto))
+
+    def eliminar(self, id_producto: int):
+        """Quitar un producto del índice"""
+        if self.listo:
+            self._quitar(id_producto)
+            self.actualizaciones += 1
+
+    def _ids_con_prefijo(self, prefijo: str) -> List[int]:
+        ids = []
+        indice = bisect_left(self._claves, (prefijo,))
+
+        while indice < len(self._claves) and len(ids) < AUTOCOMPLETE_MAX_CANDIDATOS:
+            palabra, id_producto = self._claves[indice]
+            if not palabra.startswith(prefijo):
+                break
+            ids.append(id_producto)
+            indice += 1
+
+        return ids
+
+    def buscar(self, query: str, limit: int = 10) -> List[dict]:
+        """Productos cuyo código o nombre tiene palabras que empiezan con cada palabra de la consulta"""
+        self.consultas += 1
+        consulta = tokens_consulta(query)
+        if not consulta:
+            return []
+
+        # Recorrer el rango de la palabra más selectiva (la más larga)
+        consulta.sort(key=len, reverse=True)
+        candidatos = dict.fromkeys(self._ids_con_prefijo(consulta[0]))
+
+        resultados = []
+        for id_producto in candidatos:
+            palabras_producto = self._palabras.get(id_producto, [])
+            if all(any(p.startswith(q) for p in palabras_producto) for q in consulta[1:]):
+                resultados.append(self._productos[id_producto])
+
+        resultados.sort(key=lambda producto: producto["nombre_producto"] or "")
+        return ordenar_por_relevancia(resultados, query)[:limit]
+
+    async def construir(self):
+        """Cargar productos activos desde MongoDB"""
+        cursor = productos_collection().find({"estado_producto": 1}, PROYECCION_AUTOCOMPLETE)
+
+        self.listo = False
+        self._productos, self._palabras = {}, {}
+        self.ultima_marca = None
+
+        claves = []
+        async for producto in cursor:
+            id_producto = producto["id_producto"]
+            self._productos[id_producto] = {
+                "id_producto": id_producto,
+                "codigo_producto": producto.get("codigo_producto"),
+                "nombre_producto": producto.get("nombre_producto"),
+                "magnitud_producto": producto.get("magnitud_producto")
+            }
+            self._palabras[id_producto] = claves_producto(producto)
+            claves.extend((palabra, id_producto) for palabra in self._palabras[id_producto])
+            self._marcar(producto)
+
+        claves.sort()
+        self._claves = claves
+        self.ultima_marca = self.ultima_marca or datetime.now()
+        self.listo = True
+
+        logger.info(f"Índice de autocomplete construido: {len(self._productos)} productos")
+
+    async def refrescar(self):
+        """Polling: aplicar productos creados/modificados desde la última marca"""
+        if self.ultima_marca is None:
+            return
+
+        # Margen para tolerar desfase de reloj entre workers (las altas son idempotentes)
+        desde = self.ultima_marca - timedelta(seconds=AUTOCOMPLETE_POLLING_SEGUNDOS)
+        cursor = productos_collection().find(
+            {"$or": [{"updated_at": {"$gt": desde}}, {"created_at": {"$gt": desde}}]},
+            PROYECCION_AUTOCOMPLETE
+        )
+
+        async for producto in cursor:
+            self.actualizar(producto)
+
+    async def escuchar_cambios(self):
+        """Change stream: aplicar cambios de productos hechos por otros workers"""
+        while True:
+            try:
+                async with productos_collection().watch(
+                    [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}],
+                    full_document="updateLookup"
+                ) as stream:
+                    async for cambio in stream:
+                        producto = cambio.get("fullDocument")
+                        if producto and "id_producto" in producto:
+                            self.actualizar(producto)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Change stream de autocomplete interrumpido: {e}")
+                # Reconstruir para no perder cambios ocurridos sin stream
+                await asyncio.sleep(AUTOCOMPLETE_POLLING_SEGUNDOS)
+                await self.construir()
+
+    def stats(self) -> dict:
+        return {
+            "activo": self.listo,
+            "productos": len(self._productos),
+            "claves": len(self._claves),
+            "consultas": self.consultas,
+            "actualizaciones": self.actualizaciones
+        }
+
+indice_autocomplete = IndicePrefijos()
+
+async def iniciar_indice_autocomplete():
+    """Construir el índice y programar su refresco (si AUTOCOMPLETE_MEMORIA está activo)"""
+    if not AUTOCOMPLETE_MEMORIA:
+        return
+
+    try:
+        await indice_autocomplete.construir()
+    except Exception as e:
+        indice_autocomplete.listo = False
+        logger.error(f"Error construyendo índice de autocomplete: {e}")
+        return
+
+    usar_stream = AUTOCOMPLETE_REFRESCO == "stream" or (
+        AUTOCOMPLETE_REFRESCO == "auto" and soporta_transacciones()
+    )
+
+    if usar_stream:
+        iniciar_tarea_periodica(
+            "autocomplete_stream",
+            AUTOCOMPLETE_POLLING_SEGUNDOS,
+            indice_autocomplete.escuchar_cambios,
+            ejecutar_al_inicio=True
+        )
+    else:
+        iniciar_tarea_periodica(
+            "autocomplete_polling",
+            AUTOCOMPLETE_POLLING_SEGUNDOS,
+            indice_autocomplete.refrescar
+        )
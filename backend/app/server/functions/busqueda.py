@@ -0,0 +1,220 @@
+# backend/app/server/functions/busqueda.py
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+from server.config.database import productos_collection
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Longitudes de prefijo (edge n-gram) indexadas por palabra
+BUSQUEDA_NGRAM_MIN = int(os.getenv("BUSQUEDA_NGRAM_MIN", 2))
+BUSQUEDA_NGRAM_MAX = int(os.getenv("BUSQUEDA_NGRAM_MAX", 15))
+# Incrementar al cambiar la tokenización para regenerar los tokens existentes
+BUSQUEDA_VERSION = 1
+
+# Campos de producto que alimentan los tokens (código y nombre sin prefijo,
+# categoría y proveedor con prefijo para filtrar por campo)
+CAMPOS_BUSQUEDA = {
+    "codigo_producto": "",
+    "nombre_producto": "",
+    "categoria_producto": "cat:",
+    "proveedor_producto": "prov:"
+}
+
+# Límites de entrada para rechazar patrones patológicos
+BUSQUEDA_MAX_LARGO = int(os.getenv("BUSQUEDA_MAX_LARGO", 100))
+BUSQUEDA_MAX_PALABRAS = int(os.getenv("BUSQUEDA_MAX_PALABRAS", 8))
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+_PATRON_CODIGO = re.compile(r"^[A-Z0-9][A-Z0-9._/-]*$")
+_PATRON_EMAIL = re.compile(r"^[^@\s]+@[^@\s]*$")
+
+def normalizar_texto(texto: Optional[str]) -> str:
+    """Minúsculas, sin tildes ni diéresis (á→a, ñ→n, ü→u) y solo alfanuméricos"""
+    if not texto:
+        return ""
+
+    descompuesto = unicodedata.normalize("NFKD", str(texto).lower())
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(" ", sin_tildes).strip()
+
+def palabras(texto: Optional[str]) -> List[str]:
+    """Palabras normalizadas de un texto"""
+    return normalizar_texto(texto).split()
+
+def edge_ngrams(palabra: str) -> List[str]:
+    """Prefijos de una palabra entre BUSQUEDA_NGRAM_MIN y BUSQUEDA_NGRAM_MAX"""
+    maximo = min(len(palabra), BUSQUEDA_NGRAM_MAX)
+    return [palabra[:n] for n in range(BUSQUEDA_NGRAM_MIN, maximo + 1)]
+
+def generar_tokens_busqueda(producto: dict) -> List[str]:
+    """Tokens de búsqueda (prefijos de cada palabra) de un producto"""
+    tokens = set()
+
+    for campo, prefijo in CAMPOS_BUSQUEDA.items():
+        palabras_campo = palabras(producto.get(campo))
+
+        # El código también se indexa compacto: "PRD-001" → "prd001"
+        if campo == "codigo_producto" and len(palabras_campo) > 1:
+            palabras_campo.append("".join(palabras_campo))
+
+        for palabra in palabras_campo:
+            tokens.update(prefijo + token for token in edge_ngrams(palabra))
+
+    return sorted(tokens)
+
+def campos_tokens_busqueda(producto: dict) -> Dict[str, object]:
+    """Campos a guardar en el documento de producto"""
+    return {
+        "busqueda_tokens": generar_tokens_busqueda(producto),
+        "busqueda_version": BUSQUEDA_VERSION
+    }
+
+def requiere_tokens(campos_actualizados: Iterable[str]) -> bool:
+    """Indicar si una actualización modifica campos que alimentan los tokens"""
+    return any(campo in CAMPOS_BUSQUEDA for campo in campos_actualizados)
+
+def tokens_consulta(texto: Optional[str], prefijo: str = "") -> List[str]:
+    """
+    Tokens a buscar para un texto ingresado por el usuario
+
+    Cada palabra se recorta a BUSQUEDA_NGRAM_MAX; las palabras más cortas que
+    BUSQUEDA_NGRAM_MIN no se indexan y se ignoran.
+    """
+    return [
+        prefijo + palabra[:BUSQUEDA_NGRAM_MAX]
+        for palabra in palabras(texto)
+        if len(palabra) >= BUSQUEDA_NGRAM_MIN
+    ]
+
+def filtro_tokens(tokens: List[str]) -> dict:
+    """Filtro sobre el índice multikey de tokens (todas las palabras deben coincidir)"""
+    if len(tokens) == 1:
+        return {"busqueda_tokens": tokens[0]}
+    return {"busqueda_tokens": {"$all": tokens}}
+
+def puntaje_coincidencia(producto: dict, texto: str) -> int:
+    """Ranking simple: código exacto > prefijo de código > prefijo de nombre > palabra"""
+    consulta = normalizar_texto(texto)
+    codigo = normalizar_texto(producto.get("codigo_producto"))
+    nombre = normalizar_texto(producto.get("nombre_producto"))
+
+    if codigo == consulta or codigo.replace(" ", "") == consulta.replace(" ", ""):
+        return 4
+    if codigo.startswith(consulta):
+        return 3
+    if nombre.startswith(consulta):
+        return 2
+    return 1
+
+def ordenar_por_relevancia(productos: List[dict], texto: str) -> List[dict]:
+    """Ordenar por puntaje de coincidencia (estable: conserva orden por nombre)"""
+    return sorted(productos, key=lambda producto: -puntaje_coincidencia(producto, texto))
+
+async def sincronizar_tokens_busqueda(tamano_lote: int = 1000):
+    """Generar tokens de búsqueda para productos sin tokens o con versión anterior"""
+    try:
+        cursor = productos_collection().find(
+            {"busqueda_version": {"$ne": BUSQUEDA_VERSION}},
+            {campo: 1 for campo in CAMPOS_BUSQUEDA}
+        )
+
+        operaciones = []
+        total = 0
+
+        async for producto in cursor:
+            operaciones.append(UpdateOne(
+                {"_id": producto["_id"]},
+                {"$set": campos_tokens_busqueda(producto)}
+            ))
+
+            if len(operaciones) >= tamano_lote:
+                await productos_collection().bulk_write(operaciones, ordered=False)
+                total += len(operaciones)
+                operaciones = []
+
+        if operaciones:
+            await productos_collection().bulk_write(operaciones, ordered=False)
+            total += len(operaciones)
+
+        if total:
+            logger.info(f"Tokens de búsqueda generados para {total} productos")
+
+    except Exception as e:
+        logger.error(f"Error sincronizando tokens de búsqueda: {e}")
+
+# ===== PLANIFICADOR DE CONSULTAS =====
+
+def validar_texto_busqueda(texto: str) -> str:
+    """
+    Validar texto de búsqueda ingresado por el usuario
+
+    Nunca se interpreta como expresión regular; se rechazan entradas muy
+    largas, con demasiadas palabras o sin ningún carácter alfanumérico
+    (por ejemplo ".*.*.*").
+    """
+    texto = (texto or "").strip()
+
+    if len(texto) > BUSQUEDA_MAX_LARGO:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El texto de búsqueda no puede superar {BUSQUEDA_MAX_LARGO} caracteres"
+        )
+
+    cantidad_palabras = len(palabras(texto))
+    if cantidad_palabras == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Patrón de búsqueda inválido"
+        )
+
+    if cantidad_palabras > BUSQUEDA_MAX_PALABRAS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La búsqueda admite hasta {BUSQUEDA_MAX_PALABRAS} palabras"
+        )
+
+    return texto
+
+def rango_prefijo(prefijo: str) -> dict:
+    """Consulta de rango equivalente a /^prefijo/ (usa el índice del campo)"""
+    siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+    return {"$gte": prefijo, "$lt": siguiente}
+
+def es_codigo(texto: str, requiere_digito: bool = True) -> bool:
+    """Reconocer un código (una sola palabra: letras, dígitos y . _ / -)"""
+    codigo = texto.strip().upper()
+    if not _PATRON_CODIGO.match(codigo):
+        return False
+    return not requiere_digito or any(c.isdigit() for c in codigo)
+
+def planificar_busqueda(texto: str, permitir_email: bool = False) -> Tuple[str, str]:
+    """
+    Clasificar una búsqueda libre
+
+    Retorna ("email", prefijo), ("codigo", prefijo) o ("texto", términos).
+    Email y código se resuelven como rangos sobre sus índices únicos; el
+    resto va al índice de texto.
+    """
+    texto = validar_texto_busqueda(texto)
+
+    # Email sin pasar a minúsculas: el valor guardado conserva las mayúsculas
+    # de la parte local y el rango sobre el índice distingue mayúsculas
+    if permitir_email and _PATRON_EMAIL.match(texto):
+        return "email", texto
+
+    if es_codigo(texto):
+        return "codigo", texto.upper()
+
+    return "texto", " ".join(palabras(texto))
+
+def filtro_texto(terminos: str) -> dict:
+    """Filtro sobre el índice de texto (términos ya normalizados, sin operadores)"""
+    return {"$text": {"$search": terminos}}
+
+# Orden por relevancia del índice de texto
+ORDEN_TEXTO = [("score", {"$meta": "textScore"})]
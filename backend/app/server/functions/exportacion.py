@@ -0,0 +1,276 @@
+# backend/app/server/functions/exportacion.py
+from fastapi import HTTPException, status
+from bson import Decimal128
+from server.config.database import stock_collection, productos_collection, LECTURA_REPORTES
+from server.config.settings import settings
+from server.functions.stock import ORDEN_STOCK
+from server.functions.productos import ORDEN_PRODUCTOS
+from datetime import datetime, date
+from decimal import Decimal
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import csv
+import io
+import logging
+import os
+import tempfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Documentos por lote leídos del cursor (equilibrio entre round trips y memoria)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+# Tamaño aproximado de cada bloque enviado al cliente
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", 64 * 1024))
+EXPORT_GZIP_NIVEL = int(os.getenv("EXPORT_GZIP_NIVEL", 6))
+# Carpeta de archivos temporales de XLSX
+REPORTS_FOLDER = settings.reports_folder
+
+FORMATOS_EXPORTACION = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+# Límite de filas de una hoja de Excel (incluye encabezado)
+XLSX_MAX_FILAS = 1048576
+
+# (campo, encabezado) en el orden de las columnas
+COLUMNAS_STOCK = [
+    ("producto_codigo", "Código"),
+    ("producto_nombre", "Producto"),
+    ("magnitud_producto", "Unidad"),
+    ("cantidad_disponible", "Disponible"),
+    ("cantidad_reservada", "Reservada"),
+    ("cantidad_total", "Total"),
+    ("stock_minimo", "Stock mínimo"),
+    ("stock_critico", "Stock crítico"),
+    ("nivel_stock", "Nivel"),
+    ("ubicacion_fisica", "Ubicación"),
+    ("lote_serie", "Lote/Serie"),
+    ("fecha_vencimiento", "Vencimiento"),
+    ("costo_promedio", "Costo promedio"),
+    ("valor_inventario", "Valor inventario"),
+    ("fecha_ultimo_movimiento", "Último movimiento")
+]
+
+COLUMNAS_PRODUCTOS = [
+    ("id_producto", "ID"),
+    ("codigo_producto", "Código"),
+    ("nombre_producto", "Nombre"),
+    ("tipo_producto", "Tipo"),
+    ("categoria_producto", "Categoría"),
+    ("proveedor_producto", "Proveedor"),
+    ("magnitud_producto", "Unidad"),
+    ("costo_unitario", "Costo unitario"),
+    ("precio_referencial", "Precio referencial"),
+    ("ubicacion_fisica", "Ubicación"),
+    ("stock_minimo", "Stock mínimo"),
+    ("stock_maximo", "Stock máximo"),
+    ("stock_critico", "Stock crítico"),
+    ("requiere_lote", "Requiere lote"),
+    ("dias_vida_util", "Días vida útil"),
+    ("estado_producto", "Estado"),
+    ("created_at", "Creado")
+]
+
+def validar_formato_exportacion(formato: str) -> str:
+    """Validar el formato solicitado (y que su librería esté instalada)"""
+    formato = (formato or "").lower()
+
+    if formato not in FORMATOS_EXPORTACION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato no soportado. Use: {', '.join(FORMATOS_EXPORTACION)}"
+        )
+
+    if formato == "xlsx":
+        try:
+            import xlsxwriter  # noqa: F401
+        except ImportError:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Exportación XLSX no disponible (xlsxwriter no instalado)"
+            )
+
+    return formato
+
+def valor_exportable(valor, texto: bool = True):
+    """Convertir un valor de MongoDB a celda (texto para CSV, nativo para XLSX)"""
+    if valor is None:
+        return ""
+    if isinstance(valor, Decimal128):
+        valor = valor.to_decimal()
+    if isinstance(valor, Decimal):
+        return str(valor) if texto else float(valor)
+    if isinstance(valor, bool):
+        return "SI" if valor else "NO"
+    if isinstance(valor, datetime):
+        return valor.strftime("%Y-%m-%d %H:%M:%S") if texto else valor.replace(tzinfo=None)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, (int, float)):
+        return valor
+    return str(valor)
+
+async def bloques_csv(cursor, columnas: List[Tuple[str, str]]) -> AsyncIterator[bytes]:
+    """Filas CSV agrupadas en bloques de ~EXPORT_CHUNK_BYTES (memoria constante)"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    # BOM para que Excel reconozca UTF-8 (tildes y ñ)
+    buffer.write("\ufeff")
+    escritor.writerow([encabezado for _, encabezado in columnas])
+
+    async for documento in cursor:
+        escritor.writerow([valor_exportable(documento.get(campo)) for campo, _ in columnas])
+
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+async def bloques_xlsx(cursor, columnas: List[Tuple[str, str]], nombre_hoja: str) -> AsyncIterator[bytes]:
+    """
+    Libro XLSX escrito en modo constant_memory y enviado por bloques
+
+    El formato zip requiere cerrar el libro antes de enviarlo, por lo que
+    las filas se vuelcan a un archivo temporal (no a memoria) que se borra
+    al terminar.
+    """
+    import xlsxwriter
+
+    os.makedirs(REPORTS_FOLDER, exist_ok=True)
+    descriptor, ruta = tempfile.mkstemp(suffix=".xlsx", dir=REPORTS_FOLDER)
+    os.close(descriptor)
+
+    try:
+        libro = xlsxwriter.Workbook(ruta, {
+            "constant_memory": True,
+            "tmpdir": REPORTS_FOLDER,
+            "default_date_format": "yyyy-mm-dd hh:mm:ss"
+        })
+        hoja = libro.add_worksheet(nombre_hoja)
+        hoja.write_row(0, 0, [encabezado for _, encabezado in columnas])
+
+        fila = 1
+        async for documento in cursor:
+            if fila >= XLSX_MAX_FILAS:
+                logger.warning(f"Exportación XLSX truncada en {XLSX_MAX_FILAS - 1} filas")
+                break
+            hoja.write_row(fila, 0, [valor_exportable(documento.get(campo), texto=False) for campo, _ in columnas])
+            fila += 1
+
+        loop = asyncio.get_running_loop()
+        # Comprimir el libro fuera del event loop
+        await loop.run_in_executor(None, libro.close)
+
+        with open(ruta, "rb") as archivo:
+            while True:
+                bloque = await loop.run_in_executor(None, archivo.read, EXPORT_CHUNK_BYTES)
+                if not bloque:
+                    break
+                yield bloque
+
+    finally:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+async def comprimir_gzip(bloques: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Comprimir un flujo de bloques en formato gzip de forma incremental"""
+    compresor = zlib.compressobj(EXPORT_GZIP_NIVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    async for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+
+    yield compresor.flush()
+
+def generar_exportacion(
+    coleccion,
+    filtros: dict,
+    orden: list,
+    columnas: List[Tuple[str, str]],
+    formato: str,
+    comprimir: bool,
+    nombre: str
+) -> Tuple[AsyncIterator[bytes], str, str]:
+    """
+    Preparar el flujo de exportación
+
+    Retorna (bloques, media_type, nombre_archivo). El cursor se recorre a
+    medida que el cliente consume la respuesta; gzip solo aplica a CSV
+    (XLSX ya es un zip).
+    """
+    formato = validar_formato_exportacion(formato)
+
+    proyeccion = {campo: 1 for campo, _ in columnas}
+    proyeccion["_id"] = 0
+
+    cursor = coleccion.find(filtros, proyeccion, sort=orden, batch_size=EXPORT_BATCH_SIZE)
+
+    marca = datetime.now().strftime("%Y%m%d_%H%M%S")
+    nombre_archivo = f"{nombre}_{marca}.{formato}"
+    media_type = FORMATOS_EXPORTACION[formato]
+
+    if formato == "xlsx":
+        return bloques_xlsx(cursor, columnas, nombre), media_type, nombre_archivo
+
+    bloques = bloques_csv(cursor, columnas)
+    if comprimir:
+        return comprimir_gzip(bloques), "application/gzip", f"{nombre_archivo}.gz"
+
+    return bloques, media_type, nombre_archivo
+
+def exportar_stock(
+    formato: str = "csv",
+    comprimir: bool = False,
+    stock_bajo: bool = False,
+    stock_critico: bool = False
+) -> Tuple[AsyncIterator[bytes], str, str]:
+    """Exportar la vista de stock activa (mismos filtros que el listado)"""
+    filtros = {"estado_stock": 1}
+
+    if stock_critico:
+        filtros["nivel_stock"] = "critico"
+    elif stock_bajo:
+        filtros["nivel_stock"] = {"$in": ["bajo", "critico"]}
+
+    return generar_exportacion(
+        stock_collection(LECTURA_REPORTES),
+        filtros,
+        ORDEN_STOCK,
+        COLUMNAS_STOCK,
+        formato,
+        comprimir,
+        "stock"
+    )
+
+def exportar_productos(
+    formato: str = "csv",
+    comprimir: bool = False,
+    estado: Optional[int] = None,
+    tipo: Optional[str] = None
+) -> Tuple[AsyncIterator[bytes], str, str]:
+    """Exportar el catálogo de productos (mismos filtros que el listado)"""
+    filtros = {}
+
+    if estado is not None:
+        filtros["estado_producto"] = estado
+    if tipo:
+        filtros["tipo_producto"] = tipo
+
+    return generar_exportacion(
+        productos_collection(LECTURA_REPORTES),
+        filtros,
+        ORDEN_PRODUCTOS,
+        COLUMNAS_PRODUCTOS,
+        formato,
+        comprimir,
+        "productos"
+    )
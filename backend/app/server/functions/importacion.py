@@ -0,0 +1,482 @@
+# backend/app/server/functions/importacion.py
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from server.config.database import (
+    productos_collection,
+    stock_collection,
+    kardex_snapshots_collection,
+    importaciones_collection,
+    get_next_id,
+    reservar_ids,
+    save_many_to_history,
+    log_activities
+)
+from server.functions.productos import documento_producto, documento_stock_inicial, producto_publico
+from server.functions.exportacion import COLUMNAS_PRODUCTOS
+from server.functions.busqueda import normalizar_texto
+from server.functions.autocomplete import indice_autocomplete
+from server.functions.kardex import documento_snapshot_base
+from server.functions.resumen_inventario import delta_resumen, sumar_deltas, aplicar_delta_resumen
+from server.models.productos import ProductoCreate
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import asyncio
+import csv
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Filas validadas e insertadas por lote
+IMPORT_LOTE = int(os.getenv("IMPORT_LOTE", 1000))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", 50 * 1024 * 1024))
+# Errores de fila guardados en el documento de progreso
+IMPORT_MAX_ERRORES_DETALLE = int(os.getenv("IMPORT_MAX_ERRORES_DETALLE", 200))
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "./static/uploads")
+# Minutos sin progreso tras los que una importación se considera interrumpida
+IMPORT_INTERRUMPIDA_MINUTOS = int(os.getenv("IMPORT_INTERRUMPIDA_MINUTOS", 10))
+
+FORMATOS_IMPORTACION = ("csv", "xlsx")
+
+CAMPOS_IMPORTACION = list(ProductoCreate.__fields__)
+
+# Campos de texto: las celdas numéricas de Excel se convierten (ej. código 1001)
+CAMPOS_TEXTO = {
+    "codigo_producto",
+    "nombre_producto",
+    "tipo_producto",
+    "categoria_producto",
+    "proveedor_producto",
+    "ubicacion_fisica",
+    "descripcion_producto",
+    "magnitud_producto"
+}
+
+# Encabezado normalizado → campo; acepta nombres de campo y los encabezados
+# de la exportación (un archivo exportado puede volver a importarse)
+ENCABEZADOS_IMPORTACION = {
+    **{normalizar_texto(encabezado): campo for campo, encabezado in COLUMNAS_PRODUCTOS if campo in CAMPOS_IMPORTACION},
+    **{normalizar_texto(campo): campo for campo in CAMPOS_IMPORTACION}
+}
+
+VALORES_VERDADEROS = {"si", "s", "true", "1", "x", "yes"}
+
+# Importaciones en curso en este worker (referencia para que no se recolecten)
+_tareas_importacion: Set[asyncio.Task] = set()
+
+def leer_filas_csv(ruta: str) -> Iterator[list]:
+    """Filas de un CSV UTF-8 (la primera es el encabezado)"""
+    with open(ruta, newline="", encoding="utf-8-sig") as archivo:
+        yield from csv.reader(archivo)
+
+def leer_filas_xlsx(ruta: str) -> Iterator[list]:
+    """Filas de la primera hoja de un XLSX en modo read_only (sin cargar el libro)"""
+    import openpyxl
+
+    libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        for fila in libro.active.iter_rows(values_only=True):
+            yield list(fila)
+    finally:
+        libro.close()
+
+def mapear_encabezados(encabezados: list) -> List[Optional[str]]:
+    """Campo de producto de cada columna (None si la columna no se reconoce)"""
+    campos = [ENCABEZADOS_IMPORTACION.get(normalizar_texto(str(e or ""))) for e in encabezados]
+
+    faltantes = {"codigo_producto", "nombre_producto", "tipo_producto"} - set(campos)
+    if faltantes:
+        raise ValueError(f"Columnas obligatorias faltantes: {', '.join(sorted(faltantes))}")
+
+    return campos
+
+def fila_a_datos(campos: List[Optional[str]], fila: list) -> dict:
+    """Datos de ProductoCreate de una fila (celdas vacías se omiten para usar defaults)"""
+    datos = {}
+
+    for campo, valor in zip(campos, fila):
+        if campo is None or valor is None:
+            continue
+
+        if isinstance(valor, float) and valor.is_integer() and campo in CAMPOS_TEXTO:
+            valor = int(valor)
+        if campo in CAMPOS_TEXTO:
+            valor = str(valor)
+        if isinstance(valor, str):
+            valor = valor.strip()
+            if not valor:
+                continue
+        if campo == "requiere_lote" and isinstance(valor, str):
+            valor = normalizar_texto(valor) in VALORES_VERDADEROS
+
+        datos[campo] = valor
+
+    return datos
+
+def mensaje_validacion(error: ValidationError) -> str:
+    """Resumen legible de los errores de validación de una fila"""
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in detalle['loc'])}: {detalle['msg']}"
+        for detalle in error.errors()
+    )
+
+async def importar_lote(
+    id_importacion: int,
+    filas: List[Tuple[int, dict]],
+    codigos_vistos: Set[str],
+    created_by: int,
+    created_by_name: str
+) -> Tuple[Dict[str, int], List[dict]]:
+    """
+    Validar e insertar un lote de filas
+
+    Una consulta $in para la unicidad de códigos, un incremento de contador
+    por colección para los IDs y un insert_many por colección (productos,
+    stock, snapshots base, histórico y logs). Retorna (contadores, errores por fila).
+    """
+    contadores = {"creados": 0, "duplicados": 0, "invalidos": 0}
+    errores = []
+    validos: List[Tuple[int, ProductoCreate]] = []
+
+    for numero, datos in filas:
+        try:
+            producto_data = ProductoCreate(**datos)
+        except ValidationError as e:
+            contadores["invalidos"] += 1
+            errores.append({"fila": numero, "codigo": datos.get("codigo_producto"), "error": mensaje_validacion(e)})
+            continue
+
+        if producto_data.codigo_producto in codigos_vistos:
+            contadores["duplicados"] += 1
+            errores.append({"fila": numero, "codigo": producto_data.codigo_producto, "error": "Código repetido en el archivo"})
+            continue
+
+        codigos_vistos.add(producto_data.codigo_producto)
+        validos.append((numero, producto_data))
+
+    if validos:
+        # Unicidad contra la base en una sola consulta por lote
+        cursor = productos_collection().find(
+            {"codigo_producto": {"$in": [producto_data.codigo_producto for _, producto_data in validos]}},
+            {"codigo_producto": 1, "_id": 0}
+        )
+        existentes = {producto["codigo_producto"] async for producto in cursor}
+
+        if existentes:
+            for numero, producto_data in validos:
+                if producto_data.codigo_producto in existentes:
+                    contadores["duplicados"] += 1
+                    errores.append({"fila": numero, "codigo": producto_data.codigo_producto, "error": "El código de producto ya existe"})
+            validos = [(numero, p) for numero, p in validos if p.codigo_producto not in existentes]
+
+    if not validos:
+        return contadores, errores
+
+    # Rangos de IDs reservados con un incremento por contador
+    primer_producto = await reservar_ids("productos", len(validos))
+    primer_stock = await reservar_ids("stock", len(validos))
+    ahora = datetime.now()
+
+    productos = [
+        documento_producto(producto_data, primer_producto + indice, created_by, created_by_name, ahora)
+        for indice, (_, producto_data) in enumerate(validos)
+    ]
+
+    try:
+        await productos_collection().insert_many(productos, ordered=False)
+    except BulkWriteError as e:
+        # Códigos creados por otra operación entre la consulta $in y el insert
+        fallidos = {}
+        for error in e.details.get("writeErrors", []):
+            fallidos[error["index"]] = (
+                "El código de producto ya existe" if error.get("code") == 11000 else error.get("errmsg", "Error de escritura")
+            )
+        for indice, mensaje in fallidos.items():
+            numero, producto_data = validos[indice]
+            contadores["duplicados" if mensaje == "El código de producto ya existe" else "invalidos"] += 1
+            errores.append({"fila": numero, "codigo": producto_data.codigo_producto, "error": mensaje})
+        productos = [producto for indice, producto in enumerate(productos) if indice not in fallidos]
+
+    if not productos:
+        return contadores, errores
+
+    stocks = [
+        documento_stock_inicial(producto, primer_stock + indice, created_by, created_by_name, ahora)
+        for indice, producto in enumerate(productos)
+    ]
+    try:
+        await stock_collection().insert_many(stocks, ordered=False)
+        await kardex_snapshots_collection().insert_many(
+            [documento_snapshot_base(stock, ahora) for stock in stocks],
+            ordered=False
+        )
+    except Exception:
+        # Compensar el lote (como crear_producto sin transacción): no dejar
+        # productos sin stock; la importación queda como fallida
+        ids_productos = [producto["id_producto"] for producto in productos]
+        await kardex_snapshots_collection().delete_many({"producto_id": {"$in": ids_productos}})
+        await stock_collection().delete_many({"producto_id": {"$in": ids_productos}})
+        await productos_collection().delete_many({"id_producto": {"$in": ids_productos}})
+        raise
+
+    delta = {}
+    for stock in stocks:
+        sumar_deltas(delta, delta_resumen(None, stock))
+    await aplicar_delta_resumen(delta)
+
+    # Versión pública (sin _id ni tokens) para histórico e índice de autocomplete
+    publicos = [producto_publico(producto) for producto in productos]
+
+    await save_many_to_history("productos", publicos, "CREATED", created_by, created_by_name)
+
+    await log_activities([
+        {
+            "action": "PRODUCT_CREATED",
+            "module": "productos",
+            "user_id": created_by,
+            "user_name": created_by_name,
+            "details": {
+                "product_id": producto["id_producto"],
+                "codigo": producto["codigo_producto"],
+                "id_importacion": id_importacion
+            }
+        }
+        for producto in publicos
+    ])
+
+    for producto in publicos:
+        indice_autocomplete.actualizar(producto)
+
+    contadores["creados"] = len(productos)
+    return contadores, errores
+
+async def actualizar_progreso(id_importacion: int, incrementos: Dict[str, int] = None, errores: List[dict] = None, **campos):
+    """Actualizar el documento de progreso de una importación"""
+    actualizacion = {"$set": {**campos, "updated_at": datetime.now()}}
+
+    if incrementos:
+        actualizacion["$inc"] = incrementos
+    if errores:
+        actualizacion["$push"] = {"errores": {"$each": errores, "$slice": IMPORT_MAX_ERRORES_DETALLE}}
+
+    await importaciones_collection().update_one({"id_importacion": id_importacion}, actualizacion)
+
+async def marcar_importaciones_interrumpidas():
+    """
+    Marcar como fallidas las importaciones sin progreso reciente
+
+    El procesamiento corre en una tarea del worker: si el worker se reinicia
+    la importación quedaría "procesando" para siempre. Se usa el tiempo sin
+    progreso (y no solo el estado) porque otros workers pueden estar
+    procesando importaciones activas.
+    """
+    limite = datetime.now() - timedelta(minutes=IMPORT_INTERRUMPIDA_MINUTOS)
+
+    resultado = await importaciones_collection().update_many(
+        {
+            "estado": {"$in": ["pendiente", "procesando"]},
+            "$or": [
+                {"updated_at": {"$lt": limite}},
+                {"updated_at": None, "created_at": {"$lt": limite}}
+            ]
+        },
+        {
+            "$set": {
+                "estado": "fallida",
+                "mensaje": "Importación interrumpida (reinicio del servidor); vuelva a cargar el archivo",
+                "finished_at": datetime.now(),
+                "updated_at": datetime.now()
+            }
+        }
+    )
+
+    if resultado.modified_count:
+        logger.warning(f"Importaciones interrumpidas marcadas como fallidas: {resultado.modified_count}")
+
+async def procesar_importacion(
+    id_importacion: int,
+    ruta: str,
+    formato: str,
+    created_by: int,
+    created_by_name: str
+):
+    """Leer el archivo por lotes (fuera del event loop) e importar cada lote"""
+    loop = asyncio.get_running_loop()
+    filas = leer_filas_xlsx(ruta) if formato == "xlsx" else leer_filas_csv(ruta)
+    codigos_vistos: Set[str] = set()
+    totales = {"creados": 0, "duplicados": 0, "invalidos": 0}
+
+    try:
+        await actualizar_progreso(id_importacion, estado="procesando", started_at=datetime.now())
+
+        encabezados = await loop.run_in_executor(None, next, filas, None)
+        if not encabezados:
+            raise ValueError("El archivo está vacío")
+        campos = mapear_encabezados(encabezados)
+
+        # La fila 1 es el encabezado
+        numero = 1
+        while True:
+            bloque = await loop.run_in_executor(None, lambda: list(islice(filas, IMPORT_LOTE)))
+            if not bloque:
+                break
+
+            lote = []
+            for fila in bloque:
+                numero += 1
+                if any(celda not in (None, "") for celda in fila):
+                    lote.append((numero, fila_a_datos(campos, fila)))
+
+            contadores, errores = await importar_lote(
+                id_importacion, lote, codigos_vistos, created_by, created_by_name
+            )
+            sumar_deltas(totales, contadores)
+
+            await actualizar_progreso(
+                id_importacion,
+                {**contadores, "filas_procesadas": len(lote)},
+                errores
+            )
+
+        await actualizar_progreso(id_importacion, estado="completada", finished_at=datetime.now())
+
+        logger.info(
+            f"Importación {id_importacion} completada: {totales['creados']} creados, "
+            f"{totales['duplicados']} duplicados, {totales['invalidos']} inválidos"
+        )
+
+    except Exception as e:
+        mensaje = "El archivo CSV debe estar codificado en UTF-8" if isinstance(e, UnicodeDecodeError) else str(e)
+        logger.error(f"Error en importación {id_importacion}: {e}")
+        await actualizar_progreso(id_importacion, estado="fallida", mensaje=mensaje, finished_at=datetime.now())
+
+    finally:
+        await log_activities([{
+            "action": "PRODUCTS_IMPORTED",
+            "module": "productos",
+            "user_id": created_by,
+            "user_name": created_by_name,
+            "details": {"id_importacion": id_importacion, **totales}
+        }])
+        filas.close()
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+async def iniciar_importacion_productos(archivo: UploadFile, created_by: int, created_by_name: str) -> dict:
+    """
+    Registrar una importación masiva y procesarla en segundo plano
+
+    El archivo se copia por bloques a disco (memoria constante) y se procesa
+    en una tarea del event loop; el progreso se consulta con
+    obtener_importacion.
+    """
+    try:
+        formato = os.path.splitext(archivo.filename or "")[1].lower().lstrip(".")
+        if formato not in FORMATOS_IMPORTACION:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Formato no soportado. Use: {', '.join(FORMATOS_IMPORTACION)}"
+            )
+
+        if formato == "xlsx":
+            try:
+                import openpyxl  # noqa: F401
+            except ImportError:
+                raise HTTPException(
+                    status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                    detail="Importación XLSX no disponible (openpyxl no instalado)"
+                )
+
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        descriptor, ruta = tempfile.mkstemp(prefix="importacion_", suffix=f".{formato}", dir=UPLOAD_FOLDER)
+
+        try:
+            tamano = 0
+            with os.fdopen(descriptor, "wb") as destino:
+                while True:
+                    bloque = await archivo.read(1024 * 1024)
+                    if not bloque:
+                        break
+                    tamano += len(bloque)
+                    if tamano > IMPORT_MAX_BYTES:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"El archivo supera el máximo de {IMPORT_MAX_BYTES // (1024 * 1024)}MB"
+                        )
+                    destino.write(bloque)
+        except Exception:
+            os.remove(ruta)
+            raise
+
+        importacion = {
+            "id_importacion": await get_next_id("importaciones"),
+            "modulo": "productos",
+            "archivo": archivo.filename,
+            "formato": formato,
+            "tamano_bytes": tamano,
+            "estado": "pendiente",
+            "filas_procesadas": 0,
+            "creados": 0,
+            "duplicados": 0,
+            "invalidos": 0,
+            "errores": [],
+            "mensaje": None,
+            "created_at": datetime.now(),
+            "created_by": created_by,
+            "created_by_name": created_by_name,
+            "started_at": None,
+            "finished_at": None,
+            "updated_at": None
+        }
+
+        await importaciones_collection().insert_one(importacion)
+        importacion.pop("_id", None)
+
+        tarea = asyncio.create_task(procesar_importacion(
+            importacion["id_importacion"], ruta, formato, created_by, created_by_name
+        ))
+        _tareas_importacion.add(tarea)
+        tarea.add_done_callback(_tareas_importacion.discard)
+
+        logger.info(f"Importación {importacion['id_importacion']} registrada: {archivo.filename}")
+
+        return importacion
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error iniciando importación: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+async def obtener_importacion(id_importacion: int) -> dict:
+    """Obtener el progreso de una importación"""
+    try:
+        importacion = await importaciones_collection().find_one(
+            {"id_importacion": id_importacion},
+            {"_id": 0}
+        )
+
+        if not importacion:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Importación no encontrada"
+            )
+
+        return importacion
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error obteniendo importación: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
@@ -0,0 +1,322 @@
+# backend/app/server/functions/kardex.py
+from fastapi import HTTPException, status
+from server.config.database import (
+    stock_collection,
+    kardex_collection,
+    kardex_snapshots_collection,
+    LECTURA_REPORTES
+)
+from server.functions.paginacion import condicion_keyset
+from server.models.stock import StockMovement, StockSaldoHistorico, StockValuationHistorica
+from datetime import datetime, timedelta
+from typing import Optional
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Checkpoint de saldo cada N movimientos de un producto
+KARDEX_SNAPSHOT_CADA = int(os.getenv("KARDEX_SNAPSHOT_CADA", 100))
+# Intervalo del snapshot periódico (diario por defecto)
+KARDEX_SNAPSHOT_INTERVALO_HORAS = int(os.getenv("KARDEX_SNAPSHOT_INTERVALO_HORAS", 24))
+
+# Orden ascendente del kardex, usado para leer la cola posterior a un snapshot
+ORDEN_KARDEX_ASC = [("fecha_movimiento", 1), ("id_kardex", 1)]
+
+def requiere_snapshot(movimientos_kardex: int) -> bool:
+    """Indicar si el contador de movimientos de un producto alcanza un checkpoint"""
+    return movimientos_kardex > 0 and movimientos_kardex % KARDEX_SNAPSHOT_CADA == 0
+
+def documento_snapshot(movimiento: dict, tipo: str = "movimientos") -> dict:
+    """Construir checkpoint de saldo a partir del último movimiento incluido"""
+    costo_unitario = movimiento.get("costo_unitario") or 0
+
+    return {
+        "producto_id": movimiento["producto_id"],
+        "fecha_corte": movimiento["fecha_movimiento"],
+        "id_kardex": movimiento["id_kardex"],
+        "cantidad": movimiento["cantidad_actual"],
+        "costo_unitario": costo_unitario,
+        "valor": movimiento["cantidad_actual"] * costo_unitario,
+        "tipo": tipo,
+        "created_at": datetime.now()
+    }
+
+def documento_snapshot_base(stock: dict, fecha_corte: datetime) -> dict:
+    """Snapshot base (id_kardex 0) con el saldo del stock a la fecha de corte"""
+    cantidad = stock.get("cantidad_total", 0)
+    costo_unitario = stock.get("costo_promedio") or 0
+
+    return {
+        "producto_id": stock["producto_id"],
+        "fecha_corte": fecha_corte,
+        "id_kardex": 0,
+        "cantidad": cantidad,
+        "costo_unitario": costo_unitario,
+        "valor": cantidad * costo_unitario,
+        "tipo": "inicial",
+        "created_at": datetime.now()
+    }
+
+async def inicializar_snapshots_kardex():
+    """Crear snapshot base (id_kardex 0) para stock anterior al kardex (sin kardex_base)"""
+    try:
+        # Requerido por el $merge de los snapshots periódicos
+        await kardex_snapshots_collection().create_index(
+            [("producto_id", 1), ("id_kardex", 1)],
+            unique=True
+        )
+
+        ahora = datetime.now()
+        cursor = stock_collection().find(
+            {"kardex_base": {"$exists": False}},
+            {"producto_id": 1, "cantidad_total": 1, "costo_promedio": 1, "_id": 0}
+        )
+
+        snapshots = [documento_snapshot_base(stock, ahora) async for stock in cursor]
+
+        if not snapshots:
+            return
+
+        await kardex_snapshots_collection().insert_many(snapshots, ordered=False)
+        await stock_collection().update_many(
+            {"producto_id": {"$in": [s["producto_id"] for s in snapshots]}},
+            {"$set": {"kardex_base": True}}
+        )
+
+        logger.info(f"Snapshots base de kardex creados: {len(snapshots)}")
+
+    except Exception as e:
+        logger.error(f"Error inicializando snapshots de kardex: {e}")
+
+async def generar_snapshots_periodicos():
+    """
+    Guardar por producto el saldo del último movimiento del periodo
+
+    Se toma del propio kardex (cantidad_actual del último movimiento), por lo
+    que el checkpoint es exactamente consistente con el libro de movimientos.
+    La ventana se solapa con la ejecución anterior; los duplicados se descartan.
+    """
+    try:
+        ahora = datetime.now()
+        desde = ahora - timedelta(hours=KARDEX_SNAPSHOT_INTERVALO_HORAS * 2)
+
+        pipeline = [
+            {"$match": {"fecha_movimiento": {"$gte": desde, "$lt": ahora}}},
+            {"$sort": {"producto_id": 1, "fecha_movimiento": -1, "id_kardex": -1}},
+            {
+                "$group": {
+                    "_id": "$producto_id",
+                    "fecha_corte": {"$first": "$fecha_movimiento"},
+                    "id_kardex": {"$first": "$id_kardex"},
+                    "cantidad": {"$first": "$cantidad_actual"},
+                    "costo_unitario": {"$first": {"$ifNull": ["$costo_unitario", 0]}}
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "producto_id": "$_id",
+                    "fecha_corte": 1,
+                    "id_kardex": 1,
+                    "cantidad": 1,
+                    "costo_unitario": 1,
+                    "valor": {"$multiply": ["$cantidad", "$costo_unitario"]},
+                    "tipo": {"$literal": "periodico"},
+                    "created_at": {"$literal": ahora}
+                }
+            },
+            {
+                "$merge": {
+                    "into": "kardex_snapshots",
+                    "on": ["producto_id", "id_kardex"],
+                    "whenMatched": "keepExisting",
+                    "whenNotMatched": "insert"
+                }
+            }
+        ]
+
+        await kardex_collection().aggregate(pipeline).to_list(length=None)
+
+        logger.info("Snapshots periódicos de kardex generados")
+
+    except Exception as e:
+        logger.error(f"Error generando snapshots de kardex: {e}")
+
+async def actualizar_snapshots_kardex():
+    """Tarea periódica: snapshot base de stock nuevo y checkpoint del periodo"""
+    await inicializar_snapshots_kardex()
+    await generar_snapshots_periodicos()
+
+async def obtener_saldo_historico(producto_id: int, fecha: datetime) -> StockSaldoHistorico:
+    """
+    Saldo y valor de un producto a una fecha
+
+    Saldo = snapshot más cercano anterior a la fecha + cola acotada de
+    movimientos posteriores al snapshot (a lo sumo KARDEX_SNAPSHOT_CADA
+    movimientos o un periodo). Sin snapshot se parte del saldo anterior
+    al primer movimiento registrado.
+    """
+    try:
+        snapshot = await kardex_snapshots_collection(LECTURA_REPORTES).find_one(
+            {"producto_id": producto_id, "fecha_corte": {"$lte": fecha}},
+            {"_id": 0},
+            sort=[("fecha_corte", -1), ("id_kardex", -1)]
+        )
+
+        filtros = {"producto_id": producto_id, "fecha_movimiento": {"$lte": fecha}}
+        if snapshot:
+            posterior = condicion_keyset(ORDEN_KARDEX_ASC, [snapshot["fecha_corte"], snapshot["id_kardex"]])
+            filtros = {"$and": [filtros, posterior]}
+
+        cola = await kardex_collection(LECTURA_REPORTES).aggregate([
+            {"$match": filtros},
+            {"$sort": dict(ORDEN_KARDEX_ASC)},
+            {"$project": {"_id": 0}},
+            {
+                "$group": {
+                    "_id": None,
+                    "cantidad_inicial": {"$first": "$cantidad_anterior"},
+                    "cantidad_movimientos": {"$sum": "$cantidad_movimiento"},
+                    "movimientos": {"$sum": 1},
+                    "ultimo_movimiento": {"$last": "$$ROOT"}
+                }
+            }
+        ]).to_list(length=1)
+
+        if not snapshot and not cola:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No hay registros de kardex para el producto a esa fecha"
+            )
+
+        cola_data = cola[0] if cola else {}
+        ultimo_movimiento = cola_data.get("ultimo_movimiento")
+
+        cantidad_base = snapshot["cantidad"] if snapshot else cola_data["cantidad_inicial"]
+        cantidad = cantidad_base + cola_data.get("cantidad_movimientos", 0)
+
+        if ultimo_movimiento and ultimo_movimiento.get("costo_unitario") is not None:
+            costo_unitario = ultimo_movimiento["costo_unitario"]
+        else:
+            costo_unitario = (snapshot or {}).get("costo_unitario") or 0
+
+        return StockSaldoHistorico(
+            producto_id=producto_id,
+            fecha=fecha,
+            cantidad=cantidad,
+            costo_unitario=costo_unitario,
+            valor=cantidad * costo_unitario,
+            snapshot_fecha_corte=snapshot["fecha_corte"] if snapshot else None,
+            movimientos_aplicados=cola_data.get("movimientos", 0),
+            ultimo_movimiento=StockMovement(**ultimo_movimiento) if ultimo_movimiento else None
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error obteniendo saldo histórico: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+async def calcular_valoracion_historica(fecha: datetime, producto_ids: Optional[list] = None) -> StockValuationHistorica:
+    """Valorización total del inventario a una fecha (snapshot + cola por producto)"""
+    try:
+        match_snapshots = {"fecha_corte": {"$lte": fecha}}
+        if producto_ids:
+            match_snapshots["producto_id"] = {"$in": producto_ids}
+
+        pipeline = [
+            {"$match": match_snapshots},
+            {"$sort": {"producto_id": 1, "fecha_corte": -1, "id_kardex": -1}},
+            {
+                "$group": {
+                    "_id": "$producto_id",
+                    "fecha_corte": {"$first": "$fecha_corte"},
+                    "id_kardex": {"$first": "$id_kardex"},
+                    "cantidad": {"$first": "$cantidad"},
+                    "costo_unitario": {"$first": "$costo_unitario"}
+                }
+            },
+            {
+                # Cola de movimientos posterior al snapshot (por índice producto_id + fecha)
+                "$lookup": {
+                    "from": "kardex",
+                    "let": {"pid": "$_id", "fc": "$fecha_corte", "ik": "$id_kardex"},
+                    "pipeline": [
+                        {
+                            "$match": {
+                                "$expr": {
+                                    "$and": [
+                                        {"$eq": ["$producto_id", "$$pid"]},
+                                        {"$gte": ["$fecha_movimiento", "$$fc"]},
+                                        {"$lte": ["$fecha_movimiento", fecha]}
+                                    ]
+                                }
+                            }
+                        },
+                        {
+                            "$match": {
+                                "$expr": {
+                                    "$or": [
+                                        {"$gt": ["$fecha_movimiento", "$$fc"]},
+                                        {"$gt": ["$id_kardex", "$$ik"]}
+                                    ]
+                                }
+                            }
+                        },
+                        {"$sort": {"fecha_movimiento": 1, "id_kardex": 1}},
+                        {
+                            "$group": {
+                                "_id": None,
+                                "cantidad_movimientos": {"$sum": "$cantidad_movimiento"},
+                                "costo_unitario": {"$last": "$costo_unitario"}
+                            }
+                        }
+                    ],
+                    "as": "cola"
+                }
+            },
+            {
+                "$project": {
+                    "cantidad": {
+                        "$add": [
+                            "$cantidad",
+                            {"$ifNull": [{"$first": "$cola.cantidad_movimientos"}, 0]}
+                        ]
+                    },
+                    "costo_unitario": {
+                        "$ifNull": [{"$first": "$cola.costo_unitario"}, "$costo_unitario"]
+                    }
+                }
+            },
+            {
+                "$group": {
+                    "_id": None,
+                    "total_productos": {"$sum": 1},
+                    "cantidad_total": {"$sum": "$cantidad"},
+                    "valor_total_inventario": {
+                        "$sum": {"$multiply": ["$cantidad", {"$ifNull": ["$costo_unitario", 0]}]}
+                    }
+                }
+            }
+        ]
+
+        resultado = await kardex_snapshots_collection(LECTURA_REPORTES).aggregate(pipeline).to_list(length=1)
+        data = resultado[0] if resultado else {}
+
+        return StockValuationHistorica(
+            fecha=fecha,
+            total_productos=data.get("total_productos", 0),
+            cantidad_total=data.get("cantidad_total", 0),
+            valor_total_inventario=data.get("valor_total_inventario", 0.0)
+        )
+
+    except Exception as e:
+        logger.error(f"Error calculando valorización histórica: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
@@ -0,0 +1,157 @@
+# backend/app/server/functions/paginacion.py
+from fastapi import HTTPException, status
+from bson import json_util
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import base64
+import binascii
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+def codificar_cursor(valores: List[Any]) -> str:
+    """Codificar claves de orden (valor de orden + id) como token opaco"""
+    contenido = json_util.dumps(valores).encode("utf-8")
+    return base64.urlsafe_b64encode(contenido).decode("ascii").rstrip("=")
+
+def decodificar_cursor(cursor: str, cantidad_claves: int) -> List[Any]:
+    """Decodificar token opaco; lanza 400 si no es un cursor válido"""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json_util.loads(base64.urlsafe_b64decode(cursor + relleno).decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        valores = None
+
+    if not isinstance(valores, list) or len(valores) != cantidad_claves:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+
+    return valores
+
+def cursor_de_documento(documento: Dict[str, Any], orden: List[Tuple[str, int]]) -> str:
+    """Generar cursor a partir de las claves de orden de un documento"""
+    return codificar_cursor([documento.get(campo) for campo, _ in orden])
+
+def condicion_keyset(orden: List[Tuple[str, int]], valores: List[Any]) -> Dict[str, Any]:
+    """
+    Construir condición "posterior al cursor" para un orden compuesto
+
+    Para [(a, 1), (b, 1)] genera: a > va OR (a == va AND b > vb)
+    """
+    condiciones = []
+
+    for i, (campo, direccion) in enumerate(orden):
+        operador = "$gt" if direccion > 0 else "$lt"
+        condicion = {campo_previo: valores[j] for j, (campo_previo, _) in enumerate(orden[:i])}
+        condicion[campo] = {operador: valores[i]}
+        condiciones.append(condicion)
+
+    return {"$or": condiciones}
+
+def construir_paginacion(
+    data: List[Any],
+    total: int,
+    page: int,
+    limit: int,
+    orden: Optional[List[Tuple[str, int]]] = None
+) -> Dict[str, Any]:
+    """Construir resultado paginado estándar (consumible por paginated_response)"""
+    pages = math.ceil(total / limit) if total > 0 else 0
+    has_next = page < pages
+
+    return {
+        "data": data,
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "pages": pages,
+        "has_next": has_next,
+        "has_prev": page > 1,
+        "next_cursor": cursor_de_documento(data[-1], orden) if orden and has_next and data else None
+    }
+
+async def paginar_consulta(
+    collection,
+    filtros: Dict[str, Any],
+    proyeccion: Dict[str, Any],
+    orden: List[Tuple[str, int]],
+    page: int = 1,
+    limit: int = 20
+) -> Dict[str, Any]:
+    """
+    Obtener una página y el total en un solo round trip
+
+    - Con filtros: un único aggregate con $match + $sort (por índice) y $facet
+      que devuelve datos y conteo juntos.
+    - Sin filtros: find paginado y estimated_document_count en paralelo
+      (el conteo estimado sale de los metadatos de la colección).
+    """
+    skip = (page - 1) * limit
+
+    if not filtros:
+        cursor = collection.find({}, proyeccion).sort(orden).skip(skip).limit(limit)
+        data, total = await asyncio.gather(
+            cursor.to_list(length=limit),
+            collection.estimated_document_count()
+        )
+        return construir_paginacion(data, total, page, limit, orden)
+
+    pipeline = [
+        {"$match": filtros},
+        {"$sort": dict(orden)},
+        {
+            "$facet": {
+                "data": [
+                    {"$skip": skip},
+                    {"$limit": limit},
+                    {"$project": proyeccion}
+                ],
+                "total": [{"$count": "total"}]
+            }
+        }
+    ]
+
+    resultado = await collection.aggregate(pipeline).to_list(length=1)
+    facet = resultado[0] if resultado else {"data": [], "total": []}
+    total = facet["total"][0]["total"] if facet["total"] else 0
+
+    return construir_paginacion(facet["data"], total, page, limit, orden)
+
+async def paginar_por_cursor(
+    collection,
+    filtros: Dict[str, Any],
+    proyeccion: Dict[str, Any],
+    orden: List[Tuple[str, int]],
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Paginación keyset: continúa después del cursor sin skip
+
+    El orden debe terminar en un campo único (el id) y estar respaldado por un
+    índice compuesto, de modo que la página N cuesta lo mismo que la primera.
+    No calcula total; next_cursor es None en la última página.
+    """
+    consulta = filtros
+    if cursor:
+        siguiente = condicion_keyset(orden, decodificar_cursor(cursor, len(orden)))
+        consulta = {"$and": [filtros, siguiente]} if filtros else siguiente
+
+    documentos = await collection.find(consulta, proyeccion).sort(orden).limit(limit + 1).to_list(length=limit + 1)
+
+    has_next = len(documentos) > limit
+    data = documentos[:limit]
+
+    return {
+        "data": data,
+        "total": None,
+        "page": None,
+        "limit": limit,
+        "pages": None,
+        "has_next": has_next,
+        "has_prev": bool(cursor),
+        "next_cursor": cursor_de_documento(data[-1], orden) if has_next else None
+    }
@@ -1,114 +1,190 @@
 # backend/app/server/functions/productos.py
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from server.config.database import (
     productos_collection,
     stock_collection, 
+    kardex_snapshots_collection,
     get_next_id, 
+    transaccion,
+    soporta_transacciones,
+    filtro_con_cambios,
+    LECTURA_REPORTES,
     save_to_history, 
     log_activity
 )
+from server.functions.paginacion import paginar_consulta, paginar_por_cursor
+from server.functions.stock import calcular_nivel_stock, pipeline_sincronizar_producto, stock_sincronizado
+from server.functions.busqueda import (
+    CAMPOS_BUSQUEDA,
+    campos_tokens_busqueda,
+    requiere_tokens,
+    tokens_consulta,
+    filtro_tokens,
+    ordenar_por_relevancia,
+    validar_texto_busqueda,
+    es_codigo,
+    rango_prefijo,
+    filtro_texto,
+    ORDEN_TEXTO
+)
+from server.functions.autocomplete import indice_autocomplete
+from server.functions.kardex import documento_snapshot_base
+from server.functions.resumen_inventario import PROYECCION_RESUMEN, delta_resumen, aplicar_delta_resumen
 from server.models.productos import ProductoCreate, ProductoUpdate, ProductoSearch
 from datetime import datetime
 from typing import Optional, List
+import asyncio
 import logging
-import math
 
 logger = logging.getLogger(__name__)
 
+# Proyección pública de productos (sin campos internos de búsqueda)
+PROYECCION_PRODUCTO = {"_id": 0, "busqueda_tokens": 0, "busqueda_version": 0}
+
+def producto_publico(producto: dict) -> dict:
+    """Aplicar PROYECCION_PRODUCTO a un documento en memoria"""
+    return {campo: valor for campo, valor in producto.items() if campo not in PROYECCION_PRODUCTO}
+
+def documento_producto(
+    producto_data: ProductoCreate,
+    id_producto: int,
+    created_by: int,
+    created_by_name: str,
+    ahora: Optional[datetime] = None
+) -> dict:
+    """Documento de un producto nuevo (incluye tokens de búsqueda)"""
+    producto_dict = {
+        "id_producto": id_producto,
+        "codigo_producto": producto_data.codigo_producto,
+        "nombre_producto": producto_data.nombre_producto,
+        "tipo_producto": producto_data.tipo_producto,
+        "categoria_producto": producto_data.categoria_producto,
+        "proveedor_producto": producto_data.proveedor_producto,
+        "costo_unitario": float(producto_data.costo_unitario) if producto_data.costo_unitario else None,
+        "precio_referencial": float(producto_data.precio_referencial) if producto_data.precio_referencial else None,
+        "ubicacion_fisica": producto_data.ubicacion_fisica,
+        "stock_minimo": producto_data.stock_minimo,
+        "stock_maximo": producto_data.stock_maximo,
+        "stock_critico": producto_data.stock_critico,
+        "estado_producto": 1,
+        "descripcion_producto": producto_data.descripcion_producto,
+        "url_foto_producto": None,
+        "magnitud_producto": producto_data.magnitud_producto,
+        "requiere_lote": producto_data.requiere_lote,
+        "dias_vida_util": producto_data.dias_vida_util,
+        "created_at": ahora or datetime.now(),
+        "created_by": created_by,
+        "created_by_name": created_by_name,
+        "updated_at": None,
+        "updated_by": None,
+        "updated_by_name": None
+    }
+    
+    # Tokens de búsqueda (prefijos de código, nombre, categoría y proveedor)
+    producto_dict.update(campos_tokens_busqueda(producto_dict))
+    
+    return producto_dict
+
+def documento_stock_inicial(
+    producto: dict,
+    id_stock: int,
+    created_by: int,
+    created_by_name: str,
+    ahora: Optional[datetime] = None
+) -> dict:
+    """Registro inicial de stock (cantidad 0) con los umbrales embebidos del producto"""
+    nivel_inicial = calcular_nivel_stock(0, producto["stock_minimo"], producto["stock_critico"])
+    
+    return {
+        "id_stock": id_stock,
+        "producto_id": producto["id_producto"],
+        "producto_codigo": producto["codigo_producto"],
+        "producto_nombre": producto["nombre_producto"],
+        "cantidad_disponible": 0,
+        "cantidad_reservada": 0,
+        "cantidad_total": 0,
+        "ubicacion_fisica": producto["ubicacion_fisica"],
+        "lote_serie": None,
+        "fecha_vencimiento": None,
+        "costo_promedio": producto["costo_unitario"] or 0.0,
+        "valor_inventario": 0.0,
+        "fecha_ultimo_movimiento": None,
+        "estado_stock": 1,
+        "stock_minimo": producto["stock_minimo"],
+        "stock_critico": producto["stock_critico"],
+        "magnitud_producto": producto["magnitud_producto"],
+        "nivel_stock": nivel_inicial,
+        "alerta_generada": nivel_inicial != "normal",
+        # El snapshot base se crea junto con el stock
+        "kardex_base": True,
+        "created_at": ahora or datetime.now(),
+        "created_by": created_by,
+        "created_by_name": created_by_name
+    }
+
 async def crear_producto(producto_data: ProductoCreate, created_by: int, created_by_name: str):
-    """Crear nuevo producto"""
+    """Crear nuevo producto y su stock inicial en una sola transacción"""
     try:
-        # Verificar que código no exista
-        existing_codigo = await productos_collection().find_one(
-            {"codigo_producto": producto_data.codigo_producto}
+        # IDs desde los bloques locales del asignador (normalmente sin round trip)
+        nuevo_id, id_stock = await asyncio.gather(
+            get_next_id("productos"),
+            get_next_id("stock")
         )
-        if existing_codigo:
+        
+        ahora = datetime.now()
+        producto_dict = documento_producto(producto_data, nuevo_id, created_by, created_by_name, ahora)
+        stock_inicial = documento_stock_inicial(producto_dict, id_stock, created_by, created_by_name, ahora)
+        
+        # La unicidad del código la garantiza el índice único (sin consulta previa)
+        try:
+            async with transaccion() as session:
+                await productos_collection().insert_one(producto_dict, session=session)
+                try:
+                    await stock_collection().insert_one(stock_inicial, session=session)
+                    # Snapshot base: el producto existe en la valorización histórica desde su creación
+                    await kardex_snapshots_collection().insert_one(
+                        documento_snapshot_base(stock_inicial, ahora),
+                        session=session
+                    )
+                except Exception:
+                    if not soporta_transacciones():
+                        # Sin transacción: compensar para no dejar el producto sin stock
+                        await stock_collection().delete_one({"producto_id": nuevo_id}, session=session)
+                        await productos_collection().delete_one({"id_producto": nuevo_id}, session=session)
+                    raise
+        except DuplicateKeyError as e:
+            if "codigo_producto" not in str(e):
+                raise
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="El código de producto ya existe"
             )
         
-        # Generar ID autoincremental
-        nuevo_id = await get_next_id("productos")
-        
-        # Preparar datos del producto
-        producto_dict = {
-            "id_producto": nuevo_id,
-            "codigo_producto": producto_data.codigo_producto,
-            "nombre_producto": producto_data.nombre_producto,
-            "tipo_producto": producto_data.tipo_producto,
-            "categoria_producto": producto_data.categoria_producto,
-            "proveedor_producto": producto_data.proveedor_producto,
-            "costo_unitario": float(producto_data.costo_unitario) if producto_data.costo_unitario else None,
-            "precio_referencial": float(producto_data.precio_referencial) if producto_data.precio_referencial else None,
-            "ubicacion_fisica": producto_data.ubicacion_fisica,
-            "stock_minimo": producto_data.stock_minimo,
-            "stock_maximo": producto_data.stock_maximo,
-            "stock_critico": producto_data.stock_critico,
-            "estado_producto": 1,
-            "descripcion_producto": producto_data.descripcion_producto,
-            "url_foto_producto": None,
-            "magnitud_producto": producto_data.magnitud_producto,
-            "requiere_lote": producto_data.requiere_lote,
-            "dias_vida_util": producto_data.dias_vida_util,
-            "created_at": datetime.now(),
-            "created_by": created_by,
-            "created_by_name": created_by_name,
-            "updated_at": None,
-            "updated_by": None,
-            "updated_by_name": None
-        }
-        
-        # Insertar producto
-        result = await productos_collection().insert_one(producto_dict)
-        
-        # Crear registro inicial en stock
-        stock_inicial = {
-            "id_stock": await get_next_id("stock"),
-            "producto_id": nuevo_id,
-            "producto_codigo": producto_data.codigo_producto,
-            "producto_nombre": producto_data.nombre_producto,
-            "cantidad_disponible": 0,
-            "cantidad_reservada": 0,
-            "cantidad_total": 0,
-            "ubicacion_fisica": producto_data.ubicacion_fisica,
-            "lote_serie": None,
-            "fecha_vencimiento": None,
-            "costo_promedio": float(producto_data.costo_unitario) if producto_data.costo_unitario else 0.0,
-            "valor_inventario": 0.0,
-            "fecha_ultimo_movimiento": None,
-            "estado_stock": 1,
-            "alerta_generada": False,
-            "created_at": datetime.now(),
-            "created_by": created_by,
-            "created_by_name": created_by_name
-        }
-        
-        await stock_collection().insert_one(stock_inicial)
-        
-        # Guardar en histórico
-        await save_to_history(
-            "productos",
-            producto_dict,
-            "CREATED",
-            created_by,
-            created_by_name
-        )
-        
-        # Log de actividad
-        await log_activity(
-            action="PRODUCT_CREATED",
-            module="productos",
-            user_id=created_by,
-            user_name=created_by_name,
-            details={"product_id": nuevo_id, "codigo": producto_data.codigo_producto}
+        # Respuesta desde el documento en memoria (sin releer el producto)
+        producto_creado = producto_publico(producto_dict)
+        
+        # Escrituras independientes posteriores al commit, en paralelo
+        await asyncio.gather(
+            aplicar_delta_resumen(delta_resumen(None, stock_inicial)),
+            save_to_history(
+                "productos",
+                producto_creado,
+                "CREATED",
+                created_by,
+                created_by_name
+            ),
+            log_activity(
+                action="PRODUCT_CREATED",
+                module="productos",
+                user_id=created_by,
+                user_name=created_by_name,
+                details={"product_id": nuevo_id, "codigo": producto_data.codigo_producto}
+            )
         )
         
-        # Obtener producto creado
-        producto_creado = await productos_collection().find_one(
-            {"_id": result.inserted_id},
-            {"_id": 0}
-        )
+        indice_autocomplete.actualizar(producto_creado)
         
         logger.info(f"Producto creado exitosamente: {producto_data.codigo_producto}")
         
@@ -128,7 +204,7 @@ async def obtener_producto_por_id(product_id: int):
     try:
         producto = await productos_collection().find_one(
             {"id_producto": product_id},
-            {"_id": 0}
+            PROYECCION_PRODUCTO
         )
         
         if not producto:
@@ -148,8 +224,17 @@ async def obtener_producto_por_id(product_id: int):
             detail="Error interno del servidor"
         )
 
-async def obtener_productos(page: int = 1, limit: int = 20, estado: Optional[int] = None, tipo: Optional[str] = None):
-    """Obtener lista de productos con paginación"""
+# Orden de listados: fecha de creación con id como desempate (apto para cursor)
+ORDEN_PRODUCTOS = [("created_at", -1), ("id_producto", -1)]
+
+async def obtener_productos(
+    page: int = 1,
+    limit: int = 20,
+    estado: Optional[int] = None,
+    tipo: Optional[str] = None,
+    cursor: Optional[str] = None
+):
+    """Obtener lista de productos con paginación (por página o por cursor)"""
     try:
         # Construir filtros
         filtros = {}
@@ -158,29 +243,29 @@ async def obtener_productos(page: int = 1, limit: int = 20, estado: Optional[int
         if tipo:
             filtros["tipo_producto"] = tipo
         
-        # Calcular skip
-        skip = (page - 1) * limit
-        
-        # Obtener total de registros
-        total = await productos_collection().count_documents(filtros)
-        
-        # Obtener productos
-        cursor = productos_collection().find(filtros, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit)
-        productos = await cursor.to_list(length=limit)
-        
-        # Calcular paginación
-        pages = math.ceil(total / limit) if total > 0 else 0
+        # Modo cursor: keyset sobre (created_at, id_producto)
+        if cursor:
+            return await paginar_por_cursor(
+                productos_collection(LECTURA_REPORTES),
+                filtros,
+                PROYECCION_PRODUCTO,
+                ORDEN_PRODUCTOS,
+                limit,
+                cursor
+            )
         
-        return {
-            "data": productos,
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "pages": pages,
-            "has_next": page < pages,
-            "has_prev": page > 1
-        }
+        # Obtener página y total en un solo round trip
+        return await paginar_consulta(
+            productos_collection(LECTURA_REPORTES),
+            filtros,
+            PROYECCION_PRODUCTO,
+            ORDEN_PRODUCTOS,
+            page,
+            limit
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error obteniendo productos: {e}")
         raise HTTPException(
@@ -189,16 +274,8 @@ async def obtener_productos(page: int = 1, limit: int = 20, estado: Optional[int
         )
 
 async def actualizar_producto(product_id: int, producto_data: ProductoUpdate, updated_by: int, updated_by_name: str):
-    """Actualizar producto"""
+    """Actualizar producto (una sola escritura que retorna el documento actualizado)"""
     try:
-        # Verificar que producto existe
-        producto_actual = await productos_collection().find_one({"id_producto": product_id})
-        if not producto_actual:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Producto no encontrado"
-            )
-        
         # Preparar datos para actualizar
         update_data = {}
         for field, value in producto_data.dict(exclude_unset=True).items():
@@ -214,6 +291,8 @@ async def actualizar_producto(product_id: int, producto_data: ProductoUpdate, up
                 detail="No hay datos para actualizar"
             )
         
+        cambios = dict(update_data)
+        
         # Agregar metadatos de actualización
         update_data.update({
             "updated_at": datetime.now(),
@@ -221,38 +300,73 @@ async def actualizar_producto(product_id: int, producto_data: ProductoUpdate, up
             "updated_by_name": updated_by_name
         })
         
-        # Actualizar en BD
-        result = await productos_collection().update_one(
-            {"id_producto": product_id},
-            {"$set": update_data}
+        campos_actualizados = list(update_data.keys())
+        filtro = filtro_con_cambios({"id_producto": product_id}, cambios)
+        
+        # Tokens de búsqueda en el mismo $set (atómicos con los campos que los
+        # alimentan); solo cuando cambia un campo de búsqueda se leen los demás
+        campos_leidos = None
+        if requiere_tokens(cambios):
+            campos_leidos = await productos_collection().find_one(
+                {"id_producto": product_id},
+                {**{campo: 1 for campo in CAMPOS_BUSQUEDA}, "_id": 0}
+            )
+            if campos_leidos is not None:
+                update_data.update(campos_tokens_busqueda({**campos_leidos, **cambios}))
+                # Guarda: los campos de búsqueda no actualizados siguen como se leyeron
+                filtro.update({
+                    campo: campos_leidos.get(campo)
+                    for campo in CAMPOS_BUSQUEDA
+                    if campo not in cambios
+                })
+        
+        # Actualizar solo si algún campo cambia y obtener el resultado en la misma operación
+        producto_actualizado = await productos_collection().find_one_and_update(
+            filtro,
+            {"$set": update_data},
+            projection=PROYECCION_PRODUCTO,
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
+        if not producto_actualizado:
+            # Solo en el camino de error: distinguir inexistente, conflicto y sin cambios
+            existe = await productos_collection().find_one(
+                {"id_producto": product_id},
+                {**{campo: 1 for campo in CAMPOS_BUSQUEDA}, "_id": 0}
+            )
+            
+            if not existe:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Producto no encontrado"
+                )
+            
+            if campos_leidos is not None and any(
+                existe.get(campo) != campos_leidos.get(campo) for campo in CAMPOS_BUSQUEDA
+            ):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="El producto fue modificado durante la actualización; reintente"
+                )
+            
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No se realizaron cambios"
             )
         
-        # Obtener producto actualizado
-        producto_actualizado = await productos_collection().find_one(
-            {"id_producto": product_id},
-            {"_id": 0}
-        )
-        
-        # Actualizar datos relacionados en stock si es necesario
-        stock_update = {}
-        if "nombre_producto" in update_data:
-            stock_update["producto_nombre"] = update_data["nombre_producto"]
-        if "ubicacion_fisica" in update_data:
-            stock_update["ubicacion_fisica"] = update_data["ubicacion_fisica"]
-        if "costo_unitario" in update_data:
-            stock_update["costo_promedio"] = update_data["costo_unitario"]
+        # Replicar en stock nombre, umbrales, magnitud y estado (recalcula nivel de alerta)
+        stock_pipeline = pipeline_sincronizar_producto(update_data)
         
-        if stock_update:
-            await stock_collection().update_one(
+        if stock_pipeline:
+            stock_anterior = await stock_collection().find_one_and_update(
                 {"producto_id": product_id},
-                {"$set": stock_update}
+                stock_pipeline,
+                projection=PROYECCION_RESUMEN,
+                return_document=ReturnDocument.BEFORE
             )
+            if stock_anterior:
+                stock_actualizado = stock_sincronizado(stock_anterior, update_data)
+                await aplicar_delta_resumen(delta_resumen(stock_anterior, stock_actualizado))
         
         # Guardar en histórico
         await save_to_history(
@@ -269,9 +383,11 @@ async def actualizar_producto(product_id: int, producto_data: ProductoUpdate, up
             module="productos",
             user_id=updated_by,
             user_name=updated_by_name,
-            details={"product_id": product_id, "fields": list(update_data.keys())}
+            details={"product_id": product_id, "fields": campos_actualizados}
         )
         
+        indice_autocomplete.actualizar(producto_actualizado)
+        
         logger.info(f"Producto actualizado: ID {product_id}")
         
         return producto_actualizado
@@ -289,10 +405,10 @@ async def eliminar_producto(product_id: int, deleted_by: int, deleted_by_name: s
    """Eliminar producto (soft delete)"""
    try:
        # Verificar que producto existe y no está ya eliminado
-       producto = await productos_collection().find_one({
-           "id_producto": product_id,
-           "estado_producto": 1
-       })
+       producto = await productos_collection().find_one(
+           {"id_producto": product_id, "estado_producto": 1},
+           PROYECCION_PRODUCTO
+       )
        
        if not producto:
            raise HTTPException(
@@ -322,15 +438,18 @@ async def eliminar_producto(product_id: int, deleted_by: int, deleted_by_name: s
        )
        
        # Eliminar también el stock
-       await stock_collection().update_one(
+       stock_anterior = await stock_collection().find_one_and_update(
            {"producto_id": product_id},
            {
                "$set": {
                    "estado_stock": 0,
                    "updated_at": datetime.now()
                }
-           }
+           },
+           projection=PROYECCION_RESUMEN,
+           return_document=ReturnDocument.BEFORE
        )
+       await aplicar_delta_resumen(delta_resumen(stock_anterior, None))
        
        # Guardar en histórico
        producto["estado_producto"] = 0
@@ -351,6 +470,8 @@ async def eliminar_producto(product_id: int, deleted_by: int, deleted_by_name: s
            details={"product_id": product_id, "codigo": producto["codigo_producto"]}
        )
        
+       indice_autocomplete.eliminar(product_id)
+       
        logger.info(f"Producto eliminado: ID {product_id}")
        
        return {"message": "Producto eliminado exitosamente"}
@@ -367,31 +488,66 @@ async def eliminar_producto(product_id: int, deleted_by: int, deleted_by_name: s
 async def buscar_productos(search_params: ProductoSearch, limit: int = 20):
    """Buscar productos con filtros"""
    try:
-       # Construir filtros de búsqueda
+       # Planificar filtros: nunca se usa $regex con texto del usuario
        filtros = {}
+       campos_texto = {
+           "codigo": search_params.codigo,
+           "nombre": search_params.nombre,
+           "categoria": search_params.categoria,
+           "proveedor": search_params.proveedor,
+           "texto": search_params.texto
+       }
+       campos_texto = {
+           campo: validar_texto_busqueda(valor)
+           for campo, valor in campos_texto.items()
+           if valor is not None and valor.strip()
+       }
+       
+       # Código: rango anclado sobre el índice único (exacto o prefijo)
+       codigo = campos_texto.get("codigo")
+       if codigo and es_codigo(codigo, requiere_digito=False):
+           filtros["codigo_producto"] = rango_prefijo(codigo.upper())
+           codigo = None
        
-       if search_params.codigo:
-           filtros["codigo_producto"] = {"$regex": search_params.codigo, "$options": "i"}
+       # Nombre, categoría, proveedor (y código no reconocido): prefijos de palabra
+       tokens = (
+           tokens_consulta(codigo)
+           + tokens_consulta(campos_texto.get("nombre"))
+           + tokens_consulta(campos_texto.get("categoria"), "cat:")
+           + tokens_consulta(campos_texto.get("proveedor"), "prov:")
+       )
+       
+       if tokens:
+           filtros.update(filtro_tokens(tokens))
+       elif codigo or any(campos_texto.get(campo) for campo in ["nombre", "categoria", "proveedor"]):
+           # Solo palabras más cortas que el prefijo mínimo indexado
+           return []
        
-       if search_params.nombre:
-           filtros["nombre_producto"] = {"$regex": search_params.nombre, "$options": "i"}
+       # Texto libre: índice de texto (palabras completas, ordenado por relevancia)
+       if campos_texto.get("texto"):
+           filtros.update(filtro_texto(campos_texto["texto"]))
        
        if search_params.tipo:
            filtros["tipo_producto"] = search_params.tipo
        
-       if search_params.categoria:
-           filtros["categoria_producto"] = {"$regex": search_params.categoria, "$options": "i"}
-       
-       if search_params.proveedor:
-           filtros["proveedor_producto"] = {"$regex": search_params.proveedor, "$options": "i"}
-       
        if search_params.estado is not None:
            filtros["estado_producto"] = search_params.estado
        
+       # Orden: por código si hay rango de código (el código exacto es el límite
+       # inferior del rango, queda primero y el límite no lo deja fuera);
+       # relevancia para texto libre; si no, nombre
+       if "codigo_producto" in filtros:
+           orden = [("codigo_producto", 1)]
+       elif "$text" in filtros:
+           orden = ORDEN_TEXTO
+       else:
+           orden = [("nombre_producto", 1)]
+       
        # Si busca productos con stock bajo, hacer join con stock
        if search_params.stock_bajo:
            pipeline = [
                {"$match": filtros},
+               *([{"$sort": {"codigo_producto": 1}}] if "codigo_producto" in filtros else []),
                {
                    "$lookup": {
                        "from": "stock",
@@ -408,19 +564,21 @@ async def buscar_productos(search_params: ProductoSearch, limit: int = 20):
                        }
                    }
                },
-               {"$project": {"_id": 0, "stock_info": 0}},
+               {"$project": {**PROYECCION_PRODUCTO, "stock_info": 0}},
                {"$limit": limit}
            ]
            
-           cursor = productos_collection().aggregate(pipeline)
+           cursor = productos_collection(LECTURA_REPORTES).aggregate(pipeline)
            productos = await cursor.to_list(length=limit)
        else:
            # Búsqueda normal
-           cursor = productos_collection().find(filtros, {"_id": 0}).sort("nombre_producto", 1).limit(limit)
+           cursor = productos_collection(LECTURA_REPORTES).find(filtros, PROYECCION_PRODUCTO).sort(orden).limit(limit)
            productos = await cursor.to_list(length=limit)
        
        return productos
        
+   except HTTPException:
+       raise
    except Exception as e:
        logger.error(f"Error buscando productos: {e}")
        raise HTTPException(
@@ -444,25 +602,32 @@ async def verificar_codigo_producto_unico(codigo: str, exclude_id: Optional[int]
        return False
 
 async def obtener_productos_autocomplete(query: str, limit: int = 10):
-   """Obtener productos para autocomplete"""
+   """Obtener productos para autocomplete (prefijos de palabra de código o nombre)"""
    try:
-       filtros = {
-           "estado_producto": 1,
-           "$or": [
-               {"codigo_producto": {"$regex": query, "$options": "i"}},
-               {"nombre_producto": {"$regex": query, "$options": "i"}}
-           ]
-       }
+       query = validar_texto_busqueda(query)
+       
+       # Índice en memoria (AUTOCOMPLETE_MEMORIA): sin consultar MongoDB
+       if indice_autocomplete.listo:
+           return indice_autocomplete.buscar(query, limit)
+       
+       tokens = tokens_consulta(query)
+       if not tokens:
+           return []
        
-       cursor = productos_collection().find(
+       filtros = {"estado_producto": 1, **filtro_tokens(tokens)}
+       
+       # Candidatos por índice (estado, token, nombre) y ranking por relevancia
+       cursor = productos_collection(LECTURA_REPORTES).find(
            filtros,
            {"id_producto": 1, "codigo_producto": 1, "nombre_producto": 1, "magnitud_producto": 1, "_id": 0}
-       ).sort("nombre_producto", 1).limit(limit)
+       ).sort("nombre_producto", 1).limit(limit * 3)
        
-       productos = await cursor.to_list(length=limit)
+       productos = await cursor.to_list(length=limit * 3)
        
-       return productos
+       return ordenar_por_relevancia(productos, query)[:limit]
        
+   except HTTPException:
+       raise
    except Exception as e:
        logger.error(f"Error en autocomplete de productos: {e}")
        raise HTTPException(
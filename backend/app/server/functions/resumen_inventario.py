@@ -0,0 +1,223 @@
+# backend/app/server/functions/resumen_inventario.py
+from server.config.database import stock_collection, resumen_inventario_collection, LECTURA_PRIMARIA
+from server.config.cache import consultas_compartidas
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, date
+from typing import Dict, Optional
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+# Documento único con los totales del inventario
+ID_RESUMEN = "global"
+# Clave del resumen de stock (dashboard) en el cache de consultas compartidas
+CLAVE_RESUMEN_STOCK = "resumen_stock"
+# Intervalo de la reconciliación contra la colección stock
+RESUMEN_RECONCILIACION_MINUTOS = int(os.getenv("RESUMEN_RECONCILIACION_MINUTOS", 60))
+# Reintentos de la reconciliación si un delta concurrente cambia el resumen
+RESUMEN_RECONCILIACION_REINTENTOS = 3
+
+CONTADORES_RESUMEN = [
+    "total_productos",
+    "valor_total_inventario",
+    "productos_stock_bajo",
+    "productos_stock_critico",
+    "productos_sin_stock"
+]
+
+# Campos de stock necesarios para calcular la contribución de un documento
+PROYECCION_RESUMEN = {
+    "estado_stock": 1,
+    "cantidad_total": 1,
+    "valor_inventario": 1,
+    "stock_minimo": 1,
+    "stock_critico": 1,
+    "fecha_vencimiento": 1,
+    "_id": 0
+}
+
+def clave_vencimiento(fecha_vencimiento) -> Optional[str]:
+    """Bucket de vencimiento (un contador por día)"""
+    if not fecha_vencimiento:
+        return None
+    if isinstance(fecha_vencimiento, datetime):
+        fecha_vencimiento = fecha_vencimiento.date()
+    return fecha_vencimiento.isoformat()
+
+def contribucion(stock: Optional[dict]) -> Dict[str, float]:
+    """Aporte de un documento de stock a los contadores del resumen"""
+    if not stock or stock.get("estado_stock", 1) != 1:
+        return {}
+
+    cantidad = stock.get("cantidad_total", 0)
+    aporte = {
+        "total_productos": 1,
+        "valor_total_inventario": stock.get("valor_inventario") or 0,
+        "productos_stock_bajo": int(cantidad <= stock.get("stock_minimo", 1)),
+        "productos_stock_critico": int(cantidad <= stock.get("stock_critico", 0)),
+        "productos_sin_stock": int(cantidad == 0)
+    }
+
+    vencimiento = clave_vencimiento(stock.get("fecha_vencimiento"))
+    if vencimiento:
+        aporte[f"vencimientos.{vencimiento}"] = 1
+
+    return aporte
+
+def delta_resumen(antes: Optional[dict], despues: Optional[dict]) -> Dict[str, float]:
+    """Diferencia de contribución entre dos versiones de un documento de stock"""
+    delta = {campo: -valor for campo, valor in contribucion(antes).items()}
+
+    for campo, valor in contribucion(despues).items():
+        delta[campo] = delta.get(campo, 0) + valor
+
+    return {campo: valor for campo, valor in delta.items() if valor}
+
+def sumar_deltas(acumulado: Dict[str, float], delta: Dict[str, float]):
+    """Acumular deltas de varias operaciones en uno solo"""
+    for campo, valor in delta.items():
+        acumulado[campo] = acumulado.get(campo, 0) + valor
+
+async def aplicar_delta_resumen(delta: Dict[str, float], session=None):
+    """Aplicar un delta al documento de resumen con un solo $inc"""
+    delta = {campo: valor for campo, valor in delta.items() if valor}
+    if not delta:
+        return
+
+    try:
+        await resumen_inventario_collection().update_one(
+            {"_id": ID_RESUMEN},
+            # version: detecta deltas concurrentes durante la reconciliación
+            {"$inc": {**delta, "version": 1}, "$set": {"updated_at": datetime.now()}},
+            upsert=True,
+            session=session
+        )
+        # Lectura consistente en este worker tras su propia escritura
+        consultas_compartidas.invalidate(CLAVE_RESUMEN_STOCK)
+    except Exception as e:
+        # La reconciliación periódica corrige cualquier desvío
+        logger.error(f"Error actualizando resumen de inventario: {e}")
+
+async def obtener_resumen_inventario(lectura: str = LECTURA_PRIMARIA) -> Optional[dict]:
+    """Leer el documento de resumen (una sola lectura por _id)"""
+    return await resumen_inventario_collection(lectura).find_one({"_id": ID_RESUMEN}, {"_id": 0})
+
+def contar_vencimientos(vencimientos: Dict[str, int], fecha_actual: date, fecha_limite: date) -> Dict[str, int]:
+    """Productos vencidos y por vencer a partir de los buckets por día"""
+    hoy = fecha_actual.isoformat()
+    limite = fecha_limite.isoformat()
+
+    return {
+        "productos_vencidos": sum(c for dia, c in vencimientos.items() if dia < hoy),
+        "productos_por_vencer": sum(c for dia, c in vencimientos.items() if hoy <= dia <= limite)
+    }
+
+def pipeline_reconciliacion() -> list:
+    """Totales y buckets de vencimiento recalculados desde stock"""
+    return [
+        {"$match": {"estado_stock": 1}},
+        {
+            "$facet": {
+                "totales": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "total_productos": {"$sum": 1},
+                            "valor_total_inventario": {"$sum": {"$ifNull": ["$valor_inventario", 0]}},
+                            "productos_stock_bajo": {
+                                "$sum": {"$cond": [{"$lte": ["$cantidad_total", "$stock_minimo"]}, 1, 0]}
+                            },
+                            "productos_stock_critico": {
+                                "$sum": {"$cond": [{"$lte": ["$cantidad_total", "$stock_critico"]}, 1, 0]}
+                            },
+                            "productos_sin_stock": {
+                                "$sum": {"$cond": [{"$eq": ["$cantidad_total", 0]}, 1, 0]}
+                            }
+                        }
+                    }
+                ],
+                "vencimientos": [
+                    {"$match": {"fecha_vencimiento": {"$ne": None}}},
+                    {
+                        "$group": {
+                            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$fecha_vencimiento"}},
+                            "cantidad": {"$sum": 1}
+                        }
+                    }
+                ]
+            }
+        }
+    ]
+
+def desvios_resumen(actual: dict, calculado: dict) -> dict:
+    """Contadores que difieren (tolerancia relativa para la suma de valores en float)"""
+    desvios = {
+        campo: (actual.get(campo, 0), calculado[campo])
+        for campo in CONTADORES_RESUMEN
+        if not math.isclose(actual.get(campo) or 0, calculado[campo], rel_tol=1e-9, abs_tol=1e-6)
+    }
+
+    vencimientos_actuales = {d: c for d, c in (actual.get("vencimientos") or {}).items() if c}
+    if vencimientos_actuales != calculado["vencimientos"]:
+        desvios["vencimientos"] = "buckets distintos"
+
+    return desvios
+
+async def reconciliar_resumen_inventario():
+    """
+    Recalcular el resumen desde stock y corregir desvíos
+
+    Se ejecuta al inicio (crea el documento) y periódicamente. Un desvío
+    indica un ajuste que no actualizó el resumen y se registra en el log
+    antes de corregirse. El reemplazo es condicional a la versión leída
+    antes de agregar: si un delta llega en el medio se reintenta, para no
+    perder ese $inc.
+    """
+    try:
+        for _ in range(RESUMEN_RECONCILIACION_REINTENTOS):
+            actual = await obtener_resumen_inventario()
+
+            resultado = await stock_collection().aggregate(pipeline_reconciliacion()).to_list(length=1)
+            facet = resultado[0] if resultado else {"totales": [], "vencimientos": []}
+            totales = facet["totales"][0] if facet["totales"] else {}
+
+            calculado = {campo: totales.get(campo, 0) for campo in CONTADORES_RESUMEN}
+            calculado["vencimientos"] = {v["_id"]: v["cantidad"] for v in facet["vencimientos"]}
+
+            version = (actual or {}).get("version", 0) + 1
+            documento = {
+                **calculado,
+                "version": version,
+                "updated_at": datetime.now(),
+                "reconciliado_at": datetime.now()
+            }
+
+            if actual is None:
+                try:
+                    await resumen_inventario_collection().insert_one({"_id": ID_RESUMEN, **documento})
+                except DuplicateKeyError:
+                    # Un delta creó el documento mientras se agregaba
+                    continue
+            else:
+                desvios = desvios_resumen(actual, calculado)
+                if not desvios:
+                    return
+
+                reemplazo = await resumen_inventario_collection().replace_one(
+                    {"_id": ID_RESUMEN, "version": actual.get("version")},
+                    documento
+                )
+                if not reemplazo.matched_count:
+                    continue
+
+                logger.warning(f"Resumen de inventario con desvío, corregido: {desvios}")
+
+            consultas_compartidas.invalidate(CLAVE_RESUMEN_STOCK)
+            return
+
+        logger.warning("Reconciliación del resumen omitida: el resumen cambió en cada intento")
+
+    except Exception as e:
+        logger.error(f"Error reconciliando resumen de inventario: {e}")
@@ -1,23 +1,135 @@
 # backend/app/server/functions/stock.py
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import PyMongoError
 from server.config.database import (
     stock_collection,
-    productos_collection,
-    log_activity
+    kardex_collection,
+    kardex_snapshots_collection,
+    LECTURA_REPORTES,
+    get_next_id,
+    reservar_ids,
+    transaccion,
+    log_activity,
+    log_activities
+)
+from server.config.cache import consultas_compartidas
+from server.functions.paginacion import paginar_consulta, paginar_por_cursor
+from server.functions.kardex import requiere_snapshot, documento_snapshot
+from server.functions.resumen_inventario import (
+    delta_resumen,
+    sumar_deltas,
+    aplicar_delta_resumen,
+    obtener_resumen_inventario,
+    reconciliar_resumen_inventario,
+    contar_vencimientos,
+    CLAVE_RESUMEN_STOCK
 )
 from server.models.stock import StockAdjust, StockAlert, StockValuation
 from datetime import datetime, date, timedelta
 from typing import List, Optional
+import asyncio
 import logging
-import math
 
 logger = logging.getLogger(__name__)
 
-async def obtener_stock(page: int = 1, limit: int = 20, stock_bajo: bool = False, stock_critico: bool = False):
-    """Obtener stock con paginación y filtros"""
+# Proyección común de la vista de stock (umbrales embebidos, sin $lookup)
+PROYECCION_STOCK = {
+    "id_stock": 1,
+    "producto_id": 1,
+    "producto_codigo": 1,
+    "producto_nombre": 1,
+    "cantidad_disponible": 1,
+    "cantidad_reservada": 1,
+    "cantidad_total": 1,
+    "ubicacion_fisica": 1,
+    "lote_serie": 1,
+    "fecha_vencimiento": 1,
+    "costo_promedio": 1,
+    "valor_inventario": 1,
+    "fecha_ultimo_movimiento": 1,
+    "alerta_generada": 1,
+    "nivel_stock": 1,
+    "stock_minimo": 1,
+    "stock_critico": 1,
+    "magnitud": "$magnitud_producto",
+    "_id": 0
+}
+
+# Proyección de los ajustes: incluye el contador interno de checkpoints de kardex
+PROYECCION_STOCK_AJUSTE = {**PROYECCION_STOCK, "movimientos_kardex": 1}
+
+# Campos del producto que se replican en su documento de stock
+CAMPOS_PRODUCTO_EN_STOCK = {
+    "nombre_producto": "producto_nombre",
+    "ubicacion_fisica": "ubicacion_fisica",
+    "costo_unitario": "costo_promedio",
+    "stock_minimo": "stock_minimo",
+    "stock_critico": "stock_critico",
+    "magnitud_producto": "magnitud_producto",
+    "estado_producto": "estado_stock"
+}
+
+def calcular_nivel_stock(cantidad_total: int, stock_minimo: int, stock_critico: int) -> str:
+    """Calcular nivel de stock ("critico", "bajo" o "normal")"""
+    if cantidad_total <= stock_critico:
+        return "critico"
+    if cantidad_total <= stock_minimo:
+        return "bajo"
+    return "normal"
+
+def etapa_nivel_stock() -> dict:
+    """Etapa de pipeline que recalcula nivel_stock y alerta_generada en el servidor"""
+    return {
+        "$set": {
+            "alerta_generada": {
+                "$or": [
+                    {"$lte": ["$cantidad_total", "$stock_critico"]},
+                    {"$lte": ["$cantidad_total", "$stock_minimo"]}
+                ]
+            },
+            "nivel_stock": {
+                "$switch": {
+                    "branches": [
+                        {"case": {"$lte": ["$cantidad_total", "$stock_critico"]}, "then": "critico"},
+                        {"case": {"$lte": ["$cantidad_total", "$stock_minimo"]}, "then": "bajo"}
+                    ],
+                    "default": "normal"
+                }
+            }
+        }
+    }
+
+def pipeline_sincronizar_producto(update_data: dict) -> list:
+    """Construir update pipeline que replica en stock los cambios de un producto"""
+    stock_update = {
+        campo_stock: {"$literal": update_data[campo_producto]}
+        for campo_producto, campo_stock in CAMPOS_PRODUCTO_EN_STOCK.items()
+        if campo_producto in update_data
+    }
+    
+    if not stock_update:
+        return []
+    
+    stock_update["updated_at"] = {"$literal": datetime.now()}
+    
+    return [{"$set": stock_update}, etapa_nivel_stock()]
+
+def stock_sincronizado(stock: dict, update_data: dict) -> dict:
+    """Versión en memoria de un stock tras pipeline_sincronizar_producto (para el delta del resumen)"""
+    stock_actualizado = dict(stock)
+    
+    for campo_producto, campo_stock in CAMPOS_PRODUCTO_EN_STOCK.items():
+        if campo_producto in update_data and campo_stock in stock_actualizado:
+            stock_actualizado[campo_stock] = update_data[campo_producto]
+    
+    return stock_actualizado
+
+async def sincronizar_vista_stock():
+    """Embeber umbrales del producto en documentos de stock que aún no los tienen"""
     try:
-        # Construir pipeline de agregación
         pipeline = [
+            {"$match": {"stock_minimo": {"$exists": False}}},
             {
                 "$lookup": {
                     "from": "productos",
@@ -28,90 +140,81 @@ async def obtener_stock(page: int = 1, limit: int = 20, stock_bajo: bool = False
             },
             {"$unwind": "$producto_info"},
             {
-                "$match": {
-                    "estado_stock": 1,
-                    "producto_info.estado_producto": 1
-                }
-            }
-        ]
-        
-        # Agregar filtros específicos
-        if stock_bajo:
-            pipeline.append({
-                "$match": {
-                    "$expr": {
-                        "$lte": ["$cantidad_total", "$producto_info.stock_minimo"]
+                "$set": {
+                    "stock_minimo": {"$ifNull": ["$producto_info.stock_minimo", 1]},
+                    "stock_critico": {"$ifNull": ["$producto_info.stock_critico", 0]},
+                    "magnitud_producto": {"$ifNull": ["$producto_info.magnitud_producto", "UND"]},
+                    "estado_stock": {
+                        "$cond": [
+                            {"$eq": ["$producto_info.estado_producto", 1]},
+                            {"$ifNull": ["$estado_stock", 1]},
+                            0
+                        ]
                     }
                 }
-            })
-        
-        if stock_critico:
-            pipeline.append({
-                "$match": {
-                    "$expr": {
-                        "$lte": ["$cantidad_total", "$producto_info.stock_critico"]
-                    }
-                }
-            })
-        
-        # Proyección final
-        pipeline.extend([
+            },
+            etapa_nivel_stock(),
+            {"$unset": "producto_info"},
             {
-                "$project": {
-                    "id_stock": 1,
-                    "producto_id": 1,
-                    "producto_codigo": 1,
-                    "producto_nombre": 1,
-                    "cantidad_disponible": 1,
-                    "cantidad_reservada": 1,
-                    "cantidad_total": 1,
-                    "ubicacion_fisica": 1,
-                    "lote_serie": 1,
-                    "fecha_vencimiento": 1,
-                    "costo_promedio": 1,
-                    "valor_inventario": 1,
-                    "fecha_ultimo_movimiento": 1,
-                    "alerta_generada": 1,
-                    "stock_minimo": "$producto_info.stock_minimo",
-                    "stock_critico": "$producto_info.stock_critico",
-                    "magnitud": "$producto_info.magnitud_producto",
-                    "_id": 0
+                "$merge": {
+                    "into": "stock",
+                    "on": "_id",
+                    "whenMatched": "merge",
+                    "whenNotMatched": "discard"
                 }
-            },
-            {"$sort": {"producto_nombre": 1}}
-        ])
-        
-        # Obtener total de registros
-        count_pipeline = pipeline.copy()
-        count_pipeline.append({"$count": "total"})
+            }
+        ]
         
-        count_result = await stock_collection().aggregate(count_pipeline).to_list(length=1)
-        total = count_result[0]["total"] if count_result else 0
+        await stock_collection().aggregate(pipeline).to_list(length=None)
         
-        # Agregar paginación
-        skip = (page - 1) * limit
-        pipeline.extend([
-            {"$skip": skip},
-            {"$limit": limit}
-        ])
+        logger.info("Vista de stock sincronizada con productos")
         
-        # Ejecutar consulta
-        cursor = stock_collection().aggregate(pipeline)
-        stock_data = await cursor.to_list(length=limit)
+    except Exception as e:
+        logger.error(f"Error sincronizando vista de stock: {e}")
+
+# Orden de listados: nombre de producto con id_stock como desempate (apto para cursor)
+ORDEN_STOCK = [("producto_nombre", 1), ("id_stock", 1)]
+
+async def obtener_stock(
+    page: int = 1,
+    limit: int = 20,
+    stock_bajo: bool = False,
+    stock_critico: bool = False,
+    cursor: Optional[str] = None
+):
+    """Obtener stock con paginación (por página o por cursor) y filtros"""
+    try:
+        # Construir filtros sobre campos embebidos (sin join con productos)
+        filtros = {"estado_stock": 1}
         
-        # Calcular paginación
-        pages = math.ceil(total / limit) if total > 0 else 0
+        if stock_critico:
+            filtros["nivel_stock"] = "critico"
+        elif stock_bajo:
+            filtros["nivel_stock"] = {"$in": ["bajo", "critico"]}
+        
+        # Modo cursor: keyset sobre (producto_nombre, id_stock)
+        if cursor:
+            return await paginar_por_cursor(
+                stock_collection(LECTURA_REPORTES),
+                filtros,
+                PROYECCION_STOCK,
+                ORDEN_STOCK,
+                limit,
+                cursor
+            )
         
-        return {
-            "data": stock_data,
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "pages": pages,
-            "has_next": page < pages,
-            "has_prev": page > 1
-        }
+        # Obtener página y total en un solo round trip
+        return await paginar_consulta(
+            stock_collection(LECTURA_REPORTES),
+            filtros,
+            PROYECCION_STOCK,
+            ORDEN_STOCK,
+            page,
+            limit
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error obteniendo stock: {e}")
         raise HTTPException(
@@ -122,43 +225,10 @@ async def obtener_stock(page: int = 1, limit: int = 20, stock_bajo: bool = False
 async def obtener_stock_por_producto(product_id: int):
     """Obtener stock específico de un producto"""
     try:
-        pipeline = [
-            {"$match": {"producto_id": product_id, "estado_stock": 1}},
-            {
-                "$lookup": {
-                    "from": "productos",
-                    "localField": "producto_id",
-                    "foreignField": "id_producto",
-                    "as": "producto_info"
-                }
-            },
-            {"$unwind": "$producto_info"},
-            {
-                "$project": {
-                    "id_stock": 1,
-                    "producto_id": 1,
-                    "producto_codigo": 1,
-                    "producto_nombre": 1,
-                    "cantidad_disponible": 1,
-                    "cantidad_reservada": 1,
-                    "cantidad_total": 1,
-                    "ubicacion_fisica": 1,
-                    "lote_serie": 1,
-                    "fecha_vencimiento": 1,
-                    "costo_promedio": 1,
-                    "valor_inventario": 1,
-                    "fecha_ultimo_movimiento": 1,
-                    "alerta_generada": 1,
-                    "stock_minimo": "$producto_info.stock_minimo",
-                    "stock_critico": "$producto_info.stock_critico",
-                    "magnitud": "$producto_info.magnitud_producto",
-                    "_id": 0
-                }
-            }
-        ]
-        
-        cursor = stock_collection().aggregate(pipeline)
-        stock_data = await cursor.to_list(length=1)
+        stock_data = await stock_collection().find_one(
+            {"producto_id": product_id, "estado_stock": 1},
+            PROYECCION_STOCK
+        )
         
         if not stock_data:
             raise HTTPException(
@@ -166,7 +236,7 @@ async def obtener_stock_por_producto(product_id: int):
                 detail="Stock no encontrado para el producto"
             )
         
-        return stock_data[0]
+        return stock_data
         
     except HTTPException:
         raise
@@ -177,72 +247,179 @@ async def obtener_stock_por_producto(product_id: int):
             detail="Error interno del servidor"
         )
 
+def filtro_ajuste_stock(producto_id: int, cantidad_ajuste: int) -> dict:
+    """Filtro de ajuste con guarda de no negatividad (evaluada atómicamente)"""
+    filtro = {"producto_id": producto_id, "estado_stock": 1}
+    
+    if cantidad_ajuste < 0:
+        filtro["cantidad_total"] = {"$gte": -cantidad_ajuste}
+    
+    return filtro
+
+def pipeline_ajuste_stock(adjustment_data: StockAdjust, adjusted_by: int, adjusted_by_name: str) -> list:
+    """Update pipeline que aplica el ajuste y recalcula valor y alertas en el servidor"""
+    ajuste = adjustment_data.cantidad_ajuste
+    ahora = datetime.now()
+    
+    cambios = {
+        # Equivalente a $inc dentro de un update pipeline
+        "cantidad_total": {"$add": ["$cantidad_total", ajuste]},
+        "cantidad_disponible": {
+            "$subtract": [
+                {"$add": ["$cantidad_total", ajuste]},
+                {"$ifNull": ["$cantidad_reservada", 0]}
+            ]
+        },
+        "fecha_ultimo_movimiento": {"$literal": ahora},
+        # Contador de movimientos para checkpoints de kardex
+        "movimientos_kardex": {"$add": [{"$ifNull": ["$movimientos_kardex", 0]}, 1]},
+        "updated_at": {"$literal": ahora},
+        "updated_by": {"$literal": adjusted_by},
+        "updated_by_name": {"$literal": adjusted_by_name}
+    }
+    
+    # Actualizar ubicación si se proporciona
+    if adjustment_data.ubicacion:
+        cambios["ubicacion_fisica"] = {"$literal": adjustment_data.ubicacion}
+    
+    # Actualizar lote/serie si se proporciona
+    if adjustment_data.lote_serie:
+        cambios["lote_serie"] = {"$literal": adjustment_data.lote_serie}
+    
+    return [
+        {"$set": cambios},
+        {
+            "$set": {
+                "valor_inventario": {
+                    "$multiply": ["$cantidad_total", {"$ifNull": ["$costo_promedio", 0]}]
+                }
+            }
+        },
+        etapa_nivel_stock()
+    ]
+
+# Orden del kardex: más reciente primero, id como desempate (apto para cursor)
+ORDEN_KARDEX = [("fecha_movimiento", -1), ("id_kardex", -1)]
+
+def documento_kardex(
+    id_kardex: int,
+    stock: dict,
+    ajuste: StockAdjust,
+    cantidad_anterior: int,
+    realizado_por_id: int,
+    realizado_por: str,
+    fecha_movimiento: datetime
+) -> dict:
+    """Construir movimiento de kardex (append-only) para un ajuste de stock"""
+    costo_unitario = stock.get("costo_promedio") or 0
+    
+    return {
+        "id_kardex": id_kardex,
+        "producto_id": ajuste.producto_id,
+        "producto_codigo": stock.get("producto_codigo"),
+        "producto_nombre": stock.get("producto_nombre"),
+        "tipo_movimiento": "AJUSTE_POSITIVO" if ajuste.cantidad_ajuste > 0 else "AJUSTE_NEGATIVO",
+        "cantidad_anterior": cantidad_anterior,
+        "cantidad_movimiento": ajuste.cantidad_ajuste,
+        "cantidad_actual": cantidad_anterior + ajuste.cantidad_ajuste,
+        "costo_unitario": costo_unitario,
+        "valor_movimiento": ajuste.cantidad_ajuste * costo_unitario,
+        "ubicacion_fisica": ajuste.ubicacion or stock.get("ubicacion_fisica"),
+        "lote_serie": ajuste.lote_serie or stock.get("lote_serie"),
+        "motivo": ajuste.motivo,
+        "fecha_movimiento": fecha_movimiento,
+        "realizado_por": realizado_por,
+        "realizado_por_id": realizado_por_id
+    }
+
+async def registrar_ajuste(
+    ajuste: StockAdjust,
+    id_kardex: int,
+    adjusted_by: int,
+    adjusted_by_name: str,
+    session=None
+) -> tuple:
+    """
+    Aplicar un ajuste con guarda y registrar su movimiento en kardex
+
+    El movimiento se arma desde el documento resultante, por lo que siempre
+    coincide con el stock. Retorna (stock_actualizado, movimiento) o
+    (None, None) si la guarda no coincide (inexistente o stock insuficiente).
+    """
+    stock_actualizado = await stock_collection().find_one_and_update(
+        filtro_ajuste_stock(ajuste.producto_id, ajuste.cantidad_ajuste),
+        pipeline_ajuste_stock(ajuste, adjusted_by, adjusted_by_name),
+        projection=PROYECCION_STOCK_AJUSTE,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    
+    if not stock_actualizado:
+        return None, None
+    
+    cantidad_anterior = stock_actualizado["cantidad_total"] - ajuste.cantidad_ajuste
+    movimiento = documento_kardex(
+        id_kardex,
+        stock_actualizado,
+        ajuste,
+        cantidad_anterior,
+        adjusted_by,
+        adjusted_by_name,
+        stock_actualizado["fecha_ultimo_movimiento"]
+    )
+    await kardex_collection().insert_one(movimiento, session=session)
+    
+    # Checkpoint de saldo cada KARDEX_SNAPSHOT_CADA movimientos del producto
+    if requiere_snapshot(stock_actualizado.get("movimientos_kardex", 0)):
+        await kardex_snapshots_collection().insert_one(documento_snapshot(movimiento), session=session)
+    
+    return stock_actualizado, movimiento
+
 async def ajustar_stock(adjustment_data: StockAdjust, adjusted_by: int, adjusted_by_name: str):
-    """Realizar ajuste de stock"""
+    """Realizar ajuste de stock (atómico, sin lecturas previas) y registrarlo en kardex"""
     try:
-        # Verificar que producto existe
-        producto = await productos_collection().find_one({
-            "id_producto": adjustment_data.producto_id,
-            "estado_producto": 1
-        })
-        
-        if not producto:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Producto no encontrado"
-            )
-        
-        # Obtener stock actual
-        stock_actual = await stock_collection().find_one({
-            "producto_id": adjustment_data.producto_id,
-            "estado_stock": 1
-        })
-        
-        if not stock_actual:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Stock no encontrado para el producto"
+        id_kardex = await get_next_id("kardex")
+        
+        async with transaccion() as session:
+            # Aplicar ajuste y registrar su movimiento en kardex
+            stock_actualizado, _ = await registrar_ajuste(
+                adjustment_data,
+                id_kardex,
+                adjusted_by,
+                adjusted_by_name,
+                session
             )
-        
-        # Calcular nuevas cantidades
-        cantidad_anterior = stock_actual["cantidad_total"]
-        nueva_cantidad = cantidad_anterior + adjustment_data.cantidad_ajuste
-        
-        # Validar que no quede negativo
-        if nueva_cantidad < 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El ajuste resultaría en stock negativo"
-            )
-        
-        # Actualizar stock
-        update_data = {
-            "cantidad_total": nueva_cantidad,
-            "cantidad_disponible": nueva_cantidad - stock_actual["cantidad_reservada"],
-            "fecha_ultimo_movimiento": datetime.now(),
-            "updated_at": datetime.now(),
-            "updated_by": adjusted_by,
-            "updated_by_name": adjusted_by_name
+            
+            if not stock_actualizado:
+                # Solo en el camino de error: distinguir inexistente de stock insuficiente
+                existe = await stock_collection().find_one(
+                    {"producto_id": adjustment_data.producto_id, "estado_stock": 1},
+                    {"_id": 1},
+                    session=session
+                )
+                
+                if not existe:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Stock no encontrado para el producto"
+                    )
+                
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="El ajuste resultaría en stock negativo"
+                )
+            
+            nueva_cantidad = stock_actualizado["cantidad_total"]
+            cantidad_anterior = nueva_cantidad - adjustment_data.cantidad_ajuste
+        
+        # Actualizar totales del inventario ($inc fuera de la transacción para
+        # no convertir el documento de resumen en un punto de conflicto)
+        stock_anterior = {
+            **stock_actualizado,
+            "cantidad_total": cantidad_anterior,
+            "valor_inventario": cantidad_anterior * (stock_actualizado.get("costo_promedio") or 0)
         }
-        
-        # Actualizar ubicación si se proporciona
-        if adjustment_data.ubicacion:
-            update_data["ubicacion_fisica"] = adjustment_data.ubicacion
-        
-        # Actualizar lote/serie si se proporciona
-        if adjustment_data.lote_serie:
-            update_data["lote_serie"] = adjustment_data.lote_serie
-        
-        # Calcular valor de inventario
-        costo_promedio = stock_actual.get("costo_promedio", 0)
-        update_data["valor_inventario"] = nueva_cantidad * costo_promedio
-        
-        await stock_collection().update_one(
-            {"producto_id": adjustment_data.producto_id},
-            {"$set": update_data}
-        )
-        
-        # TODO: Registrar en kardex (se implementará en Fase 2)
+        await aplicar_delta_resumen(delta_resumen(stock_anterior, stock_actualizado))
         
         # Log de actividad
         await log_activity(
@@ -259,14 +436,10 @@ async def ajustar_stock(adjustment_data: StockAdjust, adjusted_by: int, adjusted
             }
         )
         
-        # Verificar si necesita generar alertas
-        await verificar_alertas_stock(adjustment_data.producto_id, producto)
-        
         logger.info(f"Stock ajustado para producto {adjustment_data.producto_id}: {adjustment_data.cantidad_ajuste}")
         
-        # Obtener stock actualizado
-        stock_actualizado = await obtener_stock_por_producto(adjustment_data.producto_id)
-        
+        # El contador de checkpoints es interno
+        stock_actualizado.pop("movimientos_kardex", None)
         return stock_actualizado
         
     except HTTPException:
@@ -278,82 +451,311 @@ async def ajustar_stock(adjustment_data: StockAdjust, adjusted_by: int, adjusted
             detail="Error interno del servidor"
         )
 
-async def obtener_alertas_stock() -> List[StockAlert]:
-    """Obtener alertas de stock bajo/crítico"""
+async def ajustar_stock_masivo(ajustes: List[StockAdjust], adjusted_by: int, adjusted_by_name: str):
+    """Aplicar ajustes masivos de stock con un solo bulk_write ordenado (uno a uno sin transacciones)"""
     try:
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "productos",
-                    "localField": "producto_id",
-                    "foreignField": "id_producto",
-                    "as": "producto_info"
-                }
-            },
-            {"$unwind": "$producto_info"},
-            {
-                "$match": {
-                    "estado_stock": 1,
-                    "producto_info.estado_producto": 1,
-                    "$or": [
-                        {
-                            "$expr": {
-                                "$lte": ["$cantidad_total", "$producto_info.stock_critico"]
-                            }
-                        },
-                        {
-                            "$expr": {
-                                "$lte": ["$cantidad_total", "$producto_info.stock_minimo"]
-                            }
-                        }
-                    ]
-                }
-            },
-            {
-                "$project": {
+        # Lectura, simulación y escrituras en la misma transacción (si está disponible)
+        async with transaccion() as session:
+            # Validar todos los productos con una sola consulta $in
+            producto_ids = list({ajuste.producto_id for ajuste in ajustes})
+            cursor = stock_collection().find(
+                {"producto_id": {"$in": producto_ids}, "estado_stock": 1},
+                {
                     "producto_id": 1,
                     "producto_codigo": 1,
                     "producto_nombre": 1,
-                    "cantidad_actual": "$cantidad_total",
-                    "stock_minimo": "$producto_info.stock_minimo",
-                    "stock_critico": "$producto_info.stock_critico",
+                    "cantidad_total": 1,
+                    "costo_promedio": 1,
+                    "ubicacion_fisica": 1,
+                    "lote_serie": 1,
+                    "movimientos_kardex": 1,
+                    "valor_inventario": 1,
+                    "stock_minimo": 1,
+                    "stock_critico": 1,
                     "fecha_vencimiento": 1,
                     "_id": 0
+                },
+                session=session
+            )
+            stocks = {stock["producto_id"]: stock async for stock in cursor}
+            saldos = {producto_id: stock["cantidad_total"] for producto_id, stock in stocks.items()}
+            contadores = {producto_id: stock.get("movimientos_kardex", 0) for producto_id, stock in stocks.items()}
+            
+            # Simular en orden para dar resultado por ítem y armar las operaciones
+            fecha_movimiento = datetime.now()
+            operaciones = []
+            movimientos = []
+            pendientes = []
+            checkpoints = []
+            delta_total = {}
+            resultados = []
+            
+            for indice, ajuste in enumerate(ajustes):
+                resultado = {
+                    "indice": indice,
+                    "producto_id": ajuste.producto_id,
+                    "cantidad_ajuste": ajuste.cantidad_ajuste
                 }
-            }
+                
+                if ajuste.producto_id not in saldos:
+                    resultado.update(estado="rechazado", detalle="Stock no encontrado para el producto")
+                    resultados.append(resultado)
+                    continue
+                
+                cantidad_anterior = saldos[ajuste.producto_id]
+                nueva_cantidad = cantidad_anterior + ajuste.cantidad_ajuste
+                
+                if nueva_cantidad < 0:
+                    resultado.update(estado="rechazado", detalle="El ajuste resultaría en stock negativo")
+                    resultados.append(resultado)
+                    continue
+                
+                saldos[ajuste.producto_id] = nueva_cantidad
+                
+                # Delta de los totales del inventario (estado simulado antes/después)
+                stock_previo = stocks[ajuste.producto_id]
+                stock_nuevo = {
+                    **stock_previo,
+                    "cantidad_total": nueva_cantidad,
+                    "valor_inventario": nueva_cantidad * (stock_previo.get("costo_promedio") or 0)
+                }
+                sumar_deltas(delta_total, delta_resumen(stock_previo, stock_nuevo))
+                stocks[ajuste.producto_id] = stock_nuevo
+                
+                # Guarda optimista: saldo y contador de movimientos deben ser los
+                # simulados (el kardex y sus checkpoints se arman con ellos), así
+                # cualquier cambio concurrente reduce matched_count y revierte el lote
+                operaciones.append(UpdateOne(
+                    {
+                        **filtro_ajuste_stock(ajuste.producto_id, ajuste.cantidad_ajuste),
+                        "cantidad_total": cantidad_anterior,
+                        "movimientos_kardex": contadores[ajuste.producto_id] or {"$in": [0, None]}
+                    },
+                    pipeline_ajuste_stock(ajuste, adjusted_by, adjusted_by_name)
+                ))
+                
+                movimiento = documento_kardex(
+                    None,
+                    stocks[ajuste.producto_id],
+                    ajuste,
+                    cantidad_anterior,
+                    adjusted_by,
+                    adjusted_by_name,
+                    fecha_movimiento
+                )
+                movimientos.append(movimiento)
+                
+                contadores[ajuste.producto_id] += 1
+                if requiere_snapshot(contadores[ajuste.producto_id]):
+                    checkpoints.append(movimiento)
+                
+                actividad = {
+                    "action": "STOCK_ADJUSTED",
+                    "module": "stock",
+                    "user_id": adjusted_by,
+                    "user_name": adjusted_by_name,
+                    "details": {
+                        "producto_id": ajuste.producto_id,
+                        "cantidad_anterior": cantidad_anterior,
+                        "cantidad_ajuste": ajuste.cantidad_ajuste,
+                        "cantidad_nueva": nueva_cantidad,
+                        "motivo": ajuste.motivo,
+                        "masivo": True
+                    }
+                }
+                
+                resultado.update(estado="aplicado", cantidad_anterior=cantidad_anterior, cantidad_nueva=nueva_cantidad)
+                resultados.append(resultado)
+                pendientes.append((ajuste, resultado, actividad))
+            
+            # Aplicar todo en un solo bulk_write ordenado (las guardas siguen activas)
+            # y registrar los movimientos de kardex en la misma transacción
+            conflictos = 0
+            if operaciones:
+                primer_id = await reservar_ids("kardex", len(movimientos))
+                for desplazamiento, movimiento in enumerate(movimientos):
+                    movimiento["id_kardex"] = primer_id + desplazamiento
+                
+                if session.in_transaction:
+                    bulk_result = await stock_collection().bulk_write(operaciones, ordered=True, session=session)
+                    conflictos = len(operaciones) - bulk_result.matched_count
+                    
+                    if conflictos:
+                        # Revertir el lote completo: el kardex debe reflejar exactamente el stock
+                        raise HTTPException(
+                            status_code=status.HTTP_409_CONFLICT,
+                            detail="El stock cambió durante el ajuste masivo; reintente la operación"
+                        )
+                    
+                    await kardex_collection().insert_many(movimientos, ordered=False, session=session)
+                    
+                    if checkpoints:
+                        await kardex_snapshots_collection().insert_many(
+                            [documento_snapshot(movimiento) for movimiento in checkpoints],
+                            ordered=False,
+                            session=session
+                        )
+                else:
+                    # Sin transacciones un bulk con conflictos no se puede revertir ni
+                    # saber qué operaciones coincidieron: aplicar uno a uno y registrar
+                    # cada movimiento, resultado y log desde el documento resultante
+                    delta_total = {}
+                    for (ajuste, resultado, actividad), movimiento in zip(pendientes, movimientos):
+                        stock_actualizado, _ = await registrar_ajuste(
+                            ajuste,
+                            movimiento["id_kardex"],
+                            adjusted_by,
+                            adjusted_by_name,
+                            session
+                        )
+                        
+                        if not stock_actualizado:
+                            conflictos += 1
+                            resultado.pop("cantidad_anterior", None)
+                            resultado.pop("cantidad_nueva", None)
+                            resultado.update(
+                                estado="conflicto",
+                                detalle="El stock cambió durante el ajuste masivo; no se aplicó"
+                            )
+                            continue
+                        
+                        nueva_cantidad = stock_actualizado["cantidad_total"]
+                        cantidad_anterior = nueva_cantidad - ajuste.cantidad_ajuste
+                        resultado.update(cantidad_anterior=cantidad_anterior, cantidad_nueva=nueva_cantidad)
+                        actividad["details"].update(cantidad_anterior=cantidad_anterior, cantidad_nueva=nueva_cantidad)
+                        
+                        stock_anterior = {
+                            **stock_actualizado,
+                            "cantidad_total": cantidad_anterior,
+                            "valor_inventario": cantidad_anterior * (stock_actualizado.get("costo_promedio") or 0)
+                        }
+                        sumar_deltas(delta_total, delta_resumen(stock_anterior, stock_actualizado))
+                    
+                    if conflictos:
+                        logger.warning(
+                            f"Ajuste masivo: {conflictos} ajustes no aplicados por cambios concurrentes de stock"
+                        )
+        
+        # Totales del inventario: un solo $inc con el delta de lo aplicado
+        await aplicar_delta_resumen(delta_total)
+        
+        # Log de actividad en lote (solo ajustes aplicados)
+        await log_activities([
+            actividad for _, resultado, actividad in pendientes
+            if resultado["estado"] == "aplicado"
+        ])
+        
+        aplicados = len(operaciones) - conflictos
+        
+        logger.info(f"Ajuste masivo de stock: {aplicados} aplicados de {len(ajustes)}")
+        
+        return {
+            "total": len(ajustes),
+            "aplicados": aplicados,
+            "rechazados": len(ajustes) - len(operaciones),
+            "conflictos": conflictos,
+            "resultados": resultados
+        }
+    
+    except HTTPException:
+        raise
+    except PyMongoError as e:
+        if e.has_error_label("TransientTransactionError"):
+            # Conflicto de escritura con otra transacción sobre el mismo stock
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="El stock cambió durante el ajuste masivo; reintente la operación"
+            )
+        logger.error(f"Error en ajuste masivo de stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+    except Exception as e:
+        logger.error(f"Error en ajuste masivo de stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
+
+# Días de anticipación para alertar vencimientos
+DIAS_ALERTA_VENCIMIENTO = 30
+
+def filtro_alertas_stock(fecha_actual: datetime) -> dict:
+    """
+    Stock con alerta: nivel bajo/crítico (mantenido en cada escritura) o
+    vencimiento dentro de DIAS_ALERTA_VENCIMIENTO. Cada rama del $or usa su
+    propio índice, de modo que solo se lee el conjunto pequeño de alertas.
+    """
+    fecha_limite = fecha_actual + timedelta(days=DIAS_ALERTA_VENCIMIENTO)
+    
+    return {
+        "$or": [
+            {"estado_stock": 1, "alerta_generada": True},
+            {"estado_stock": 1, "fecha_vencimiento": {"$ne": None, "$lte": fecha_limite}}
         ]
+    }
+
+def clasificar_alerta(stock: dict, fecha_actual: datetime) -> Optional[tuple]:
+    """Determinar (tipo_alerta, urgencia) de un documento de stock, o None"""
+    tipo_alerta, urgencia = None, None
+    
+    if stock.get("nivel_stock") == "critico":
+        tipo_alerta, urgencia = "critico", "critica"
+    elif stock.get("nivel_stock") == "bajo":
+        tipo_alerta, urgencia = "bajo", "alta"
+    
+    # Verificar vencimiento próximo
+    fecha_vencimiento = stock.get("fecha_vencimiento")
+    if fecha_vencimiento:
+        if isinstance(fecha_vencimiento, datetime):
+            fecha_vencimiento = fecha_vencimiento.date()
+        dias_para_vencer = (fecha_vencimiento - fecha_actual.date()).days
+        if dias_para_vencer <= DIAS_ALERTA_VENCIMIENTO:
+            tipo_alerta = "vencimiento"
+            urgencia = "media" if dias_para_vencer > 7 else "alta"
+    
+    if tipo_alerta is None:
+        return None
+    
+    return tipo_alerta, urgencia
+
+async def obtener_alertas_stock() -> List[StockAlert]:
+    """Obtener alertas de stock bajo/crítico y vencimientos (consulta indexada)"""
+    try:
+        fecha_actual = datetime.now()
         
-        cursor = stock_collection().aggregate(pipeline)
-        stock_data = await cursor.to_list(length=None)
+        cursor = stock_collection(LECTURA_REPORTES).find(
+            filtro_alertas_stock(fecha_actual),
+            {
+                "producto_id": 1,
+                "producto_codigo": 1,
+                "producto_nombre": 1,
+                "cantidad_total": 1,
+                "stock_minimo": 1,
+                "stock_critico": 1,
+                "nivel_stock": 1,
+                "fecha_vencimiento": 1,
+                "_id": 0
+            }
+        )
         
         alertas = []
-        fecha_actual = datetime.now()
         
-        for item in stock_data:
-            # Determinar tipo de alerta
-            if item["cantidad_actual"] <= item["stock_critico"]:
-                tipo_alerta = "critico"
-                urgencia = "critica"
-            elif item["cantidad_actual"] <= item["stock_minimo"]:
-                tipo_alerta = "bajo"
-                urgencia = "alta"
-            else:
+        async for item in cursor:
+            clasificacion = clasificar_alerta(item, fecha_actual)
+            if not clasificacion:
                 continue
             
-            # Verificar vencimiento próximo
-            if item.get("fecha_vencimiento"):
-                dias_para_vencer = (item["fecha_vencimiento"] - fecha_actual.date()).days
-                if dias_para_vencer <= 30:
-                    tipo_alerta = "vencimiento"
-                    urgencia = "media" if dias_para_vencer > 7 else "alta"
+            tipo_alerta, urgencia = clasificacion
             
             alerta = StockAlert(
                 producto_id=item["producto_id"],
                 producto_codigo=item["producto_codigo"],
                 producto_nombre=item["producto_nombre"],
-                cantidad_actual=item["cantidad_actual"],
-                stock_minimo=item["stock_minimo"],
-                stock_critico=item["stock_critico"],
+                cantidad_actual=item["cantidad_total"],
+                stock_minimo=item.get("stock_minimo", 0),
+                stock_critico=item.get("stock_critico", 0),
                 tipo_alerta=tipo_alerta,
                 urgencia=urgencia,
                 fecha_alerta=fecha_actual
@@ -371,132 +773,28 @@ async def obtener_alertas_stock() -> List[StockAlert]:
         )
 
 async def calcular_valoracion_inventario() -> StockValuation:
-    """Calcular valorización total del inventario"""
+    """Obtener valorización del inventario desde el resumen mantenido en cada escritura"""
     try:
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "productos",
-                    "localField": "producto_id",
-                    "foreignField": "id_producto",
-                    "as": "producto_info"
-                }
-            },
-            {"$unwind": "$producto_info"},
-            {
-                "$match": {
-                    "estado_stock": 1,
-                    "producto_info.estado_producto": 1
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "total_productos": {"$sum": 1},
-                    "valor_total_inventario": {"$sum": "$valor_inventario"},
-                    "productos_stock_bajo": {
-                        "$sum": {
-                            "$cond": [
-                                {
-                                    "$lte": ["$cantidad_total", "$producto_info.stock_minimo"]
-                                },
-                                1,
-                                0
-                            ]
-                        }
-                    },
-                    "productos_stock_critico": {
-                        "$sum": {
-                            "$cond": [
-                                {
-                                    "$lte": ["$cantidad_total", "$producto_info.stock_critico"]
-                                },
-                                1,
-                                0
-                            ]
-                        }
-                    },
-                    "productos_sin_stock": {
-                        "$sum": {
-                            "$cond": [
-                                {"$eq": ["$cantidad_total", 0]},
-                                1,
-                                0
-                            ]
-                        }
-                    }
-                }
-            }
-        ]
-        
-        cursor = stock_collection().aggregate(pipeline)
-        result = await cursor.to_list(length=1)
-        
-        if not result:
-            return StockValuation(
-                total_productos=0,
-                valor_total_inventario=0.0,
-                productos_stock_bajo=0,
-                productos_stock_critico=0,
-                productos_sin_stock=0,
-                productos_vencidos=0,
-                productos_por_vencer=0,
-                fecha_calculo=datetime.now()
-            )
+        resumen = await obtener_resumen_inventario(LECTURA_REPORTES)
         
-        data = result[0]
+        if not resumen:
+            # Primera lectura sin resumen: construirlo desde stock
+            await reconciliar_resumen_inventario()
+            resumen = await obtener_resumen_inventario() or {}
         
-        # Calcular productos vencidos y por vencer
+        # Vencidos y por vencer a partir de los buckets diarios
         fecha_actual = date.today()
-        fecha_limite = fecha_actual + timedelta(days=30)
-        
-        vencimientos = await stock_collection().aggregate([
-            {
-                "$match": {
-                    "estado_stock": 1,
-                    "fecha_vencimiento": {"$ne": None}
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "productos_vencidos": {
-                        "$sum": {
-                            "$cond": [
-                                {"$lt": ["$fecha_vencimiento", fecha_actual]},
-                                1,
-                                0
-                            ]
-                        }
-                    },
-                    "productos_por_vencer": {
-                        "$sum": {
-                            "$cond": [
-                                {
-                                    "$and": [
-                                        {"$gte": ["$fecha_vencimiento", fecha_actual]},
-                                        {"$lte": ["$fecha_vencimiento", fecha_limite]}
-                                    ]
-                                },
-                                1,
-                                0
-                            ]
-                        }
-                    }
-                }
-            }
-        ]).to_list(length=1)
-        
-        vencimientos_data = vencimientos[0] if vencimientos else {}
+        fecha_limite = fecha_actual + timedelta(days=DIAS_ALERTA_VENCIMIENTO)
+        vencimientos = contar_vencimientos(resumen.get("vencimientos") or {}, fecha_actual, fecha_limite)
         
         return StockValuation(
-            total_productos=data["total_productos"],
-            valor_total_inventario=data["valor_total_inventario"],
-            productos_stock_bajo=data["productos_stock_bajo"],
-            productos_stock_critico=data["productos_stock_critico"],
-            productos_sin_stock=data["productos_sin_stock"],
-            productos_vencidos=vencimientos_data.get("productos_vencidos", 0),
-            productos_por_vencer=vencimientos_data.get("productos_por_vencer", 0),
+            total_productos=resumen.get("total_productos", 0),
+            valor_total_inventario=resumen.get("valor_total_inventario", 0.0),
+            productos_stock_bajo=resumen.get("productos_stock_bajo", 0),
+            productos_stock_critico=resumen.get("productos_stock_critico", 0),
+            productos_sin_stock=resumen.get("productos_sin_stock", 0),
+            productos_vencidos=vencimientos["productos_vencidos"],
+            productos_por_vencer=vencimientos["productos_por_vencer"],
             fecha_calculo=datetime.now()
         )
         
@@ -507,37 +805,86 @@ async def calcular_valoracion_inventario() -> StockValuation:
             detail="Error interno del servidor"
         )
 
-async def verificar_alertas_stock(producto_id: int, producto_info: dict):
-    """Verificar y actualizar alertas para un producto específico"""
+async def calcular_resumen_stock() -> dict:
+    """Valorización y alertas en paralelo, combinadas en el resumen ejecutivo"""
+    valoracion, alertas = await asyncio.gather(
+        calcular_valoracion_inventario(),
+        obtener_alertas_stock()
+    )
+    
+    total_productos = valoracion.total_productos
+    
+    return {
+        "valoracion": valoracion.dict(),
+        "alertas": {
+            "total": len(alertas),
+            "criticas": len([a for a in alertas if a.urgencia == "critica"]),
+            "altas": len([a for a in alertas if a.urgencia == "alta"]),
+            "medias": len([a for a in alertas if a.urgencia == "media"])
+        },
+        "indicadores": {
+            "productos_activos": total_productos,
+            "valor_promedio_producto": (
+                valoracion.valor_total_inventario / total_productos
+                if total_productos > 0 else 0
+            ),
+            "porcentaje_stock_bajo": (
+                (valoracion.productos_stock_bajo / total_productos * 100)
+                if total_productos > 0 else 0
+            ),
+            "porcentaje_stock_critico": (
+                (valoracion.productos_stock_critico / total_productos * 100)
+                if total_productos > 0 else 0
+            )
+        }
+    }
+
+async def obtener_resumen_stock() -> dict:
+    """
+    Resumen ejecutivo del stock con ejecución compartida
+    
+    Las solicitudes concurrentes esperan un único cálculo en curso y el
+    resultado se reutiliza durante CONSULTAS_CACHE_TTL segundos (se invalida
+    al ajustar stock en este worker).
+    """
+    return await consultas_compartidas.ejecutar(CLAVE_RESUMEN_STOCK, calcular_resumen_stock)
+
+async def obtener_movimientos_stock(
+    producto_id: Optional[int] = None,
+    limit: int = 50,
+    fecha_desde: Optional[datetime] = None,
+    fecha_hasta: Optional[datetime] = None,
+    cursor: Optional[str] = None
+):
+    """Obtener movimientos de kardex por rango de fechas, paginados por cursor"""
     try:
-        stock = await stock_collection().find_one({
-            "producto_id": producto_id,
-            "estado_stock": 1
-        })
-        
-        if not stock:
-            return
-        
-        # Determinar si necesita alerta
-        necesita_alerta = (
-            stock["cantidad_total"] <= producto_info["stock_critico"] or
-            stock["cantidad_total"] <= producto_info["stock_minimo"]
+        # Filtros alineados con los índices (producto_id, fecha_movimiento, id_kardex)
+        filtros = {}
+        if producto_id is not None:
+            filtros["producto_id"] = producto_id
+        
+        rango_fechas = {}
+        if fecha_desde:
+            rango_fechas["$gte"] = fecha_desde
+        if fecha_hasta:
+            rango_fechas["$lte"] = fecha_hasta
+        if rango_fechas:
+            filtros["fecha_movimiento"] = rango_fechas
+        
+        return await paginar_por_cursor(
+            kardex_collection(LECTURA_REPORTES),
+            filtros,
+            {"_id": 0},
+            ORDEN_KARDEX,
+            limit,
+            cursor
         )
         
-        # Actualizar flag de alerta si cambió
-        if stock["alerta_generada"] != necesita_alerta:
-            await stock_collection().update_one(
-                {"producto_id": producto_id},
-                {"$set": {"alerta_generada": necesita_alerta}}
-            )
-            
-            logger.info(f"Alerta {'activada' if necesita_alerta else 'desactivada'} para producto {producto_id}")
-        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error verificando alertas: {e}")
-
-async def obtener_movimientos_stock(producto_id: Optional[int] = None, limit: int = 50):
-    """Obtener histórico de movimientos de stock"""
-    # TODO: Implementar cuando se tenga el módulo kardex en Fase 2
-    # Por ahora retorna lista vacía
-    return []
\ No newline at end of file
+        logger.error(f"Error obteniendo movimientos de stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
+        )
@@ -1,17 +1,23 @@
 # backend/app/server/functions/usuarios.py
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from server.config.database import (
     usuarios_collection, 
     get_next_id, 
+    filtro_con_cambios,
+    LECTURA_REPORTES,
     save_to_history, 
     log_activity
 )
 from server.config.security import SecurityManager
+from server.config.cache import cache_usuarios
+from server.functions.paginacion import paginar_consulta, paginar_por_cursor
+from server.functions.busqueda import planificar_busqueda, rango_prefijo, filtro_texto, ORDEN_TEXTO
 from server.models.usuarios import UsuarioCreate, UsuarioUpdate
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import logging
-import math
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +48,7 @@ async def crear_usuario(usuario_data: UsuarioCreate, created_by: int = 0, create
         nuevo_id = await get_next_id("usuarios")
         
         # Hash de la contraseña
-        password_hash = SecurityManager.hash_password(usuario_data.password)
+        password_hash = await SecurityManager.hash_password_async(usuario_data.password)
         
         # Preparar datos del usuario
         usuario_dict = {
@@ -130,41 +136,40 @@ async def obtener_usuario_por_id(user_id: int):
             detail="Error interno del servidor"
         )
 
-async def obtener_usuarios(page: int = 1, limit: int = 20, estado: Optional[int] = None):
-    """Obtener lista de usuarios con paginación"""
+# Orden de listados: fecha de creación con id como desempate (apto para cursor)
+ORDEN_USUARIOS = [("created_at", -1), ("id_usuario", -1)]
+
+async def obtener_usuarios(page: int = 1, limit: int = 20, estado: Optional[int] = None, cursor: Optional[str] = None):
+    """Obtener lista de usuarios con paginación (por página o por cursor)"""
     try:
         # Construir filtros
         filtros = {}
         if estado is not None:
             filtros["estado_usuario"] = estado
         
-        # Calcular skip
-        skip = (page - 1) * limit
-        
-        # Obtener total de registros
-        total = await usuarios_collection().count_documents(filtros)
+        # Modo cursor: keyset sobre (created_at, id_usuario)
+        if cursor:
+            return await paginar_por_cursor(
+                usuarios_collection(LECTURA_REPORTES),
+                filtros,
+                {"password_hash": 0, "_id": 0},
+                ORDEN_USUARIOS,
+                limit,
+                cursor
+            )
         
-        # Obtener usuarios
-        cursor = usuarios_collection().find(
+        # Obtener página y total en un solo round trip
+        return await paginar_consulta(
+            usuarios_collection(LECTURA_REPORTES),
             filtros,
-            {"password_hash": 0, "_id": 0}
-        ).sort("created_at", -1).skip(skip).limit(limit)
-        
-        usuarios = await cursor.to_list(length=limit)
-        
-        # Calcular paginación
-        pages = math.ceil(total / limit) if total > 0 else 0
-        
-        return {
-            "data": usuarios,
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "pages": pages,
-            "has_next": page < pages,
-            "has_prev": page > 1
-        }
+            {"password_hash": 0, "_id": 0},
+            ORDEN_USUARIOS,
+            page,
+            limit
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error obteniendo usuarios: {e}")
         raise HTTPException(
@@ -173,16 +178,8 @@ async def obtener_usuarios(page: int = 1, limit: int = 20, estado: Optional[int]
         )
 
 async def actualizar_usuario(user_id: int, usuario_data: UsuarioUpdate, updated_by: int, updated_by_name: str):
-    """Actualizar usuario"""
+    """Actualizar usuario (una sola escritura que retorna el documento actualizado)"""
     try:
-        # Verificar que usuario existe
-        usuario_actual = await usuarios_collection().find_one({"id_usuario": user_id})
-        if not usuario_actual:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Usuario no encontrado"
-            )
-        
         # Preparar datos para actualizar
         update_data = {}
         for field, value in usuario_data.dict(exclude_unset=True).items():
@@ -195,17 +192,7 @@ async def actualizar_usuario(user_id: int, usuario_data: UsuarioUpdate, updated_
                 detail="No hay datos para actualizar"
             )
         
-        # Verificar email único si se está actualizando
-        if "email_usuario" in update_data:
-            existing_email = await usuarios_collection().find_one({
-                "email_usuario": update_data["email_usuario"],
-                "id_usuario": {"$ne": user_id}
-            })
-            if existing_email:
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="El email ya está registrado"
-                )
+        cambios = dict(update_data)
         
         # Agregar metadatos de actualización
         update_data.update({
@@ -214,23 +201,37 @@ async def actualizar_usuario(user_id: int, usuario_data: UsuarioUpdate, updated_
             "updated_by_name": updated_by_name
         })
         
-        # Actualizar en BD
-        result = await usuarios_collection().update_one(
-            {"id_usuario": user_id},
-            {"$set": update_data}
-        )
+        # Actualizar solo si algún campo cambia; la unicidad del email la
+        # garantiza el índice único (sin consulta previa)
+        try:
+            usuario_actualizado = await usuarios_collection().find_one_and_update(
+                filtro_con_cambios({"id_usuario": user_id}, cambios),
+                {"$set": update_data},
+                projection={"password_hash": 0, "_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="El email ya está registrado"
+            )
         
-        if result.modified_count == 0:
+        if not usuario_actualizado:
+            # Solo en el camino de error: distinguir inexistente de sin cambios
+            existe = await usuarios_collection().find_one({"id_usuario": user_id}, {"_id": 1})
+            
+            if not existe:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Usuario no encontrado"
+                )
+            
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No se realizaron cambios"
             )
         
-        # Obtener usuario actualizado
-        usuario_actualizado = await usuarios_collection().find_one(
-            {"id_usuario": user_id},
-            {"password_hash": 0, "_id": 0}
-        )
+        cache_usuarios.invalidate(user_id)
         
         # Guardar en histórico
         await save_to_history(
@@ -298,6 +299,8 @@ async def eliminar_usuario(user_id: int, deleted_by: int, deleted_by_name: str):
             }
         )
         
+        cache_usuarios.invalidate(user_id)
+        
         # Guardar en histórico
         usuario["estado_usuario"] = 0
         await save_to_history(
@@ -333,15 +336,19 @@ async def eliminar_usuario(user_id: int, deleted_by: int, deleted_by_name: str):
 async def buscar_usuarios(query: str, tipo_usuario: Optional[int] = None, estado: Optional[int] = None, limit: int = 20):
     """Buscar usuarios por nombre, email o código"""
     try:
-        # Construir filtros de búsqueda
-        filtros = {
-            "$or": [
-                {"nombre_usuario": {"$regex": query, "$options": "i"}},
-                {"email_usuario": {"$regex": query, "$options": "i"}},
-                {"codigo_usuario": {"$regex": query, "$options": "i"}},
-                {"area_usuario": {"$regex": query, "$options": "i"}}
-            ]
-        }
+        # Planificar búsqueda: email o código por rango anclado sobre su índice
+        # único; el resto por índice de texto (nombre y área)
+        plan, termino = planificar_busqueda(query, permitir_email=True)
+        
+        if plan == "email":
+            filtros = {"email_usuario": rango_prefijo(termino)}
+            orden = [("email_usuario", 1)]
+        elif plan == "codigo":
+            filtros = {"codigo_usuario": rango_prefijo(termino)}
+            orden = [("codigo_usuario", 1)]
+        else:
+            filtros = filtro_texto(termino)
+            orden = ORDEN_TEXTO
         
         if tipo_usuario is not None:
             filtros["tipo_usuario"] = tipo_usuario
@@ -350,15 +357,17 @@ async def buscar_usuarios(query: str, tipo_usuario: Optional[int] = None, estado
             filtros["estado_usuario"] = estado
         
         # Realizar búsqueda
-        cursor = usuarios_collection().find(
+        cursor = usuarios_collection(LECTURA_REPORTES).find(
             filtros,
             {"password_hash": 0, "_id": 0}
-        ).sort("nombre_usuario", 1).limit(limit)
+        ).sort(orden).limit(limit)
         
         usuarios = await cursor.to_list(length=limit)
         
         return usuarios
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error buscando usuarios: {e}")
         raise HTTPException(
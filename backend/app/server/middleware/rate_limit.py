@@ -1,81 +1,221 @@
 # backend/app/server/middleware/rate_limit.py
 from fastapi import Request, HTTPException, status
 from server.config.settings import settings
+import os
 import time
 import logging
 from typing import Dict, Tuple
-from collections import defaultdict, deque
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
-class RateLimiter:
-    """Rate limiter simple basado en memoria"""
+# Timeouts de conexión/lectura a Redis (un host caído no debe frenar los requests)
+RATE_LIMIT_REDIS_TIMEOUT_S = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT_S", 0.2))
+# Tras un fallo de Redis se usa solo memoria durante este intervalo antes de reintentar
+RATE_LIMIT_REDIS_REINTENTO_S = float(os.getenv("RATE_LIMIT_REDIS_REINTENTO_S", 30))
+
+# Script Lua de ventana deslizante por contador (atómico en Redis)
+# KEYS[1] = contador de la ventana actual, KEYS[2] = contador de la ventana previa
+# ARGV[1] = peso de la ventana previa, ARGV[2] = límite, ARGV[3] = TTL en ms
+SCRIPT_VENTANA_DESLIZANTE = """
+local actual = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previo = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previo * tonumber(ARGV[1]) + actual >= tonumber(ARGV[2]) then
+    return {0, actual, previo}
+end
+actual = redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return {1, actual, previo}
+"""
+
+def _ventana(current_time: float, window_seconds: int) -> Tuple[int, float]:
+    """Índice de la ventana fija actual y peso restante de la ventana previa"""
+    indice = int(current_time // window_seconds)
+    transcurrido = (current_time - indice * window_seconds) / window_seconds
+    return indice, 1.0 - transcurrido
+
+def _resultado(permitido: bool, actual: int, previo: int, peso: float,
+               max_requests: int, indice: int, window_seconds: int) -> Tuple[bool, int, int]:
+    """Construir (is_allowed, remaining_requests, reset_time) a partir de los contadores"""
+    estimado = previo * peso + actual
+    remaining = max(0, int(max_requests - estimado))
+    reset_time = (indice + 1) * window_seconds
+    return permitido, remaining if permitido else 0, reset_time
+
+class BackendMemoria:
+    """
+    Ventana deslizante por contador en memoria del proceso
+
+    Guarda dos contadores por identificador (ventana actual y previa), por lo
+    que la memoria es O(1) por cliente sin importar el volumen de requests.
+    El límite es por proceso; para varios workers usar BackendRedis.
+    """
     
-    def __init__(self, max_requests: int = 100, window_seconds: int = 60):
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self.requests: Dict[str, deque] = defaultdict(deque)
+    def __init__(self):
+        # identificador -> [indice_ventana, contador_actual, contador_previo]
+        self.contadores: Dict[str, list] = {}
         self.last_cleanup = time.time()
         self.cleanup_interval = 300  # Limpiar cada 5 minutos
     
-    def is_allowed(self, identifier: str) -> Tuple[bool, int, int]:
-        """
-        Verificar si el request está permitido
-        
-        Returns:
-            (is_allowed, remaining_requests, reset_time)
-        """
+    def registrar(self, identifier: str, max_requests: int, window_seconds: int) -> Tuple[bool, int, int]:
+        """Contar el request si está dentro del límite"""
         current_time = time.time()
+        indice, peso = _ventana(current_time, window_seconds)
         
-        # Limpiar registros antiguos periódicamente
         if current_time - self.last_cleanup > self.cleanup_interval:
-            self._cleanup_old_records(current_time)
+            self._cleanup_old_records(indice)
         
-        # Obtener cola de requests para este identificador
-        request_times = self.requests[identifier]
+        estado = self.contadores.get(identifier)
+        if estado is None:
+            estado = self.contadores[identifier] = [indice, 0, 0]
+        elif estado[0] != indice:
+            # Rotar ventana: la actual pasa a previa (o se descarta si quedó atrás)
+            estado[2] = estado[1] if estado[0] == indice - 1 else 0
+            estado[1] = 0
+            estado[0] = indice
         
-        # Remover requests fuera de la ventana de tiempo
-        cutoff_time = current_time - self.window_seconds
-        while request_times and request_times[0] < cutoff_time:
-            request_times.popleft()
+        _, actual, previo = estado
+        permitido = previo * peso + actual < max_requests
+        if permitido:
+            estado[1] += 1
         
-        # Verificar límite
-        if len(request_times) >= self.max_requests:
-            # Calcular tiempo hasta el reset
-            reset_time = int(request_times[0] + self.window_seconds)
-            return False, 0, reset_time
+        return _resultado(permitido, estado[1], previo, peso, max_requests, indice, window_seconds)
+    
+    async def registrar_async(self, identifier: str, max_requests: int, window_seconds: int) -> Tuple[bool, int, int]:
+        return self.registrar(identifier, max_requests, window_seconds)
+    
+    def _cleanup_old_records(self, indice_actual: int):
+        """Eliminar identificadores sin actividad en las dos últimas ventanas"""
+        identifiers_to_remove = [
+            identifier for identifier, estado in self.contadores.items()
+            if estado[0] < indice_actual - 1
+        ]
         
-        # Agregar request actual
-        request_times.append(current_time)
+        for identifier in identifiers_to_remove:
+            del self.contadores[identifier]
         
-        # Calcular requests restantes
-        remaining = self.max_requests - len(request_times)
-        reset_time = int(current_time + self.window_seconds)
+        self.last_cleanup = time.time()
         
-        return True, remaining, reset_time
+        if identifiers_to_remove:
+            logger.debug(f"Rate limiter: Limpiados {len(identifiers_to_remove)} identificadores")
+
+class BackendRedis:
+    """
+    Ventana deslizante por contador compartida en Redis
+
+    Un script Lua evalúa y cuenta atómicamente, de modo que el límite se
+    cumple entre todos los workers y nodos. Si Redis no está disponible se
+    usa el backend en memoria como respaldo (límite por proceso) y no se
+    vuelve a intentar Redis hasta pasado RATE_LIMIT_REDIS_REINTENTO_S.
+    """
+    
+    def __init__(
+        self,
+        redis_url: str,
+        prefijo: str = "rate_limit",
+        timeout_s: float = RATE_LIMIT_REDIS_TIMEOUT_S,
+        reintento_s: float = RATE_LIMIT_REDIS_REINTENTO_S
+    ):
+        self.redis_url = redis_url
+        self.prefijo = prefijo
+        self.timeout_s = timeout_s
+        self.reintento_s = reintento_s
+        self.respaldo = BackendMemoria()
+        self._cliente = None
+        self._script = None
+        self._disponible = True
+        # Instante (monotónico) a partir del cual se vuelve a intentar Redis
+        self._reintentar_desde = 0.0
+    
+    def _obtener_script(self):
+        if self._script is None:
+            import redis.asyncio as redis_asyncio
+            self._cliente = redis_asyncio.from_url(
+                self.redis_url,
+                socket_connect_timeout=self.timeout_s,
+                socket_timeout=self.timeout_s
+            )
+            self._script = self._cliente.register_script(SCRIPT_VENTANA_DESLIZANTE)
+        return self._script
     
-    def _cleanup_old_records(self, current_time: float):
-        """Limpiar registros antiguos para liberar memoria"""
-        cutoff_time = current_time - (self.window_seconds * 2)  # Buffer adicional
+    def registrar(self, identifier: str, max_requests: int, window_seconds: int) -> Tuple[bool, int, int]:
+        """Uso síncrono: solo disponible contra el respaldo en memoria"""
+        return self.respaldo.registrar(identifier, max_requests, window_seconds)
+    
+    async def registrar_async(self, identifier: str, max_requests: int, window_seconds: int) -> Tuple[bool, int, int]:
+        # En backoff tras un fallo: directo a memoria, sin esperar a Redis
+        if time.monotonic() < self._reintentar_desde:
+            return self.respaldo.registrar(identifier, max_requests, window_seconds)
         
-        identifiers_to_remove = []
-        for identifier, request_times in self.requests.items():
-            # Remover requests antiguos
-            while request_times and request_times[0] < cutoff_time:
-                request_times.popleft()
-            
-            # Si no quedan requests, marcar para eliminación
-            if not request_times:
-                identifiers_to_remove.append(identifier)
+        indice, peso = _ventana(time.time(), window_seconds)
+        # Hash tag {...} para que ambas claves caigan en el mismo slot en Redis Cluster
+        base = f"{self.prefijo}:{{{window_seconds}:{identifier}}}"
         
-        # Eliminar identificadores vacíos
-        for identifier in identifiers_to_remove:
-            del self.requests[identifier]
+        try:
+            permitido, actual, previo = await self._obtener_script()(
+                keys=[f"{base}:{indice}", f"{base}:{indice - 1}"],
+                args=[peso, max_requests, window_seconds * 2 * 1000]
+            )
+        except Exception as e:
+            self._reintentar_desde = time.monotonic() + self.reintento_s
+            if self._disponible:
+                logger.error(
+                    f"Rate limiter: Redis no disponible, usando memoria local "
+                    f"(reintento en {self.reintento_s:.0f}s): {e}"
+                )
+                self._disponible = False
+            return self.respaldo.registrar(identifier, max_requests, window_seconds)
         
-        self.last_cleanup = current_time
+        if not self._disponible:
+            logger.info("Rate limiter: conexión a Redis restablecida")
+            self._disponible = True
         
-        if identifiers_to_remove:
-            logger.debug(f"Rate limiter: Limpiados {len(identifiers_to_remove)} identificadores")
+        return _resultado(bool(permitido), int(actual), int(previo), peso, max_requests, indice, window_seconds)
+
+def crear_backend():
+    """Crear backend según settings.rate_limit_backend"""
+    if settings.rate_limit_backend == "redis":
+        try:
+            import redis.asyncio  # noqa: F401
+            return BackendRedis(settings.redis_url)
+        except ImportError:
+            logger.warning("Rate limiter: paquete redis no instalado, usando memoria local")
+    
+    return BackendMemoria()
+
+# Backend compartido por todos los limiters del proceso
+rate_limit_backend = crear_backend()
+
+class RateLimiter:
+    """Rate limiter por ventana deslizante (contador) sobre un backend intercambiable"""
+    
+    def __init__(self, max_requests: int = 100, window_seconds: int = 60, nombre: str = "global", backend=None):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.nombre = nombre
+        self.backend = backend or rate_limit_backend
+    
+    def is_allowed(self, identifier: str) -> Tuple[bool, int, int]:
+        """
+        Verificar si el request está permitido (síncrono, contador local)
+        
+        Returns:
+            (is_allowed, remaining_requests, reset_time)
+        """
+        return self.backend.registrar(f"{self.nombre}:{identifier}", self.max_requests, self.window_seconds)
+    
+    async def is_allowed_async(self, identifier: str) -> Tuple[bool, int, int]:
+        """
+        Verificar si el request está permitido usando el backend configurado
+        
+        Returns:
+            (is_allowed, remaining_requests, reset_time)
+        """
+        return await self.backend.registrar_async(
+            f"{self.nombre}:{identifier}",
+            self.max_requests,
+            self.window_seconds
+        )
 
 class RateLimitMiddleware:
     """Middleware de rate limiting"""
@@ -89,7 +229,8 @@ class RateLimitMiddleware:
         # Rate limiters específicos por endpoint
         self.auth_limiter = RateLimiter(
             max_requests=10,  # 10 intentos de login por minuto
-            window_seconds=60
+            window_seconds=60,
+            nombre="auth"
         )
         
         # Paths excluidos del rate limiting
@@ -121,7 +262,7 @@ class RateLimitMiddleware:
         limiter = self._get_limiter_for_path(request.url.path)
         
         # Verificar límite
-        is_allowed, remaining, reset_time = limiter.is_allowed(client_id)
+        is_allowed, remaining, reset_time = await limiter.is_allowed_async(client_id)
         
         if not is_allowed:
             # Log del rate limit excedido
@@ -135,7 +276,7 @@ class RateLimitMiddleware:
                 "X-RateLimit-Limit": str(limiter.max_requests),
                 "X-RateLimit-Remaining": "0",
                 "X-RateLimit-Reset": str(reset_time),
-                "Retry-After": str(reset_time - int(time.time()))
+                "Retry-After": str(max(1, reset_time - int(time.time())))
             }
             
             raise HTTPException(
@@ -190,8 +331,8 @@ class RateLimitMiddleware:
 class AdaptiveRateLimiter(RateLimiter):
     """Rate limiter adaptativo que ajusta límites según carga"""
     
-    def __init__(self, base_max_requests: int = 100, window_seconds: int = 60):
-        super().__init__(base_max_requests, window_seconds)
+    def __init__(self, base_max_requests: int = 100, window_seconds: int = 60, nombre: str = "adaptativo"):
+        super().__init__(base_max_requests, window_seconds, nombre)
         self.base_max_requests = base_max_requests
         self.current_load = 0.0
         self.load_history = deque(maxlen=10)  # Últimas 10 mediciones
@@ -50,8 +50,12 @@ from .stock import (
    StockResponse,
    StockAlert,
    StockAdjust,
+   StockAdjustBulk,
    StockValuation,
-   StockMovement
+   StockMovement,
+   StockSnapshot,
+   StockSaldoHistorico,
+   StockValuationHistorica
 )
 
 # Tipos de datos comunes
@@ -313,8 +317,12 @@ __all__ = [
    "StockResponse",
    "StockAlert",
    "StockAdjust",
+   "StockAdjustBulk",
    "StockValuation",
    "StockMovement",
+   "StockSnapshot",
+   "StockSaldoHistorico",
+   "StockValuationHistorica",
    
    # Constantes
    "TIPOS_USUARIO",
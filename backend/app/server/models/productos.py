@@ -91,5 +91,6 @@ class ProductoSearch(BaseModel):
     tipo: Optional[str] = None
     categoria: Optional[str] = None
     proveedor: Optional[str] = None
+    texto: Optional[str] = None  # Texto libre (índice de texto)
     estado: Optional[int] = Field(None, ge=0, le=1)
     stock_bajo: Optional[bool] = False
\ No newline at end of file
@@ -68,9 +68,20 @@ def error_response(error: str, message: str, code: int = 400, details: Dict = No
        "timestamp": datetime.now().isoformat()
    }
 
-def paginated_response(data: List[Any], total: int, page: int, limit: int, message: str = "Datos obtenidos exitosamente") -> Dict[str, Any]:
-   """Crear respuesta paginada"""
-   pages = (total + limit - 1) // limit if total > 0 else 0
+def paginated_response(
+   data: List[Any],
+   total: Optional[int],
+   page: Optional[int],
+   limit: int,
+   message: str = "Datos obtenidos exitosamente",
+   pages: Optional[int] = None,
+   has_next: Optional[bool] = None,
+   has_prev: Optional[bool] = None,
+   next_cursor: Optional[str] = None
+) -> Dict[str, Any]:
+   """Crear respuesta paginada (acepta directamente el resultado de paginar_consulta/paginar_por_cursor)"""
+   if pages is None and total is not None:
+       pages = (total + limit - 1) // limit if total > 0 else 0
    
    return {
        "success": True,
@@ -81,8 +92,9 @@ def paginated_response(data: List[Any], total: int, page: int, limit: int, messa
            "page": page,
            "limit": limit,
            "pages": pages,
-           "has_next": page < pages,
-           "has_prev": page > 1
+           "has_next": page < pages if has_next is None else has_next,
+           "has_prev": page > 1 if has_prev is None else has_prev,
+           "next_cursor": next_cursor
        },
        "code": 200,
        "timestamp": datetime.now().isoformat()
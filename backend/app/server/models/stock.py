@@ -1,6 +1,6 @@
 # backend/app/server/models/stock.py
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Optional, List
 from decimal import Decimal
 from datetime import date, datetime
 from .base import BaseSchema
@@ -22,6 +22,10 @@ class StockResponse(BaseSchema):
     fecha_ultimo_movimiento: Optional[datetime] = None
     estado_stock: int
     alerta_generada: bool = False
+    nivel_stock: Optional[str] = None  # "normal", "bajo", "critico"
+    stock_minimo: Optional[int] = None
+    stock_critico: Optional[int] = None
+    magnitud_producto: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -52,6 +56,18 @@ class StockAdjust(BaseModel):
             raise ValueError('La cantidad de ajuste no puede ser cero')
         return v
 
+class StockAdjustBulk(BaseModel):
+    """Schema para ajuste masivo de stock (inventario físico)"""
+    ajustes: List[StockAdjust] = Field(..., description="Ajustes a aplicar, en orden")
+    
+    @validator('ajustes')
+    def validate_ajustes(cls, v):
+        if not v:
+            raise ValueError('Debe incluir al menos un ajuste')
+        if len(v) > 10000:
+            raise ValueError('No se pueden aplicar más de 10000 ajustes por solicitud')
+        return v
+
 class StockValuation(BaseModel):
     """Schema para valorización de stock"""
     total_productos: int
@@ -64,13 +80,48 @@ class StockValuation(BaseModel):
     fecha_calculo: datetime
 
 class StockMovement(BaseModel):
-    """Schema para movimiento de stock"""
+    """Schema para movimiento de stock (registro de kardex)"""
+    id_kardex: Optional[int] = None
+    producto_id: Optional[int] = None
     producto_codigo: str
     producto_nombre: str
-    tipo_movimiento: str
+    tipo_movimiento: str  # Ver OPERACIONES_KARDEX
     cantidad_anterior: int
     cantidad_movimiento: int
     cantidad_actual: int
+    costo_unitario: Optional[Decimal] = None
+    valor_movimiento: Optional[Decimal] = None
+    ubicacion_fisica: Optional[str] = None
+    lote_serie: Optional[str] = None
     motivo: str
     fecha_movimiento: datetime
-    realizado_por: str
\ No newline at end of file
+    realizado_por: str
+    realizado_por_id: Optional[int] = None
+
+class StockSnapshot(BaseModel):
+    """Schema para checkpoint de saldo del kardex"""
+    producto_id: int
+    fecha_corte: datetime
+    id_kardex: int
+    cantidad: int
+    costo_unitario: Optional[Decimal] = None
+    valor: Optional[Decimal] = None
+    tipo: str  # "inicial", "movimientos", "periodico"
+
+class StockSaldoHistorico(BaseModel):
+    """Schema para saldo de un producto a una fecha"""
+    producto_id: int
+    fecha: datetime
+    cantidad: int
+    costo_unitario: Decimal
+    valor: Decimal
+    snapshot_fecha_corte: Optional[datetime] = None
+    movimientos_aplicados: int
+    ultimo_movimiento: Optional[StockMovement] = None
+
+class StockValuationHistorica(BaseModel):
+    """Schema para valorización del inventario a una fecha"""
+    fecha: datetime
+    total_productos: int
+    cantidad_total: int
+    valor_total_inventario: Decimal
\ No newline at end of file
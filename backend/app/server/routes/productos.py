@@ -1,5 +1,6 @@
 # backend/app/server/routes/productos.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile
+from fastapi.responses import StreamingResponse
 from server.functions.productos import (
     crear_producto,
     obtener_producto_por_id,
@@ -10,6 +11,8 @@ from server.functions.productos import (
     verificar_codigo_producto_unico,
     obtener_productos_autocomplete
 )
+from server.functions.exportacion import exportar_productos
+from server.functions.importacion import iniciar_importacion_productos, obtener_importacion
 from server.models.productos import ProductoCreate, ProductoUpdate, ProductoSearch
 from server.models.responses import success_response, error_response, paginated_response
 from server.routes.auth import get_current_user
@@ -87,6 +90,7 @@ async def list_productos(
     limit: int = Query(20, ge=1, le=100, description="Elementos por página"),
     estado: Optional[int] = Query(None, ge=0, le=1, description="Estado del producto"),
     tipo: Optional[str] = Query(None, description="Tipo de producto"),
+    cursor: Optional[str] = Query(None, description="Cursor de paginación (next_cursor de la respuesta anterior)"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -96,6 +100,7 @@ async def list_productos(
     - **limit**: Elementos por página (default: 20, max: 100)
     - **estado**: Filtrar por estado (0=inactivo, 1=activo)
     - **tipo**: Filtrar por tipo de producto
+    - **cursor**: Continuar desde next_cursor (ignora page, costo constante en páginas profundas)
     
     Requiere permisos de lectura de productos
     """
@@ -104,13 +109,10 @@ async def list_productos(
         user_type = current_user["user"]["tipo_usuario"]
         check_product_permission(user_type, "read")
         
-        result = await obtener_productos(page, limit, estado, tipo)
+        result = await obtener_productos(page, limit, estado, tipo, cursor)
         
         return paginated_response(
-            data=result["data"],
-            total=result["total"],
-            page=result["page"],
-            limit=result["limit"],
+            **result,
             message="Productos obtenidos exitosamente"
         )
         
@@ -175,6 +177,7 @@ async def search_productos(
     tipo: Optional[str] = Query(None, description="Tipo de producto"),
     categoria: Optional[str] = Query(None, description="Categoría"),
     proveedor: Optional[str] = Query(None, description="Proveedor"),
+    q: Optional[str] = Query(None, description="Texto libre (nombre, categoría, descripción)"),
     estado: Optional[int] = Query(None, ge=0, le=1, description="Estado"),
     stock_bajo: Optional[bool] = Query(False, description="Solo productos con stock bajo"),
     limit: int = Query(20, ge=1, le=100, description="Límite de resultados"),
@@ -183,11 +186,12 @@ async def search_productos(
     """
     Buscar productos con filtros avanzados
     
-    - **codigo**: Filtrar por código
-    - **nombre**: Filtrar por nombre
+    - **codigo**: Código exacto o prefijo de código
+    - **nombre**: Palabras (o inicio de palabras) del nombre
     - **tipo**: Filtrar por tipo
     - **categoria**: Filtrar por categoría
     - **proveedor**: Filtrar por proveedor
+    - **q**: Texto libre, ordenado por relevancia
     - **estado**: Filtrar por estado
     - **stock_bajo**: Solo productos con stock bajo
     - **limit**: Límite de resultados
@@ -205,6 +209,7 @@ async def search_productos(
             tipo=tipo,
             categoria=categoria,
             proveedor=proveedor,
+            texto=q,
             estado=estado,
             stock_bajo=stock_bajo
         )
@@ -230,6 +235,138 @@ async def search_productos(
             code=500
         )
 
+@router.get("/export", summary="Exportar productos (CSV/XLSX)")
+async def export_productos(
+    formato: str = Query("csv", description="Formato: csv o xlsx"),
+    gzip: bool = Query(False, description="Comprimir con gzip (solo CSV)"),
+    estado: Optional[int] = Query(None, ge=0, le=1, description="Estado del producto"),
+    tipo: Optional[str] = Query(None, description="Tipo de producto"),
+    current_user = Depends(get_current_user)
+):
+    """
+    Exportar el catálogo de productos en streaming
+    
+    - **formato**: csv (default) o xlsx
+    - **gzip**: Entregar el CSV comprimido (.csv.gz)
+    - **estado** / **tipo**: Mismos filtros que el listado
+    
+    Requiere permisos de lectura de productos
+    """
+    try:
+        # Verificar permisos
+        user_type = current_user["user"]["tipo_usuario"]
+        check_product_permission(user_type, "read")
+        
+        bloques, media_type, nombre_archivo = exportar_productos(formato, gzip, estado, tipo)
+        
+        return StreamingResponse(
+            bloques,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{nombre_archivo}"'}
+        )
+        
+    except HTTPException as e:
+        return error_response(
+            error="PRODUCT_EXPORT_FAILED",
+            message=e.detail,
+            code=e.status_code
+        )
+    except Exception as e:
+        logger.error(f"Error exportando productos: {e}")
+        return error_response(
+            error="INTERNAL_ERROR",
+            message="Error interno del servidor",
+            code=500
+        )
+
+@router.post("/import", summary="Importar productos desde CSV/XLSX")
+async def import_productos(
+    file: UploadFile = File(...),
+    current_user = Depends(get_current_user)
+):
+    """
+    Importación masiva de productos
+    
+    - **file**: Archivo CSV (UTF-8) o XLSX con una fila de encabezado. Se
+      aceptan los nombres de campo de ProductoCreate o los encabezados de
+      la exportación.
+    
+    El archivo se procesa en segundo plano por lotes; el progreso se
+    consulta en GET /import/{id_importacion}.
+    
+    Requiere permisos de creación de productos
+    """
+    try:
+        # Verificar permisos
+        user_type = current_user["user"]["tipo_usuario"]
+        check_product_permission(user_type, "create")
+        
+        result = await iniciar_importacion_productos(
+            file,
+            created_by=current_user["user"]["id_usuario"],
+            created_by_name=current_user["user"]["nombre_usuario"]
+        )
+        
+        return success_response(
+            data=result,
+            message="Importación registrada, procesando en segundo plano",
+            code=202
+        )
+        
+    except HTTPException as e:
+        return error_response(
+            error="PRODUCT_IMPORT_FAILED",
+            message=e.detail,
+            code=e.status_code
+        )
+    except Exception as e:
+        logger.error(f"Error importando productos: {e}")
+        return error_response(
+            error="INTERNAL_ERROR",
+            message="Error interno del servidor",
+            code=500
+        )
+
+@router.get("/import/{id_importacion}", summary="Consultar progreso de importación")
+async def get_importacion(
+    id_importacion: int,
+    current_user = Depends(get_current_user)
+):
+    """
+    Obtener estado y contadores de una importación masiva
+    
+    - **estado**: pendiente, procesando, completada o fallida
+    - **filas_procesadas**, **creados**, **duplicados**, **invalidos**
+    - **errores**: Detalle de las primeras filas rechazadas
+    
+    Requiere permisos de lectura de productos
+    """
+    try:
+        # Verificar permisos
+        user_type = current_user["user"]["tipo_usuario"]
+        check_product_permission(user_type, "read")
+        
+        result = await obtener_importacion(id_importacion)
+        
+        return success_response(
+            data=result,
+            message="Importación obtenida exitosamente"
+        )
+        
+    except HTTPException as e:
+        return error_response(
+            error="IMPORT_NOT_FOUND",
+            message=e.detail,
+            code=e.status_code
+        )
+    except Exception as e:
+        logger.error(f"Error obteniendo importación: {e}")
+        return error_response(
+            error="INTERNAL_ERROR",
+            message="Error interno del servidor",
+            code=500
+        )
+
 @router.get("/{product_id}", summary="Obtener producto por ID")
 async def get_producto(
     product_id: int,
@@ -1,18 +1,24 @@
 # backend/app/server/routes/stock.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from server.functions.stock import (
     obtener_stock,
     obtener_stock_por_producto,
     ajustar_stock,
+    ajustar_stock_masivo,
     obtener_alertas_stock,
     calcular_valoracion_inventario,
+    obtener_resumen_stock,
     obtener_movimientos_stock
 )
-from server.models.stock import StockAdjust
+from server.functions.exportacion import exportar_stock
+from server.functions.kardex import obtener_saldo_historico, calcular_valoracion_historica
+from server.models.stock import StockAdjust, StockAdjustBulk
 from server.models.responses import success_response, error_response, paginated_response
 from server.routes.auth import get_current_user
 from server.config.security import check_permission
 from typing import Optional
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,6 +38,7 @@ async def get_stock(
     limit: int = Query(20, ge=1, le=100, description="Elementos por página"),
     stock_bajo: bool = Query(False, description="Solo productos con stock bajo"),
     stock_critico: bool = Query(False, description="Solo productos con stock crítico"),
+    cursor: Optional[str] = Query(None, description="Cursor de paginación (next_cursor de la respuesta anterior)"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -41,6 +48,7 @@ async def get_stock(
     - **limit**: Elementos por página (default: 20, max: 100)
     - **stock_bajo**: Filtrar solo productos con stock bajo
     - **stock_critico**: Filtrar solo productos con stock crítico
+    - **cursor**: Continuar desde next_cursor (ignora page, costo constante en páginas profundas)
     
     Requiere permisos de lectura de stock
     """
@@ -49,13 +57,10 @@ async def get_stock(
         user_type = current_user["user"]["tipo_usuario"]
         check_stock_permission(user_type, "read")
         
-        result = await obtener_stock(page, limit, stock_bajo, stock_critico)
+        result = await obtener_stock(page, limit, stock_bajo, stock_critico, cursor)
         
         return paginated_response(
-            data=result["data"],
-            total=result["total"],
-            page=result["page"],
-            limit=result["limit"],
+            **result,
             message="Stock obtenido exitosamente"
         )
         
@@ -73,6 +78,53 @@ async def get_stock(
             code=500
         )
 
+@router.get("/export", summary="Exportar stock (CSV/XLSX)")
+async def export_stock(
+    formato: str = Query("csv", description="Formato: csv o xlsx"),
+    gzip: bool = Query(False, description="Comprimir con gzip (solo CSV)"),
+    stock_bajo: bool = Query(False, description="Solo productos con stock bajo"),
+    stock_critico: bool = Query(False, description="Solo productos con stock crítico"),
+    current_user = Depends(get_current_user)
+):
+    """
+    Exportar la vista de stock completa en streaming
+    
+    - **formato**: csv (default) o xlsx
+    - **gzip**: Entregar el CSV comprimido (.csv.gz)
+    - **stock_bajo** / **stock_critico**: Mismos filtros que el listado
+    
+    Las filas se leen del cursor por lotes y se envían a medida que se
+    generan (memoria constante sin importar el tamaño del inventario).
+    
+    Requiere permisos de lectura de stock
+    """
+    try:
+        # Verificar permisos
+        user_type = current_user["user"]["tipo_usuario"]
+        check_stock_permission(user_type, "read")
+        
+        bloques, media_type, nombre_archivo = exportar_stock(formato, gzip, stock_bajo, stock_critico)
+        
+        return StreamingResponse(
+            bloques,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{nombre_archivo}"'}
+        )
+        
+    except HTTPException as e:
+        return error_response(
+            error="STOCK_EXPORT_FAILED",
+            message=e.detail,
+            code=e.status_code
+        )
+    except Exception as e:
+        logger.error(f"Error exportando stock: {e}")
+        return error_response(
+            error="INTERNAL_ERROR",
+            message="Error interno del servidor",
+            code=500
+        )
+
 @router.get("/producto/{product_id}", summary="Consultar stock de producto específico")
 async def get_stock_producto(
     product_id: int,
@@ -157,6 +209,52 @@ async def adjust_stock(
             code=500
         )
 
+@router.post("/ajustar/bulk", summary="Realizar ajustes masivos de stock")
+async def adjust_stock_bulk(
+    bulk_data: StockAdjustBulk,
+    current_user = Depends(get_current_user)
+):
+    """
+    Realizar ajustes masivos de stock (ej. inventario físico)
+    
+    - **ajustes**: Lista de ajustes (máx 10000), cada uno con producto_id,
+      cantidad_ajuste, motivo, ubicacion y lote_serie
+    
+    Los ajustes se aplican en orden en una sola operación. Retorna el
+    resultado por ítem (aplicado o rechazado con su motivo).
+    
+    Requiere permisos de actualización de stock
+    """
+    try:
+        # Verificar permisos
+        user_type = current_user["user"]["tipo_usuario"]
+        check_stock_permission(user_type, "update")
+        
+        result = await ajustar_stock_masivo(
+            bulk_data.ajustes,
+            adjusted_by=current_user["user"]["id_usuario"],
+            adjusted_by_name=current_user["user"]["nombre_usuario"]
+        )
+        
+        return success_response(
+            data=result,
+            message=f"Ajuste masivo realizado: {result['aplicados']} de {result['total']} aplicados"
+        )
+        
+    except HTTPException as e:
+        return error_response(
+            error="STOCK_BULK_ADJUSTMENT_FAILED",
+            message=e.detail,
+            code=e.status_code
+        )
+    except Exception as e:
+        logger.error(f"Error en ajuste masivo de stock: {e}")
+        return error_response(
+            error="INTERNAL_ERROR",
+            message="Error interno del servidor",
+            code=500
+        )
+
 @router.get("/alertas", summary="Obtener alertas de stock")
 async def get_alertas_stock(
     current_user = Depends(get_current_user)
@@ -256,30 +354,34 @@ async def get_valoracion_inventario(
 @router.get("/movimientos", summary="Obtener movimientos de stock")
 async def get_movimientos_stock(
     producto_id: Optional[int] = Query(None, description="ID del producto específico"),
+    fecha_desde: Optional[datetime] = Query(None, description="Fecha inicial (ISO 8601)"),
+    fecha_hasta: Optional[datetime] = Query(None, description="Fecha final (ISO 8601)"),
     limit: int = Query(50, ge=1, le=200, description="Límite de registros"),
+    cursor: Optional[str] = Query(None, description="Cursor de paginación (next_cursor de la respuesta anterior)"),
     current_user = Depends(get_current_user)
 ):
     """
-    Obtener histórico de movimientos de stock
+    Obtener movimientos de stock registrados en el kardex
     
     - **producto_id**: Filtrar por producto específico (opcional)
+    - **fecha_desde** / **fecha_hasta**: Rango de fechas del movimiento (opcional)
     - **limit**: Límite de registros (default: 50, max: 200)
+    - **cursor**: Continuar desde next_cursor
     
-    Requiere permisos de lectura de stock
+    Los movimientos se retornan del más reciente al más antiguo.
     
-    Nota: En Fase 1 retorna lista vacía. Se implementará en Fase 2 con kardex.
+    Requiere permisos de lectura de stock
     """
     try:
         # Verificar permisos
         user_type = current_user["user"]["tipo_usuario"]
         check_stock_permission(user_type, "read")
         
-        # TODO: Implementar cuando se tenga kardex en Fase 2
-        movimientos = await obtener_movimientos_stock(producto_id, limit)
+        result = await obtener_movimientos_stock(producto_id, limit, fecha_desde, fecha_hasta, cursor)
         
-        return success_response(
-            data=movimientos,
-            message="Movimientos obtenidos exitosamente (funcionalidad completa en Fase 2)"
+        return paginated_response(
+            **result,
+            message="Movimientos obtenidos exitosamente"
         )
         
     except HTTPException as e:
@@ -296,6 +398,84 @@ async def get_movimientos_stock(
             code=500
         )
 
+@router.get("/historico/{producto_id}", summary="Obtener stock de un producto a una fecha")
+async def get_stock_historico(
+    producto_id: int,
+    fecha: datetime = Query(..., description="Fecha de consulta (ISO 8601)"),
+    current_user = Depends(get_current_user)
+):
+    """
+    Obtener saldo y valor de un producto a una fecha pasada
+    
+    Se calcula desde el snapshot de kardex más cercano más los movimientos
+    posteriores hasta la fecha indicada.
+    
+    Requiere permisos de lectura de stock
+    """
+    try:
+        # Verificar permisos
+        user_type = current_user["user"]["tipo_usuario"]
+        check_stock_permission(user_type, "read")
+        
+        saldo = await obtener_saldo_historico(producto_id, fecha)
+        
+        return success_response(
+            data=saldo.dict(),
+            message="Stock histórico obtenido exitosamente"
+        )
+        
+    except HTTPException as e:
+        return error_response(
+            error="STOCK_HISTORY_QUERY_FAILED",
+            message=e.detail,
+            code=e.status_code
+        )
+    except Exception as e:
+        logger.error(f"Error obteniendo stock histórico: {e}")
+        return error_response(
+            error="INTERNAL_ERROR",
+            message="Error interno del servidor",
+            code=500
+        )
+
+@router.get("/valoracion/historica", summary="Obtener valorización del inventario a una fecha")
+async def get_valoracion_historica(
+    fecha: datetime = Query(..., description="Fecha de consulta (ISO 8601)"),
+    current_user = Depends(get_current_user)
+):
+    """
+    Obtener valorización del inventario a una fecha pasada
+    
+    Basada en los snapshots de kardex más los movimientos posteriores.
+    
+    Requiere permisos de lectura de stock
+    """
+    try:
+        # Verificar permisos
+        user_type = current_user["user"]["tipo_usuario"]
+        check_stock_permission(user_type, "read")
+        
+        valoracion = await calcular_valoracion_historica(fecha)
+        
+        return success_response(
+            data=valoracion.dict(),
+            message="Valorización histórica calculada exitosamente"
+        )
+        
+    except HTTPException as e:
+        return error_response(
+            error="VALUATION_FAILED",
+            message=e.detail,
+            code=e.status_code
+        )
+    except Exception as e:
+        logger.error(f"Error calculando valorización histórica: {e}")
+        return error_response(
+            error="INTERNAL_ERROR",
+            message="Error interno del servidor",
+            code=500
+        )
+
 @router.get("/resumen", summary="Obtener resumen del stock")
 async def get_resumen_stock(
     current_user = Depends(get_current_user)
@@ -315,37 +495,8 @@ async def get_resumen_stock(
         user_type = current_user["user"]["tipo_usuario"]
         check_stock_permission(user_type, "read")
         
-        # Obtener valorización
-        valoracion = await calcular_valoracion_inventario()
-        
-        # Obtener alertas
-        alertas = await obtener_alertas_stock()
-        
-        # Construir resumen
-        resumen = {
-            "valoracion": valoracion.dict(),
-            "alertas": {
-                "total": len(alertas),
-                "criticas": len([a for a in alertas if a.urgencia == "critica"]),
-                "altas": len([a for a in alertas if a.urgencia == "alta"]),
-                "medias": len([a for a in alertas if a.urgencia == "media"])
-            },
-            "indicadores": {
-                "productos_activos": valoracion.total_productos,
-                "valor_promedio_producto": (
-                    valoracion.valor_total_inventario / valoracion.total_productos
-                    if valoracion.total_productos > 0 else 0
-                ),
-                "porcentaje_stock_bajo": (
-                    (valoracion.productos_stock_bajo / valoracion.total_productos * 100)
-                    if valoracion.total_productos > 0 else 0
-                ),
-                "porcentaje_stock_critico": (
-                    (valoracion.productos_stock_critico / valoracion.total_productos * 100)
-                    if valoracion.total_productos > 0 else 0
-                )
-            }
-        }
+        # Valorización y alertas en paralelo, compartidas entre solicitudes concurrentes
+        resumen = await obtener_resumen_stock()
         
         return success_response(
             data=resumen,
@@ -79,6 +79,7 @@ async def list_usuarios(
     page: int = Query(1, ge=1, description="Número de página"),
     limit: int = Query(20, ge=1, le=100, description="Elementos por página"),
     estado: Optional[int] = Query(None, ge=0, le=1, description="Estado del usuario"),
+    cursor: Optional[str] = Query(None, description="Cursor de paginación (next_cursor de la respuesta anterior)"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -87,6 +88,7 @@ async def list_usuarios(
     - **page**: Número de página (default: 1)
     - **limit**: Elementos por página (default: 20, max: 100)
     - **estado**: Filtrar por estado (0=inactivo, 1=activo)
+    - **cursor**: Continuar desde next_cursor (ignora page, costo constante en páginas profundas)
     
     Requiere permisos de lectura de usuarios
     """
@@ -95,13 +97,10 @@ async def list_usuarios(
         user_type = current_user["user"]["tipo_usuario"]
         check_user_permission(user_type, "read")
         
-        result = await obtener_usuarios(page, limit, estado)
+        result = await obtener_usuarios(page, limit, estado, cursor)
         
         return paginated_response(
-            data=result["data"],
-            total=result["total"],
-            page=result["page"],
-            limit=result["limit"],
+            **result,
             message="Usuarios obtenidos exitosamente"
         )
         
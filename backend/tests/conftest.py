@@ -0,0 +1,11 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# Variables mínimas para importar la configuración sin .env ni servidor
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET", "clave_de_pruebas_jwt_de_al_menos_32_caracteres")
+os.environ.setdefault("SECRET_KEY", "clave_de_pruebas_secret_de_al_menos_32_caracteres")
+
+# Los módulos se importan como en la aplicación (desde backend/app)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
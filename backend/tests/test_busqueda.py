@@ -0,0 +1,38 @@
+# backend/tests/test_busqueda.py
+from server.functions.busqueda import (
+    generar_tokens_busqueda,
+    normalizar_texto,
+    planificar_busqueda,
+    tokens_consulta
+)
+
+
+def test_tokens_de_codigo_y_nombre_con_tildes():
+    tokens = generar_tokens_busqueda({"codigo_producto": "PRD-001", "nombre_producto": "Ñandú"})
+
+    assert tokens == sorted([
+        "pr", "prd", "00", "001", "prd0", "prd00", "prd001",
+        "na", "nan", "nand", "nandu"
+    ])
+
+
+def test_tokens_con_prefijo_por_campo():
+    tokens = generar_tokens_busqueda({"categoria_producto": "Eléctricos", "proveedor_producto": "Acme"})
+
+    assert "cat:el" in tokens
+    assert "cat:electricos" in tokens
+    assert "prov:acme" in tokens
+    assert "acme" not in tokens
+
+
+def test_normalizar_pliega_tildes_y_simbolos():
+    assert normalizar_texto("  Pingüino ÁRBOL/ñu-2  ") == "pinguino arbol nu 2"
+
+
+def test_tokens_consulta_ignora_palabras_cortas():
+    assert tokens_consulta("Ñandú x cañería") == ["nandu", "caneria"]
+    assert tokens_consulta("a") == []
+
+
+def test_email_conserva_mayusculas():
+    assert planificar_busqueda("Juan.Perez@Empresa", permitir_email=True) == ("email", "Juan.Perez@Empresa")
@@ -0,0 +1,100 @@
+# backend/tests/test_indices.py
+import pytest
+from pymongo.errors import OperationFailure
+from server.config import indices
+
+
+class ColeccionFalsa:
+    """Colección con las reglas de índices de MongoDB que importan aquí"""
+
+    def __init__(self, existentes=None):
+        self.indices = {"_id_": {"_id": 1}, **(existentes or {})}
+        self.documentos = {}
+
+    def list_indexes(self):
+        async def iterar():
+            for nombre, clave in list(self.indices.items()):
+                yield {"name": nombre, "key": clave}
+        return iterar()
+
+    async def create_indexes(self, modelos):
+        nombres = []
+        for modelo in modelos:
+            clave = dict(modelo.document["key"])
+            es_texto = "text" in clave.values()
+            if es_texto and any("text" in c.values() for c in self.indices.values()):
+                # Solo se admite un índice de texto por colección
+                raise OperationFailure("IndexOptionsConflict", code=85)
+            self.indices[modelo.document["name"]] = clave
+            nombres.append(modelo.document["name"])
+        return nombres
+
+    async def drop_index(self, nombre):
+        if nombre not in self.indices:
+            raise OperationFailure("index not found", code=indices.CODIGO_INDICE_INEXISTENTE)
+        del self.indices[nombre]
+
+    async def find_one(self, filtro):
+        return self.documentos.get(filtro["_id"])
+
+    async def update_one(self, filtro, actualizacion, upsert=False):
+        self.documentos[filtro["_id"]] = {**actualizacion["$set"]}
+
+
+@pytest.fixture
+def colecciones(monkeypatch):
+    colecciones = {}
+    monkeypatch.setattr(
+        indices.database,
+        "get_collection",
+        lambda nombre, *args: colecciones.setdefault(nombre, ColeccionFalsa())
+    )
+    return colecciones
+
+
+@pytest.mark.asyncio
+async def test_migracion_reemplaza_indice_de_texto_anterior(colecciones):
+    # Base creada con el script original: índice de texto solo por nombre
+    colecciones["productos"] = ColeccionFalsa({
+        "codigo_producto_1": {"codigo_producto": 1},
+        "nombre_producto_text": {"_fts": "text", "_ftsx": 1}
+    })
+
+    resultado = await indices.sincronizar_indices()
+
+    productos = colecciones["productos"].indices
+    assert resultado["errores"] == {}
+    assert "nombre_producto_text" not in productos
+    assert "productos_texto" in productos
+    assert set(indices.nombres_registrados("productos")) <= set(productos)
+    assert resultado["eliminados"]["productos"] == ["nombre_producto_text"]
+    assert colecciones["esquema_versiones"].documentos["indices"]["version"] == indices.INDICES_VERSION
+
+
+@pytest.mark.asyncio
+async def test_conflicto_no_impide_crear_el_resto(colecciones):
+    # Versión ya aplicada: no se borran sobrantes, el texto anterior queda en conflicto
+    colecciones["esquema_versiones"] = ColeccionFalsa()
+    colecciones["esquema_versiones"].documentos["indices"] = {"version": indices.INDICES_VERSION}
+    colecciones["productos"] = ColeccionFalsa({"nombre_producto_text": {"_fts": "text", "_ftsx": 1}})
+
+    resultado = await indices.sincronizar_indices()
+
+    productos = colecciones["productos"].indices
+    assert "productos_texto" not in productos
+    assert "busqueda_tokens_1_nombre_producto_1" in productos
+    assert "estado_producto_1_nombre_producto_1" in productos
+    assert resultado["sobrantes"]["productos"] == ["nombre_producto_text"]
+    assert any(error.startswith("productos_texto") for error in resultado["errores"]["productos"])
+    assert resultado["estado"] == "con_errores"
+
+
+@pytest.mark.asyncio
+async def test_indice_borrado_se_recrea_con_version_aplicada(colecciones):
+    await indices.sincronizar_indices()
+    del colecciones["stock"].indices["producto_id_1"]
+
+    resultado = await indices.sincronizar_indices()
+
+    assert resultado["creados"] == {"stock": ["producto_id_1"]}
+    assert "producto_id_1" in colecciones["stock"].indices
@@ -0,0 +1,46 @@
+# backend/tests/test_paginacion.py
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from server.functions.paginacion import (
+    codificar_cursor,
+    condicion_keyset,
+    cursor_de_documento,
+    decodificar_cursor
+)
+
+
+def test_condicion_keyset_orden_descendente_compuesto():
+    fecha = datetime(2024, 5, 1, 12, 30)
+    orden = [("estado_producto", 1), ("created_at", -1), ("id_producto", -1)]
+
+    condicion = condicion_keyset(orden, [1, fecha, 40])
+
+    assert condicion == {"$or": [
+        {"estado_producto": {"$gt": 1}},
+        {"estado_producto": 1, "created_at": {"$lt": fecha}},
+        {"estado_producto": 1, "created_at": fecha, "id_producto": {"$lt": 40}}
+    ]}
+
+
+def test_cursor_ida_y_vuelta_con_fechas():
+    orden = [("created_at", -1), ("id_producto", -1)]
+    documento = {"created_at": datetime(2024, 5, 1, 12, 30, 15, 250000), "id_producto": 7, "nombre_producto": "Tornillo"}
+
+    cursor = cursor_de_documento(documento, orden)
+
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor, len(orden)) == [documento["created_at"], 7]
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!",
+    codificar_cursor([1, 2, 3]),
+    codificar_cursor({"id_producto": 1})
+])
+def test_cursor_invalido_responde_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decodificar_cursor(cursor, 2)
+
+    assert error.value.status_code == 400
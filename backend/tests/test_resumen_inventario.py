@@ -0,0 +1,91 @@
+# backend/tests/test_resumen_inventario.py
+from datetime import datetime
+
+from server.functions.resumen_inventario import delta_resumen, desvios_resumen, sumar_deltas
+
+
+def stock(cantidad, valor=None, **extra):
+    return {
+        "estado_stock": 1,
+        "cantidad_total": cantidad,
+        "valor_inventario": cantidad * 10 if valor is None else valor,
+        "stock_minimo": 10,
+        "stock_critico": 3,
+        **extra
+    }
+
+
+def test_normal_a_bajo():
+    assert delta_resumen(stock(20), stock(8)) == {
+        "valor_total_inventario": -120,
+        "productos_stock_bajo": 1
+    }
+
+
+def test_bajo_a_critico_y_sin_stock():
+    assert delta_resumen(stock(8), stock(2)) == {
+        "valor_total_inventario": -60,
+        "productos_stock_critico": 1
+    }
+    assert delta_resumen(stock(2), stock(0)) == {
+        "valor_total_inventario": -20,
+        "productos_sin_stock": 1
+    }
+
+
+def test_critico_a_normal():
+    assert delta_resumen(stock(2), stock(15)) == {
+        "valor_total_inventario": 130,
+        "productos_stock_bajo": -1,
+        "productos_stock_critico": -1
+    }
+
+
+def test_sin_stock_a_bajo():
+    assert delta_resumen(stock(0), stock(5)) == {
+        "valor_total_inventario": 50,
+        "productos_sin_stock": -1,
+        "productos_stock_critico": -1
+    }
+
+
+def test_alta_y_baja_logica():
+    nuevo = stock(0, fecha_vencimiento=datetime(2025, 3, 1))
+
+    assert delta_resumen(None, nuevo) == {
+        "total_productos": 1,
+        "productos_stock_bajo": 1,
+        "productos_stock_critico": 1,
+        "productos_sin_stock": 1,
+        "vencimientos.2025-03-01": 1
+    }
+    assert delta_resumen(nuevo, {**nuevo, "estado_stock": 0}) == {
+        "total_productos": -1,
+        "productos_stock_bajo": -1,
+        "productos_stock_critico": -1,
+        "productos_sin_stock": -1,
+        "vencimientos.2025-03-01": -1
+    }
+
+
+def test_sin_cambio_de_nivel_solo_valor():
+    acumulado = {}
+    sumar_deltas(acumulado, delta_resumen(stock(20), stock(30)))
+    sumar_deltas(acumulado, delta_resumen(stock(30), stock(25)))
+
+    assert acumulado == {"valor_total_inventario": 50}
+
+
+def test_desvios_tolera_redondeo_de_valores():
+    calculado = {
+        "total_productos": 2,
+        "valor_total_inventario": 0.1 + 0.2,
+        "productos_stock_bajo": 0,
+        "productos_stock_critico": 0,
+        "productos_sin_stock": 0,
+        "vencimientos": {}
+    }
+    actual = {**calculado, "valor_total_inventario": 0.3, "vencimientos": {"2025-03-01": 0}}
+
+    assert desvios_resumen(actual, calculado) == {}
+    assert desvios_resumen({**actual, "productos_stock_bajo": 1}, calculado) == {"productos_stock_bajo": (1, 0)}
@@ -35,5 +35,10 @@ db.createCollection('h_productos');  // Histórico productos
 db.createCollection('h_usuarios');   // Histórico usuarios
 db.createCollection('contador_general');
 db.createCollection('log_general');
+db.createCollection('kardex');         // Movimientos de stock (append-only)
+db.createCollection('kardex_snapshots'); // Checkpoints de saldo del kardex
+db.createCollection('resumen_inventario'); // Totales del inventario (mantenidos con $inc)
+db.createCollection('importaciones');  // Progreso de importaciones masivas
+db.createCollection('esquema_versiones'); // Versión aplicada del registro de índices
 
 print('✅ Colecciones creadas exitosamente');
\ No newline at end of file
@@ -1,27 +1,69 @@
 // database/init/02_create_indexes.js
 db = db.getSiblingDB('almacen_control');
+// Fuente de verdad: backend/app/server/config/indices.py (se sincroniza al
+// iniciar la API o con `python -m server.config.indices`). Mantener alineado.
 
 // Índices para usuarios
 db.usuarios.createIndex({ "codigo_usuario": 1 }, { unique: true });
 db.usuarios.createIndex({ "email_usuario": 1 }, { unique: true });
 db.usuarios.createIndex({ "tipo_usuario": 1 });
+db.usuarios.createIndex(
+  { "nombre_usuario": "text", "area_usuario": "text" },
+  { name: "usuarios_texto", default_language: "spanish" }
+);
+db.usuarios.createIndex({ "created_at": -1, "id_usuario": -1 });
+db.usuarios.createIndex({ "estado_usuario": 1, "created_at": -1, "id_usuario": -1 });
 
 // Índices para productos
 db.productos.createIndex({ "codigo_producto": 1 }, { unique: true });
-db.productos.createIndex({ "nombre_producto": "text" });
+db.productos.createIndex(
+  { "nombre_producto": "text", "categoria_producto": "text", "descripcion_producto": "text" },
+  { name: "productos_texto", default_language: "spanish", weights: { "nombre_producto": 10, "categoria_producto": 3, "descripcion_producto": 1 } }
+);
 db.productos.createIndex({ "tipo_producto": 1 });
 db.productos.createIndex({ "estado_producto": 1 });
+db.productos.createIndex({ "created_at": -1, "id_producto": -1 });
+db.productos.createIndex({ "estado_producto": 1, "created_at": -1, "id_producto": -1 });
+db.productos.createIndex({ "tipo_producto": 1, "created_at": -1, "id_producto": -1 });
+// Búsqueda por prefijos de palabra (edge n-grams sin tildes, multikey)
+db.productos.createIndex({ "estado_producto": 1, "busqueda_tokens": 1, "nombre_producto": 1 });
+db.productos.createIndex({ "busqueda_tokens": 1, "nombre_producto": 1 });
+db.productos.createIndex({ "estado_producto": 1, "nombre_producto": 1 });  // Activos ordenados por nombre
+db.productos.createIndex({ "updated_at": 1 });  // Refresco incremental del autocomplete en memoria
 
 // Índices para stock
 db.stock.createIndex({ "producto_id": 1 }, { unique: true });
 db.stock.createIndex({ "cantidad_disponible": 1 });
+db.stock.createIndex({ "estado_stock": 1, "producto_nombre": 1, "id_stock": 1 });
+db.stock.createIndex({ "estado_stock": 1, "nivel_stock": 1, "producto_nombre": 1, "id_stock": 1 });
+// Alertas: conjunto pequeño de stock con alerta o vencimiento próximo
+db.stock.createIndex({ "estado_stock": 1, "alerta_generada": 1 });
+db.stock.createIndex({ "estado_stock": 1, "fecha_vencimiento": 1 });
 
-// Índices para históricos
-db.h_productos.createIndex({ "created_at": -1 });
-db.h_usuarios.createIndex({ "created_at": -1 });
+// Índices para kardex (append-only, consultas por rango de fechas)
+db.kardex.createIndex({ "id_kardex": 1 }, { unique: true });
+db.kardex.createIndex({ "producto_id": 1, "fecha_movimiento": -1, "id_kardex": -1 });
+db.kardex.createIndex({ "fecha_movimiento": -1, "id_kardex": -1 });
 
-// Índices para logs
-db.log_general.createIndex({ "created_at": -1 });
+// Índices para kardex_snapshots (snapshot más cercano por producto y fecha)
+db.kardex_snapshots.createIndex({ "producto_id": 1, "id_kardex": 1 }, { unique: true });
+db.kardex_snapshots.createIndex({ "producto_id": 1, "fecha_corte": -1, "id_kardex": -1 });
+db.kardex_snapshots.createIndex({ "fecha_corte": -1 });
+
+// Índices para importaciones masivas (consulta de progreso)
+db.importaciones.createIndex({ "id_importacion": 1 }, { unique: true });
+db.importaciones.createIndex({ "created_at": -1 });
+
+// Índices para históricos (por entidad y fecha de la acción)
+db.h_productos.createIndex({ "id_producto": 1, "action_timestamp": -1 });
+db.h_productos.createIndex({ "action_timestamp": -1 });
+db.h_usuarios.createIndex({ "id_usuario": 1, "action_timestamp": -1 });
+db.h_usuarios.createIndex({ "action_timestamp": -1 });
+
+// Índices para logs (el campo escrito es "timestamp")
+db.log_general.createIndex({ "timestamp": -1 });
+db.log_general.createIndex({ "module": 1, "timestamp": -1 });
+db.log_general.createIndex({ "user_id": 1, "timestamp": -1 });
 db.contador_general.createIndex({ "modulo": 1 });
 
 print('✅ Índices creados exitosamente');
\ No newline at end of file